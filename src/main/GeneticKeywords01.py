@@ -11,9 +11,7 @@ handles the learning of the step 01 : extracting keywords from graph
 '''
 
 from operator import itemgetter
-import os, random, nltk
-
-from nltk.corpus import stopwords
+import os, random
 
 import GeneticTraining, IOFunctions, KeywordSelector, UtilsConstants
 
@@ -46,8 +44,8 @@ class GeneticKeywords01(GeneticTraining.GeneticProcess):
         # setting the evaluation ready
         self.codeNAF = ""
         self.descriptions = {}
-        self.french_stopwords = set(stopwords.words('french'))
-        self.stem = nltk.stem.snowball.FrenchStemmer()
+        self.french_stopwords = UtilsConstants.tokenizerContext.stopwords
+        self.stem = UtilsConstants.tokenizerContext.stemmer
         self.scoreMax = 0 
         # importing entreprises
         entreprises = []
@@ -57,15 +55,16 @@ class GeneticKeywords01(GeneticTraining.GeneticProcess):
                 entreprises.append(line.split("_"))
                 entreprises[-1][-1] = [UtilsConstants.preprocessString(a) for a in entreprises[-1][-1].split("=")[:-1]]
         # importing keywords and equivalences         
-        self.keywordSet = IOFunctions.importKeywords()
-        self.dicWordWeight = UtilsConstants.importDicWordWeight(self.keywordSet)
-        self.equivalences = IOFunctions.importSlugEquivalence()
+        self.keywordSet, self.dicWordWeight, self.dicSlug, self.equivalences = IOFunctions.importLexicon()
+        self.slugIndex = KeywordSelector.computeSlugIndex(self.dicSlug, self.equivalences)
+        self.encodedIndex = KeywordSelector.EncodedSlugIndex(self.slugIndex)
         if nbDesc>0:
             entreprises = random.sample(entreprises, min(len(entreprises),nbDesc))
-        self.descriptions = {s[0]:[UtilsConstants.tokenizeAndStemmerize(s[0],
-                                                               keepComa=True,
-                                                               french_stopwords=self.french_stopwords,
-                                                               stem=self.stem),
+        # the descriptions are encoded once as the ids of their stems
+        self.descriptions = {s[0]:[self.encodedIndex.encode(UtilsConstants.tokenizeAndStemmerize(s[0],
+                                                                                          keepComa=True,
+                                                                                          french_stopwords=self.french_stopwords,
+                                                                                          stem=self.stem)),
                                    s[1]] 
                              for s in entreprises}
         # intializing the genetic process
@@ -90,6 +89,8 @@ class GeneticKeywords01(GeneticTraining.GeneticProcess):
                 continue
             chromo.score = []
             chromo.normalisationFunction = lambda x : x
+        # the chromosomes are scored together for each match
+        population = KeywordSelector.PopulationStep01([chromo.parameters for chromo in self.pop if not chromo.evaluated])
         for desc in self.descriptions.values():
             # for each description we perform the evaluation of the chromosomes
             if self.toPrint:
@@ -101,10 +102,13 @@ class GeneticKeywords01(GeneticTraining.GeneticProcess):
                                                            booleanMatchParfait = True,
                                                            french_stopwords = self.french_stopwords,
                                                            stem = self.stem,
-                                                           parametersStep01 = [chromo.parameters for chromo in self.pop if not chromo.evaluated],
+                                                           parametersStep01 = population,
                                                            normalisationFunction= [chromo.normalisationFunction for chromo in self.pop if not chromo.evaluated],
+                                                           dicSlug = self.dicSlug,
+                                                           slugIndex = self.slugIndex,
                                                            toPrint=False,
-                                                           preprocessedString = desc[0])
+                                                           preprocessedString = desc[0],
+                                                           encodedIndex = self.encodedIndex)
 
             for tupleChromoDic in zip([chromo for chromo in self.pop if not chromo.evaluated] , dicKw):
                 if len(tupleChromoDic[1])==0:
@@ -5,7 +5,11 @@ Created on 27 avr. 2016
 @author: Kévin Bienvenu
 '''
 from email import Utils
+import os
+
 import UtilsConstants
+import numpy as np
+import scipy.sparse
 
 
 ''' functions of graph handling '''
@@ -134,6 +138,10 @@ class GraphKeyword():
         for node in self.graphNodes.values():
             node.setColor(0)
 
+    def resetNodeStates(self):
+        for node in self.graphNodes.values():
+            node.state = 0
+
     def computeNodeFeatures(self, nodename, dicKeywords, dicWordWeight, codeNAF=""):
         ''' 
         function that computes the features of a node
@@ -194,50 +202,82 @@ class GraphKeyword():
         for e in toDelete:
             del self.graphEdges[e]
         
-class Node():
+class Node(object):
     '''
     === Node description: 
     id (int)
     name (str)
     genericity (float)
     dicNAF (dic{codeNAF(str) : value (float)}
+    neighbours (dic{neighbour (Node) : value (float)})
+    state (int)
+    features (dic{feature(str) : value (float)}), created on first use
+    color, shape : visualization attributes, stored in a NodeVisualization created
+        only for the nodes that are not in the default state (cf. setColor)
+    the attributes are stored in slots, which takes much less memory than a __dict__ per node.
     '''
+    __slots__ = ("id", "name", "genericity", "dicNAF", "state", "size", "neighbours", "nodeFeatures", "visualization")
+
     def __init__(self, id1, name):
         self.id = id1
         self.name= name
         self.genericity = 0.0
         self.dicNAF = {}
-        self.features = {}
+        self.nodeFeatures = None
+        self.visualization = None
         self.state = 0
-        self.setColor(0)
-        self.shape = "disc"
         self.size = 0
         self.neighbours = {}
-        
+
+    @property
+    def features(self):
+        if self.nodeFeatures is None:
+            self.nodeFeatures = {}
+        return self.nodeFeatures
+
+    @property
+    def color(self):
+        if self.visualization is None:
+            return [100,100,100]
+        return self.visualization.color
+
+    @property
+    def shape(self):
+        if self.visualization is None:
+            return "disc"
+        return self.visualization.shape
+
     def setColor(self,state):
         '''
         function used for visualization
         '''
         self.state = state
         if state==1:
-            self.color = [250,100,0]
-            self.shape = "square"
+            self.visualization = NodeVisualization([250,100,0], "square")
             self.size = 100
         elif state==3:
-            self.color = [0,100,250]
-            self.shape = "square"
+            self.visualization = NodeVisualization([0,100,250], "square")
             self.size = 100
         else:
-            self.color = [100,100,100]
-            self.shape = "disc"
+            self.visualization = None
             self.size = 0
     
     def getSize(self):
         if self.size == 0 or self.size==100:
             self.size = sum(self.dicNAF.values())
         return self.size
+
+class NodeVisualization(object):
+    '''
+    visualization attributes of a node (color, shape)
+    '''
+    __slots__ = ("color", "shape")
+
+    def __init__(self, color, shape):
+        self.color = color
+        self.shape = shape
             
-class Edge():
+class Edge(object):
     '''
     === Edge description:
     id0 (int)
@@ -245,6 +285,8 @@ class Edge():
     value (float)
     nbOccurence (int)
     '''
+    __slots__ = ("id0", "id1", "value", "nbOccurence")
+
     def __init__(self, id0, id1):
         self.id0 = id0
         self.id1 = id1
@@ -252,4 +294,566 @@ class Edge():
         self.nbOccurence = 0
 
 
-    
\ No newline at end of file
+''' partial graph '''
+
+
+class PartialGraphKeyword():
+    '''
+     === Partial Graph Description ===
+     Graph built over a part of the entreprises, storing the values added to the nodes and edges in lists,
+     in the order in which they are first added. The partial graphs of consecutive parts of the entreprises
+     can be merged (cf. merge), the merge being associative and keeping that order,
+     so that the final graph (cf. toGraph) is built in the same order as a graph built over all the entreprises at once.
+     The values added to each codeNAF and edge are kept one by one and summed in the order of the entreprises,
+     so that the final values are exactly the ones of the graph built at once.
+
+    - names : names of the nodes, by id ([str])
+
+    - genericities : genericities of the nodes, by id ([float])
+
+    - nafKeys, nafValues : codeNAF values of the nodes ([(id (int), codeNAF (str))], [[float]])
+
+    - edgeKeys, edgeValues, edgeOccurrences : edges ([(id1 (int), id2 (int))], [[float]], [int])
+
+    - dicIdNodes, nafIndex, edgeIndex : positions of the nodes, codeNAF values and edges
+        (dic{name (str) : id (int)}, dic{(id, codeNAF) : position (int)}, dic{(id1, id2) : position (int)})
+    '''
+    def __init__(self):
+        self.names = []
+        self.genericities = []
+        self.nafKeys = []
+        self.nafValues = []
+        self.edgeKeys = []
+        self.edgeValues = []
+        self.edgeOccurrences = []
+        self.dicIdNodes = {}
+        self.nafIndex = {}
+        self.edgeIndex = {}
+
+    def addNodeValues(self, name, codeNAF="", valueNAF=0, genericity = 0):
+        '''
+        function that change the node 'name', as GraphKeyword.addNodeValues
+        '''
+        try:
+            v = float(valueNAF)
+            g = float(genericity)
+        except:
+            return
+        i = self.getNodeId(name)
+        if codeNAF != "":
+            self.getNAFValues(i, codeNAF).append(v)
+        if genericity>0:
+            self.genericities[i] = g
+
+    def addEdgeValues(self, id0, id1, value, nbOccurence = 1):
+        '''
+        function that add the value 'value' to the edge between the nodes 1 and 2, as GraphKeyword.addEdgeValues
+        '''
+        k = self.getEdgePosition(id0, id1)
+        self.edgeValues[k].append(float(value))
+        self.edgeOccurrences[k] += nbOccurence
+
+    def getNodeId(self, name):
+        '''
+        function returning the id of the node 'name', creating it if needed
+        '''
+        if not(name in self.dicIdNodes):
+            self.dicIdNodes[name] = len(self.names)
+            self.names.append(name)
+            self.genericities.append(0.0)
+        return self.dicIdNodes[name]
+
+    def getNAFValues(self, i, codeNAF):
+        '''
+        function returning the list of the values added to the codeNAF of the node i, creating it if needed
+        '''
+        if not((i, codeNAF) in self.nafIndex):
+            self.nafIndex[(i, codeNAF)] = len(self.nafKeys)
+            self.nafKeys.append((i, codeNAF))
+            self.nafValues.append([])
+        return self.nafValues[self.nafIndex[(i, codeNAF)]]
+
+    def getEdgePosition(self, id0, id1):
+        '''
+        function returning the position of the edge between the nodes id0 and id1, creating it if needed
+        '''
+        i = min(id0, id1)
+        j = max(id0, id1)
+        if not((i,j) in self.edgeIndex):
+            self.edgeIndex[(i,j)] = len(self.edgeKeys)
+            self.edgeKeys.append((i,j))
+            self.edgeValues.append([])
+            self.edgeOccurrences.append(0)
+        return self.edgeIndex[(i,j)]
+
+    def merge(self, other):
+        '''
+        function that adds the partial graph 'other', built over the entreprises following those of this graph.
+        -- IN
+        other : partial graph to add (PartialGraphKeyword)
+        -- OUT
+        returns the merged graph (self)
+        '''
+        ids = []
+        for name, genericity in zip(other.names, other.genericities):
+            self.addNodeValues(name, genericity = genericity)
+            ids.append(self.dicIdNodes[name])
+        for (i, codeNAF), values in zip(other.nafKeys, other.nafValues):
+            self.getNAFValues(ids[i], codeNAF).extend(values)
+        for (i, j), values, nbOccurence in zip(other.edgeKeys, other.edgeValues, other.edgeOccurrences):
+            k = self.getEdgePosition(ids[i], ids[j])
+            self.edgeValues[k].extend(values)
+            self.edgeOccurrences[k] += nbOccurence
+        return self
+
+    def compact(self):
+        '''
+        function that replaces the values added to each codeNAF and edge by their sum.
+        It must only be used on a partial graph starting at the first entreprise :
+        the following values being added to the sum, the final values are still the ones of the graph built at once.
+        -- OUT
+        returns the compacted graph (self)
+        '''
+        self.nafValues = [[sum(values)] for values in self.nafValues]
+        self.edgeValues = [[sum(values)] for values in self.edgeValues]
+        return self
+
+    def toGraph(self, name="untitled_graph"):
+        '''
+        function returning the graph (GraphKeyword) of the partial graph,
+        the nodes, codeNAF values and edges being added in the order of the partial graph.
+        '''
+        graph = GraphKeyword(name)
+        for i, (nodename, genericity) in enumerate(zip(self.names, self.genericities)):
+            graph.dicIdNodes[nodename] = i
+            graph.graphNodes[i] = Node(i, nodename)
+            graph.graphNodes[i].genericity = genericity
+        for (i, codeNAF), values in zip(self.nafKeys, self.nafValues):
+            # values summed one by one, as in GraphKeyword.addNodeValues
+            graph.graphNodes[i].dicNAF[codeNAF] = sum(values)
+        for (i, j), values, nbOccurence in zip(self.edgeKeys, self.edgeValues, self.edgeOccurrences):
+            value = sum(values)
+            edge = Edge(i, j)
+            edge.value = value
+            edge.nbOccurence = nbOccurence
+            graph.graphEdges[(i,j)] = edge
+            graph.graphNodes[i].neighbours[graph.graphNodes[j]] = value
+            graph.graphNodes[j].neighbours[graph.graphNodes[i]] = value
+        return graph
+
+
+''' compact graph '''
+
+
+class CSRGraphKeyword(GraphKeyword):
+    '''
+     === Compact Graph Description ===
+     Read-only graph storing the nodes and the edges in numpy arrays,
+     which takes much less memory than the Node and Edge objects of GraphKeyword.
+     The nodes are stored by rows (0..n-1), each row corresponding to a node id.
+
+    - ids : array of the node ids, by row (np.array[int])
+    - names : list of the node names, by row ([str])
+    - genericities : array of the node genericities, by row (np.array[float])
+    - codesNAF : list of the codeNAF present in the graph ([str])
+    - matrixNAF : sparse matrix of the codeNAF values, rows x codesNAF (scipy.sparse.csr_matrix)
+    - sizes : array of the node sizes, ie. the sum of their codeNAF values (np.array[float])
+    - indptr, indices, weights, occurrences : adjacency of the nodes in CSR format,
+        the neighbours of the row r are the rows indices[indptr[r]:indptr[r+1]] (sorted),
+        weights and occurrences holding the value and the number of occurrences of the corresponding edges.
+        each edge is stored twice, once for each of its nodes.
+    - dicIdNodes : dic{name (str) : id (int)}
+
+    The nodes and the edges are accessed as in GraphKeyword
+    (graphNodes, graphEdges, getNodeByName(name), getNode(id), node.neighbours, node.dicNAF, node.getSize()...)
+    through views (CSRNode, Edge) created on demand.
+    Only the state and the features of the nodes can be modified.
+    '''
+    def __init__(self, name, ids, names, genericities, codesNAF, matrixNAF, sizes, indptr, indices, weights, occurrences):
+        GraphKeyword.__init__(self, name)
+        self.ids = ids
+        self.names = names
+        self.genericities = genericities
+        self.codesNAF = codesNAF
+        self.matrixNAF = matrixNAF
+        self.sizes = sizes
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.occurrences = occurrences
+        self.nbEdges = int(indptr[-1])/2
+        self.rowOfId = {i : row for row, i in enumerate(ids.tolist())}
+        self.dicIdNodes = {names[row] : i for row, i in enumerate(ids.tolist())}
+        self.states = np.zeros(len(ids), np.int8)
+        self.nodeViews = {}
+        self.graphNodes = CSRNodes(self)
+        self.graphEdges = CSREdges(self)
+
+    def addEdgeValues(self, id0, id1, value):
+        print "the compact graph can't be modified"
+
+    def addNodeValues(self, name, codeNAF="", valueNAF=0, genericity = 0):
+        print "the compact graph can't be modified"
+
+    def deleteNode(self, name):
+        print "the compact graph can't be modified"
+
+    def removeLonelyNodes(self):
+        print "the compact graph can't be modified"
+
+    def getNodeByName(self, name):
+        ''' return the node if it's present in the graph and None otherwise '''
+        if name in self.dicIdNodes:
+            return self.getNodeByRow(self.rowOfId[self.dicIdNodes[name]])
+        else:
+            return None
+
+    def getNode(self, i):
+        return self.getNodeByRow(self.rowOfId[i])
+
+    def getNodeByRow(self, row):
+        '''
+        function returning the view of the node of the given row,
+        the views are kept so that the features of the nodes are kept too.
+        '''
+        try:
+            return self.nodeViews[row]
+        except KeyError:
+            node = CSRNode(self, row)
+            self.nodeViews[row] = node
+            return node
+
+    def clearNodeViews(self):
+        '''
+        function that removes the views of the nodes, and therefore their features, to free memory
+        '''
+        self.nodeViews = {}
+
+    def getEdges(self, row):
+        '''
+        function returning the edges of a row
+        -- OUT
+            indices : rows of the neighbours, sorted (np.array[int])
+            weights : values of the corresponding edges (np.array[float])
+            occurrences : numbers of occurrences of the corresponding edges (np.array[int])
+        '''
+        start = self.indptr[row]
+        end = self.indptr[row+1]
+        return self.indices[start:end], self.weights[start:end], self.occurrences[start:end]
+
+    def findEdge(self, row0, row1):
+        '''
+        function returning the value and the number of occurrences of the edge between two rows, None if it doesn't exist
+        '''
+        indices, weights, occurrences = self.getEdges(row0)
+        k = np.searchsorted(indices, row1)
+        if k<len(indices) and indices[k]==row1:
+            return float(weights[k]), int(occurrences[k])
+        return None
+
+    def resetNodeColors(self):
+        '''
+        function used for visualization
+        '''
+        self.states[:] = 0
+
+    def resetNodeStates(self):
+        self.states[:] = 0
+
+class LazyCSRGraphKeyword(CSRGraphKeyword):
+    '''
+    compact graph whose edges are read on demand from the binary format of the graph (cf. IOFunctions.saveGraphBinary),
+    only the offsets of the edges of each node (indptr) being kept in memory.
+    the edges of the most recently used nodes are kept in an LRU cache (edgesCache).
+    '''
+    def __init__(self, name, ids, names, genericities, codesNAF, matrixNAF, sizes, indptr, directory, cacheSize = 10000):
+        CSRGraphKeyword.__init__(self, name, ids, names, genericities, codesNAF, matrixNAF, sizes, indptr, None, None, None)
+        self.directory = os.path.abspath(directory)
+        self.edgesCache = UtilsConstants.LRUCache(cacheSize)
+        self.edgeFiles = None
+        self.pid = None
+
+    def openEdgeFiles(self):
+        '''
+        function opening the files of the edges, once per process so that forked processes don't share their position
+        '''
+        if self.edgeFiles is None or self.pid != os.getpid():
+            self.edgeFiles = [openNpyFile(os.path.join(self.directory,key+".npy")) for key in ["indices", "weights", "occurrences"]]
+            self.pid = os.getpid()
+        return self.edgeFiles
+
+    def close(self):
+        if not(self.edgeFiles is None) and self.pid == os.getpid():
+            for npyFile in self.edgeFiles:
+                npyFile[0].close()
+        self.edgeFiles = None
+
+    def getEdges(self, row):
+        edges = self.edgesCache.get(row)
+        if edges is None:
+            start = int(self.indptr[row])
+            count = int(self.indptr[row+1])-start
+            edges = tuple([readNpyRange(npyFile, start, count) for npyFile in self.openEdgeFiles()])
+            self.edgesCache.put(row, edges)
+        return edges
+
+def openNpyFile(filename):
+    '''
+    function opening a numpy file (.npy) to read parts of its array
+    -- OUT
+        npyFile : the opened file, the type of the array and the position of its data (tuple(file, np.dtype, int))
+    '''
+    fichier = open(filename, "rb")
+    version = np.lib.format.read_magic(fichier)
+    if version == (1,0):
+        _, _, dtype = np.lib.format.read_array_header_1_0(fichier)
+    else:
+        _, _, dtype = np.lib.format.read_array_header_2_0(fichier)
+    return (fichier, dtype, fichier.tell())
+
+def readNpyRange(npyFile, start, count):
+    '''
+    function reading the elements start to start+count of the array of an opened numpy file (1-dimensional)
+    '''
+    fichier, dtype, offset = npyFile
+    fichier.seek(offset+start*dtype.itemsize)
+    return np.fromfile(fichier, dtype=dtype, count=count)
+
+class CSRNodes(object):
+    '''
+    view of the nodes of a CSRGraphKeyword, behaving as the dictionary graphNodes {id (int): node (CSRNode)}
+    '''
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, i):
+        return self.graph.getNode(i)
+
+    def __contains__(self, i):
+        return i in self.graph.rowOfId
+
+    def __len__(self):
+        return len(self.graph.ids)
+
+    def __iter__(self):
+        return iter(self.graph.ids.tolist())
+
+    def keys(self):
+        return self.graph.ids.tolist()
+
+    def values(self):
+        return list(self.itervalues())
+
+    def itervalues(self):
+        for row in xrange(len(self.graph.ids)):
+            yield self.graph.getNodeByRow(row)
+
+    def items(self):
+        return zip(self.keys(), self.values())
+
+class CSREdges(object):
+    '''
+    view of the edges of a CSRGraphKeyword, behaving as the dictionary graphEdges {(id1 (int), id2 (int)), edge (Edge)}
+    the edges are created on demand and can't be modified.
+    '''
+    def __init__(self, graph):
+        self.graph = graph
+
+    def findEdge(self, key):
+        try:
+            return self.graph.findEdge(self.graph.rowOfId[key[0]], self.graph.rowOfId[key[1]])
+        except (KeyError, TypeError, IndexError):
+            return None
+
+    def __getitem__(self, key):
+        values = self.findEdge(key)
+        if values is None or key[0]>key[1]:
+            raise KeyError(key)
+        edge = Edge(key[0], key[1])
+        edge.value, edge.nbOccurence = values
+        return edge
+
+    def __contains__(self, key):
+        return key[0]<=key[1] and not(self.findEdge(key) is None)
+
+    def __len__(self):
+        return self.graph.nbEdges
+
+    def __iter__(self):
+        ids = self.graph.ids.tolist()
+        for row in xrange(len(ids)):
+            for neighbour in self.graph.getEdges(row)[0].tolist():
+                if ids[row]<ids[neighbour]:
+                    yield (ids[row], ids[neighbour])
+
+    def keys(self):
+        return list(iter(self))
+
+    def values(self):
+        return list(self.itervalues())
+
+    def itervalues(self):
+        ids = self.graph.ids.tolist()
+        for row in xrange(len(ids)):
+            indices, weights, occurrences = self.graph.getEdges(row)
+            for neighbour, value, nbOccurence in zip(indices.tolist(), weights.tolist(), occurrences.tolist()):
+                if ids[row]<ids[neighbour]:
+                    edge = Edge(ids[row], ids[neighbour])
+                    edge.value = value
+                    edge.nbOccurence = nbOccurence
+                    yield edge
+
+class CSRNode(object):
+    '''
+    view of a node of a CSRGraphKeyword, with the attributes of Node
+    (id, name, genericity, dicNAF, features, state, neighbours, getSize())
+    the visualization attributes (color, shape, size) only depend on the state of the node.
+    '''
+    __slots__ = ("graph", "row", "id", "name", "features")
+
+    def __init__(self, graph, row):
+        self.graph = graph
+        self.row = row
+        self.id = int(graph.ids[row])
+        self.name = graph.names[row]
+        self.features = {}
+
+    def getState(self):
+        return int(self.graph.states[self.row])
+
+    def setState(self, state):
+        self.graph.states[self.row] = state
+
+    state = property(getState, setState)
+
+    @property
+    def genericity(self):
+        return float(self.graph.genericities[self.row])
+
+    @property
+    def dicNAF(self):
+        ''' dictionary of the codeNAF values of the node (dic{codeNAF(str) : value (float)}), read-only copy '''
+        matrixNAF = self.graph.matrixNAF
+        start = matrixNAF.indptr[self.row]
+        end = matrixNAF.indptr[self.row+1]
+        return {self.graph.codesNAF[k] : value
+                for k, value in zip(matrixNAF.indices[start:end].tolist(), matrixNAF.data[start:end].tolist())}
+
+    @property
+    def neighbours(self):
+        return CSRNeighbours(self.graph, self.row)
+
+    @property
+    def color(self):
+        return {1:[250,100,0], 3:[0,100,250]}.get(self.state, [100,100,100])
+
+    @property
+    def shape(self):
+        return "square" if self.state in [1,3] else "disc"
+
+    @property
+    def size(self):
+        return 100 if self.state in [1,3] else 0
+
+    def setColor(self, state):
+        '''
+        function used for visualization
+        '''
+        self.state = state
+
+    def getSize(self):
+        return float(self.graph.sizes[self.row])
+
+class CSRNeighbours(object):
+    '''
+    view of the neighbours of a node of a CSRGraphKeyword,
+    behaving as the dictionary Node.neighbours {neighbour (CSRNode) : edge value (float)}
+    '''
+    def __init__(self, graph, row):
+        self.graph = graph
+        self.row = row
+        self.indices, self.weights, _ = graph.getEdges(row)
+
+    def findNeighbour(self, node):
+        k = np.searchsorted(self.indices, node.row)
+        if k<len(self.indices) and self.indices[k]==node.row:
+            return k
+        return -1
+
+    def __getitem__(self, node):
+        k = self.findNeighbour(node)
+        if k<0:
+            raise KeyError(node.name)
+        return float(self.weights[k])
+
+    def __contains__(self, node):
+        return self.findNeighbour(node)>=0
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        getNodeByRow = self.graph.getNodeByRow
+        return [getNodeByRow(row) for row in self.indices.tolist()]
+
+    def values(self):
+        return self.weights.tolist()
+
+    def items(self):
+        return zip(self.keys(), self.values())
+
+def buildCSRGraph(name, nodes, edges):
+    '''
+    function that builds a compact graph out of the lists of its nodes and its edges
+    -- IN
+        name : name of the graph (str)
+        nodes : list of the nodes ([(id (int), name (str), genericity (float), [(codeNAF (str), value (float))])])
+            the codeNAF values of a node being given in the order they are inserted in its dicNAF
+        edges : list of the edges ([(id0 (int), id1 (int), value (float), nbOccurence (int))])
+    -- OUT
+        graph : the compact graph (CSRGraphKeyword)
+    '''
+    n = len(nodes)
+    ids = np.array([node[0] for node in nodes], dtype=np.int64)
+    names = [node[1] for node in nodes]
+    genericities = np.array([node[2] for node in nodes], dtype=np.float64)
+    # codeNAF values, in a sparse matrix
+    codesNAF = sorted(set([codeNAF for node in nodes for codeNAF, _ in node[3]]))
+    dicCodes = {codeNAF : k for k, codeNAF in enumerate(codesNAF)}
+    nafIndptr = np.zeros(n+1, dtype=np.int64)
+    nafIndptr[1:] = np.cumsum([len(node[3]) for node in nodes])
+    nafIndices = np.array([dicCodes[codeNAF] for node in nodes for codeNAF, _ in node[3]], dtype=np.int32)
+    nafValues = np.array([value for node in nodes for _, value in node[3]], dtype=np.float64)
+    matrixNAF = scipy.sparse.csr_matrix((nafValues, nafIndices, nafIndptr), shape=(n, len(codesNAF)))
+    # the sizes are summed as Node.getSize() does, in the order of the dicNAF
+    sizes = np.array([sum(dict(node[3]).values()) for node in nodes], dtype=np.float64)
+    # edges, in both directions, sorted by rows then by neighbours
+    idToRow = {i : row for row, i in enumerate(ids.tolist())}
+    rows0 = np.array([idToRow[edge[0]] for edge in edges], dtype=np.int64)
+    rows1 = np.array([idToRow[edge[1]] for edge in edges], dtype=np.int64)
+    values = np.array([edge[2] for edge in edges], dtype=np.float64)
+    nbOccurences = np.array([edge[3] for edge in edges], dtype=np.int32)
+    sources = np.concatenate([rows0, rows1])
+    targets = np.concatenate([rows1, rows0])
+    order = np.lexsort((targets, sources))
+    indptr = np.zeros(n+1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(sources, minlength=n))
+    indices = targets[order].astype(np.int32)
+    weights = np.concatenate([values, values])[order]
+    occurrences = np.concatenate([nbOccurences, nbOccurences])[order]
+    return CSRGraphKeyword(name, ids, names, genericities, codesNAF, matrixNAF, sizes, indptr, indices, weights, occurrences)
+
+def compressGraph(graph):
+    '''
+    function that converts a GraphKeyword into a compact graph
+    -- IN
+        graph : the graph to convert (GraphKeyword)
+    -- OUT
+        graph : the compact graph (CSRGraphKeyword)
+    '''
+    nodes = [(node.id, node.name, node.genericity, node.dicNAF.items()) for node in graph.graphNodes.values()]
+    edges = [(key[0], key[1], edge.value, edge.nbOccurence) for key, edge in graph.graphEdges.items()]
+    return buildCSRGraph(graph.name, nodes, edges)
@@ -12,18 +12,26 @@ The module is cut into three parts, one for each of the examples enumerated abov
 ''' subset creation and saving '''
 
 import codecs
+import cPickle
+import gzip
+import hashlib
 from operator import itemgetter
 import os
+import random
 import re
+import shutil
 import time
 import urllib
 
 from GraphProcessing import GraphKeyword, Node, Edge
+import GraphProcessing
 import UtilsConstants
+import numpy as np
 import pandas as pd
+import scipy.sparse
 
 
-def extractAndSaveSubset(codeNAF="", n=0, path=UtilsConstants.pathCodeNAF, toPrint=False):
+def extractAndSaveSubset(codeNAF="", n=0, path=UtilsConstants.pathCodeNAF, toPrint=False, saveTokens=False):
     '''
     function that extract a subset from the database then save it in a file.
     by default it extracts the whole content of the database,
@@ -35,6 +43,8 @@ def extractAndSaveSubset(codeNAF="", n=0, path=UtilsConstants.pathCodeNAF, toPri
         (-> let 0 to extract the whole subset)
     path : the path were to save the extracted subset *optional (str) default=UtilsConstants.pathCodeNAF
     toPrint : boolean that settles if information must be displayed (boolean) default = False
+    saveTokens : boolean that settles if the stems of the descriptions are also saved (boolean) default = False
+        (-> cf. saveSubsetTokens)
     -- OUT:
     entreprises : the function returns the subset
     '''
@@ -50,12 +60,34 @@ def extractAndSaveSubset(codeNAF="", n=0, path=UtilsConstants.pathCodeNAF, toPri
         else:
             subsetname = "subset_NAF_"+str(codeNAF)
     entreprises = extractSubset(codeNAF, n, toPrint)        
+    if not saveSubset(entreprises, subsetname, path, toPrint, saveTokens):
+        return []
+    if toPrint:
+        print "done in:",
+        UtilsConstants.printTime(startTime)
+    if "subset_entreprises.txt" in os.listdir("."):
+        return entreprises
+    else: 
+        return []
+
+def saveSubset(entreprises, subsetname, path=UtilsConstants.pathCodeNAF, toPrint=False, saveTokens=False):
+    '''
+    function that saves a subset in the file subset_entreprises.txt of the directory path/subsetname
+    -- IN:
+    entreprises : array containing info about the entreprise (array) [[naf,desc]]
+    subsetname : the name of the subset (str)
+    path : the path were to save the subset *optional (str) default=UtilsConstants.pathCodeNAF
+    toPrint : boolean that settles if information must be displayed (boolean) default = False
+    saveTokens : boolean that settles if the stems of the descriptions are also saved (boolean) default = False
+    -- OUT:
+    the function returns True if everything went fine, False else.
+    '''
     try:
         os.chdir(path)
     except:
         if toPrint:
             "non existing path in subset extraction -aborting"
-        return []
+        return False
     if subsetname not in os.listdir("."):
         os.mkdir("./"+subsetname)
     os.chdir("./"+subsetname)
@@ -67,22 +99,142 @@ def extractAndSaveSubset(codeNAF="", n=0, path=UtilsConstants.pathCodeNAF, toPri
                 fichier.write(entreprise[1])
                 fichier.write("\n")
             except:
-                "error in subset saving - codeNAF:",codeNAF,"n:",n,"entreprise :",entreprise
-                return []
+                "error in subset saving - subset:",subsetname,"entreprise :",entreprise
+                return False
             i+=1
-    if toPrint:
-        print "done in:",
-        UtilsConstants.printTime(startTime)
-    if "subset_entreprises.txt" in os.listdir("."):
-        return entreprises
-    else: 
-        return []
+    if saveTokens:
+        saveSubsetTokens()
+    return True
+
+# version of the files of stems of the subsets, to change when their format or the tokenization of the descriptions changes
+subsetTokensVersion = 2
+
+def getSubsetTokensHeader():
+    '''
+    function returning the header the file of stems of the subset of the current directory would have if it was saved now.
+    -- OUT:
+    header : dictionary containing the version, the hash of the tokenizer, the identifier of the vocabulary
+        and the signature of the subset (dic)
+    '''
+    UtilsConstants.stemVocabulary.update()
+    return {"version":subsetTokensVersion,
+            "tokenizer":UtilsConstants.stemVocabulary.tokenizerHash,
+            "vocabulary":UtilsConstants.stemVocabulary.identifier,
+            "subset":getFileSignature("subset_entreprises.txt")}
+
+def saveSubsetTokens():
+    '''
+    function that saves the stems of the descriptions of the subset of the current directory
+    (cf. UtilsConstants.tokenizeAndStemmerize(desc, True, UtilsConstants.graphStopwords)) in the file subset_tokens.pkl, next to subset_entreprises.txt,
+    the subset then being imported without tokenizing its descriptions (cf. importSubset).
+    The stems are saved as the ids of the shared vocabulary UtilsConstants.stemVocabulary,
+    the file containing a header (cf. getSubsetTokensHeader), the ids of all the stems
+    and the offset of the stems of each description, in the order of subset_entreprises.txt.
+    -- OUT:
+    the function returns True if everything went fine, False else.
+    '''
+    UtilsConstants.stemVocabulary.update()
+    offsets = [0]
+    stems = []
+    # the descriptions are read as importSubset reads them
+    with open("subset_entreprises.txt","r") as fichier:
+        for line in fichier:
+            stems += UtilsConstants.tokenizeAndStemmerize(line[:-1].split("_")[2], True, UtilsConstants.graphStopwords)
+            offsets.append(len(stems))
+    ids = UtilsConstants.stemVocabulary.getIds(stems)
+    try:
+        UtilsConstants.stemVocabulary.save()
+        with open("subset_tokens.pkl","wb") as fichier:
+            cPickle.dump(getSubsetTokensHeader(), fichier, cPickle.HIGHEST_PROTOCOL)
+            np.save(fichier, ids)
+            np.save(fichier, np.array(offsets, dtype=np.int64))
+    except (IOError, OSError):
+        print "unable to save the stems of the subset", os.getcwd()
+        return False
+    return True
+
+def importSubsetTokens():
+    '''
+    function that imports the stems saved by saveSubsetTokens for the subset of the current directory.
+    -- OUT:
+    tokens : ids of the stems of each description, in the order of subset_entreprises.txt (list[np.array[int32]])
+        None if the file doesn't exist or is out of date (the subset or the tokenizer having changed)
+    '''
+    if not os.path.isfile("subset_tokens.pkl"):
+        return None
+    vocabulary = UtilsConstants.stemVocabulary
+    try:
+        with open("subset_tokens.pkl","rb") as fichier:
+            header = cPickle.load(fichier)
+            vocabulary.update()
+            if header.get("version") != subsetTokensVersion \
+                    or header.get("tokenizer") != vocabulary.tokenizerHash \
+                    or header.get("vocabulary") != vocabulary.identifier \
+                    or not checkFileSignature("subset_entreprises.txt", header.get("subset")):
+                return None
+            ids = np.load(fichier)
+            offsets = np.load(fichier)
+    except Exception:
+        # corrupted file, the descriptions are tokenized again
+        return None
+    if len(ids)>0 and ids.max()>=len(vocabulary.stems):
+        # stems added to the vocabulary since it was read
+        vocabulary.clear()
+        vocabulary.load()
+        if ids.max()>=len(vocabulary.stems):
+            return None
+    return [ids[offsets[i]:offsets[i+1]] for i in xrange(len(offsets)-1)]
+
+def extractAndSaveSubsets(codeNAFs, n=0, path=UtilsConstants.pathCodeNAF, seed=None, toPrint=False, saveTokens=False):
+    '''
+    function that extracts a random subset of size n for each codeNAF and saves them (cf. extractAndSaveSubset),
+    in a single pass over the corpus (cf. CompanyCorpus) : each codeNAF keeps a reservoir of n descriptions,
+    each description containing the codeNAF (as in extractSubset) having the same probability to be in it.
+    -- IN:
+    codeNAFs : list of the codeNAF (list[str])
+        (-> the codeNAF does not have to match perfectly, the string only needs to be contained)
+    n : size of the desired extracts *optional (int) default = 0
+        (-> let 0 to extract all the descriptions of each codeNAF)
+    path : the path were to save the extracted subsets *optional (str) default=UtilsConstants.pathCodeNAF
+    seed : seed of the random generator, so that the subsets can be extracted again (int) default = None
+    toPrint : boolean that settles if information must be displayed (boolean) default = False
+    saveTokens : boolean that settles if the stems of the descriptions are also saved (boolean) default = False
+    -- OUT:
+    subsets : the subsets of the codeNAF (dic{codeNAF(str):entreprises(array)})
+        (-> empty subsets, which aren't saved, if descriptions.csv doesn't exist)
+    '''
+    if not(companyCorpus.load()):
+        return {codeNAF:[] for codeNAF in codeNAFs}
+    generator = random.Random(seed)
+    reservoirs = {codeNAF:[] for codeNAF in codeNAFs}
+    counts = {codeNAF:0 for codeNAF in codeNAFs}
+    # codeNAF of the subsets contained in each codeNAF of the corpus
+    subsetsOfKey = {}
+    for key in companyCorpus.groups:
+        subsetsOfKey[key] = [codeNAF for codeNAF in codeNAFs if codeNAF in key]
+    dataframe = companyCorpus.getDescriptions()
+    for key, description in zip(dataframe.codeNaf.tolist(), dataframe.description.tolist()):
+        for codeNAF in subsetsOfKey[key]:
+            counts[codeNAF] += 1
+            reservoir = reservoirs[codeNAF]
+            if n==0 or len(reservoir)<n:
+                reservoir.append([key, description])
+            else:
+                k = generator.randint(0, counts[codeNAF]-1)
+                if k<n:
+                    reservoir[k] = [key, description]
+    for codeNAF in codeNAFs:
+        saveSubset(reservoirs[codeNAF], "subset_NAF_"+str(codeNAF), path, toPrint, saveTokens)
+        if toPrint:
+            print codeNAF,":",len(reservoirs[codeNAF]),"entreprises selected"
+    return reservoirs
 
 def extractSubset(codeNAF="", n=0, toPrint=False):
     '''
     function that extract a subset from the database
     by default it extracts the whole content of the database,
     however it's possible to choose a particular codeNAF or a maximal size.
+    the database is only read once, cf. CompanyCorpus.
     -- IN:
     codeNAF : string containing the code NAF *optional (str) default= ""
         (-> let "" if no filter according to the code NAF is wanted)
@@ -93,23 +245,11 @@ def extractSubset(codeNAF="", n=0, toPrint=False):
     toPrint : boolean that settles if information must be displayed (boolean) default = False
     -- OUT:
     '''     
-    try:
-        os.chdir(UtilsConstants.pathAgreg)
-    except:
-        print "Non-existing path : pathAgreg -aborting"
-        return []
     if toPrint:
         print "== Extracting random subset of size",n,"for codeNAF:",codeNAF
-    if not("descriptions.csv" in os.listdir(".")):
-        print "Impossible to find the file descriptions.csv -aborting"
+    if not(companyCorpus.load()):
         return []
-    # retrieving the csv file containing descriptions
-    csvfile = pd.read_csv("descriptions.csv", usecols=['codeNaf', 'description'])
-    # applying basic criteria over the description and codeNAF
-    csvfile = csvfile[csvfile.description.notnull()]
-    csvfile = csvfile[csvfile.codeNaf.notnull()]
-    if codeNAF!="":
-        csvfile = csvfile[csvfile.codeNaf.str.contains(codeNAF)==True]
+    csvfile = companyCorpus.getDescriptions(codeNAF)
     if toPrint:
         print " done"
     # sampling according to the input size n
@@ -124,8 +264,126 @@ def extractSubset(codeNAF="", n=0, toPrint=False):
         print " done:",len(entreprises),"entreprises selected"      
     entreprises 
     return entreprises
+
+corpusVersion = 1
+corpusExtensions = {"feather":"feather", "pickle":"pkl"}
+
+def getCorpusFormat():
+    '''
+    function returning the format of the cache of the corpus : "feather" if pyarrow is installed, "pickle" else
+    '''
+    try:
+        import pyarrow
+        return "feather"
+    except ImportError:
+        return "pickle"
+
+class CompanyCorpus():
+    '''
+    class which implements the corpus of the descriptions of the entreprises (descriptions.csv),
+    read once and grouped by codeNAF so that all the subsets are extracted from a single reading (cf. extractSubset).
+    The valid descriptions are cached in a columnar format next to the csv file
+    (feather if pyarrow is installed, pickle else, cf. getCorpusFormat),
+    the cache being used as long as the csv file doesn't change.
+    '''
+    def __init__(self, filename = None):
+        self.filename = filename
+        self.dataframe = None
+        self.groups = None
+        self.signature = None
+
+    def getFilename(self):
+        if self.filename is None:
+            return os.path.join(UtilsConstants.pathAgreg,"descriptions.csv")
+        return self.filename
+
+    def getCacheFilename(self, suffix):
+        return os.path.splitext(self.getFilename())[0]+"_corpus."+suffix
+
+    def load(self):
+        '''
+        function that loads the corpus if it isn't loaded or if the csv file has changed
+        -- OUT
+            the function returns True if the corpus is loaded, False if the csv file doesn't exist
+        '''
+        filename = self.getFilename()
+        if not os.path.isfile(filename):
+            print "Impossible to find the file descriptions.csv -aborting"
+            return False
+        if not(self.dataframe is None) and checkFileSignature(filename, self.signature):
+            return True
+        self.signature = getFileSignature(filename)
+        self.dataframe = self.importCache()
+        if self.dataframe is None:
+            # retrieving the csv file containing descriptions
+            csvfile = pd.read_csv(filename, usecols=['codeNaf', 'description'])
+            # applying basic criteria over the description and codeNAF
+            csvfile = csvfile[csvfile.description.notnull()]
+            csvfile = csvfile[csvfile.codeNaf.notnull()]
+            self.dataframe = csvfile.reset_index(drop=True)
+            self.saveCache()
+        # positions of the descriptions of each codeNAF, in the order of the file
+        self.groups = self.dataframe.groupby("codeNaf").indices
+        return True
+
+    def saveCache(self):
+        cacheFormat = getCorpusFormat()
+        try:
+            if cacheFormat == "feather":
+                self.dataframe.to_feather(self.getCacheFilename(corpusExtensions[cacheFormat]))
+            else:
+                self.dataframe.to_pickle(self.getCacheFilename(corpusExtensions[cacheFormat]))
+            with open(self.getCacheFilename("txt"),"w") as fichier:
+                fichier.write("version;"+str(corpusVersion)+"\n")
+                fichier.write("format;"+cacheFormat+"\n")
+                fichier.write("csv;"+";".join([repr(self.signature[0]), str(self.signature[1]), self.signature[2]])+"\n")
+        except (IOError, OSError):
+            print "problem during the writing of the corpus cache"
+
+    def importCache(self):
+        '''
+        function that reads the cache of the corpus if it corresponds to the csv file
+        -- OUT
+            dataframe : the valid descriptions (pd.DataFrame), None if the cache can't be used
+        '''
+        if not os.path.isfile(self.getCacheFilename("txt")):
+            return None
+        header = {}
+        with open(self.getCacheFilename("txt"),"r") as fichier:
+            for line in fichier:
+                tab = line.strip().split(";")
+                header[tab[0]] = tab[1:]
+        try:
+            cacheFormat = header["format"][0]
+            if int(header["version"][0]) != corpusVersion or cacheFormat != getCorpusFormat() \
+                or not checkFileSignature(self.getFilename(), (float(header["csv"][0]), int(header["csv"][1]), header["csv"][2])):
+                return None
+            if cacheFormat == "feather":
+                return pd.read_feather(self.getCacheFilename(corpusExtensions[cacheFormat]))
+            return pd.read_pickle(self.getCacheFilename(corpusExtensions[cacheFormat]))
+        except (KeyError, IndexError, ValueError, IOError):
+            return None
+
+    def getDescriptions(self, codeNAF = ""):
+        '''
+        function returning the valid descriptions containing the codeNAF, in the order of the file
+        -- IN
+            codeNAF : string containing the code NAF (str) default= ""
+                (-> let "" if no filter according to the code NAF is wanted)
+                (-> the codeNAF does not have to match perfectly, the string only needs to be contained)
+        -- OUT
+            descriptions : dataframe of the codeNAF and descriptions (pd.DataFrame)
+        '''
+        if codeNAF == "":
+            return self.dataframe
+        if [key for key in self.groups if codeNAF in key] == [codeNAF]:
+            return self.dataframe.iloc[self.groups[codeNAF]]
+        return self.dataframe[self.dataframe.codeNaf.str.contains(codeNAF)==True]
+
+# corpus shared by all the extractions of subsets
+companyCorpus = CompanyCorpus()
     
-def importSubset(subsetname, path=UtilsConstants.pathCodeNAF):
+def importSubset(subsetname, path=UtilsConstants.pathCodeNAF, withTokens=False):
     '''
     function that imports a previously computed subset 
     and puts it into the array entreprises.
@@ -133,8 +391,11 @@ def importSubset(subsetname, path=UtilsConstants.pathCodeNAF):
     -- IN:
     subsetname : the name of the subset to import (string)
     path : the path were the subset is located *optional (string) default: UtilsConstants.pathSubset
+    withTokens : boolean that settles if the saved stems of the descriptions are added to the entreprises (boolean) default = False
+        (-> cf. saveSubsetTokens, the ids of the stems are added only if they are up to date)
     -- OUT:
     entreprises : array containing info about the entreprise (array) [[siren,naf,desc]]
+        ([[naf,desc,ids]] when the stems are added)
     '''
     # importing file
     os.chdir(path)
@@ -146,6 +407,10 @@ def importSubset(subsetname, path=UtilsConstants.pathCodeNAF):
     with open("subset_entreprises.txt","r") as fichier:
         for line in fichier:
             entreprises.append(line[:-1].split("_")[1:])
+    if withTokens:
+        tokens = importSubsetTokens()
+        if not(tokens is None) and len(tokens)==len(entreprises):
+            entreprises = [entreprise[:2]+[ids] for entreprise, ids in zip(entreprises, tokens)]
     entreprises.sort(key=itemgetter(0))
     return entreprises
 
@@ -179,6 +444,49 @@ def importKeywords(codeNAF = "", filename="keywords.txt"):
     except:
 #         print "directory not found :",path
         os.chdir(os.path.join(UtilsConstants.path,"motscles"))
+    keywords, _, _, _ = importLexicon(os.path.join(os.getcwd(), filename))
+    return keywords
+
+# local keywords of the codeNAF, kept in memory by importLocalKeywords()
+# {filename : ((mtime, size), keywords)}, the least recently used codeNAF being removed first
+localKeywordsCache = UtilsConstants.LRUCache(100)
+
+def importLocalKeywords(codeNAF, useLexicon = True):
+    '''
+    function that imports the local keywords of a codeNAF (codeNAF/subset_NAF_xxxxx/keywords.txt),
+    or the global keywords if the codeNAF has no local keywords.
+    The keywords are kept in memory (localKeywordsCache) as long as their file doesn't change,
+    the returned dictionary is shared and must not be modified.
+    -- IN:
+    codeNAF : codeNAF of the keywords to import (str)
+    useLexicon : boolean that settles if the compiled lexicon is used, and saved, when the file is read (boolean) default = True
+    -- OUT:
+    keywords : the dictionary containing the keywords {keyword (str): [stems (str)]}
+    '''
+    filename = os.path.join(UtilsConstants.pathCodeNAF,"subset_NAF_"+str(codeNAF)[-5:],"keywords.txt")
+    if not os.path.isfile(filename):
+        filename = os.path.join(UtilsConstants.pathKeywords,"keywords.txt")
+    stat = os.stat(filename)
+    signature = (stat.st_mtime, stat.st_size)
+    cached = localKeywordsCache.get(filename)
+    if not(cached is None) and cached[0] == signature:
+        return cached[1]
+    if useLexicon:
+        keywords = importLexicon(filename)[0]
+    else:
+        keywords = readKeywordsFile(filename)
+    localKeywordsCache.put(filename, (signature, keywords))
+    return keywords
+
+def readKeywordsFile(filename):
+    '''
+    function that reads and tokenizes a file of keywords, without using the compiled lexicon
+    -- IN:
+    filename : the full name of the file of keywords (str)
+    -- OUT:
+    keywords : the dictionary containing the keywords {keyword (str): [stems (str)]}
+    '''
+    keywords = {}
     with codecs.open(filename,"r","utf-8") as fichier:
         for line in fichier:
             i = -2
@@ -190,6 +498,180 @@ def importKeywords(codeNAF = "", filename="keywords.txt"):
                     continue
     return keywords
 
+''' compiled lexicon '''
+
+# The tokenization of the keywords files is the slowest part of their import,
+# so the result is compiled in a binary file (pickle) next to the keywords file,
+# 'keywords.txt' -> 'keywords_lexicon.pkl'. The lexicon holds the keywords and their stems,
+# the dicWordWeight, the dicSlug and the equivalences, and is compiled again
+# as soon as the keywords file or 'equivalences.txt' changes.
+# The dictionaries are stored as lists of items in their insertion order,
+# so that the imported dictionaries iterate in the same order as the computed ones.
+
+lexiconVersion = 1
+
+def getLexiconFilename(filename):
+    '''
+    function returning the name of the compiled lexicon of a keywords file
+    -- IN:
+    filename : the full name of the file of keywords (str)
+    -- OUT:
+    lexiconFilename : the full name of the compiled lexicon (str)
+    '''
+    return os.path.splitext(filename)[0]+"_lexicon.pkl"
+
+def getFileSignature(filename):
+    '''
+    function returning the signature of a file, used to know if a lexicon is up to date
+    -- IN:
+    filename : the full name of the file (str)
+    -- OUT:
+    signature : modification time, size and md5 hash of the file (tuple(float, int, str)), None if the file doesn't exist
+    '''
+    if not os.path.isfile(filename):
+        return None
+    stat = os.stat(filename)
+    with open(filename,"rb") as fichier:
+        md5 = hashlib.md5(fichier.read()).hexdigest()
+    return (stat.st_mtime, stat.st_size, md5)
+
+def checkFileSignature(filename, signature):
+    '''
+    function that checks if a file still has the given signature.
+    the hash is only computed when the modification time or the size have changed.
+    -- IN:
+    filename : the full name of the file (str)
+    signature : signature returned by getFileSignature() (tuple)
+    -- OUT:
+    the function returns True if the file didn't change, False else
+    '''
+    if not os.path.isfile(filename) or signature is None:
+        return signature is None and not os.path.isfile(filename)
+    stat = os.stat(filename)
+    if (stat.st_mtime, stat.st_size) == signature[:2]:
+        return True
+    return stat.st_size == signature[1] and getFileSignature(filename)[2] == signature[2]
+
+def getLexiconHeader(filename):
+    '''
+    function returning the header a lexicon compiled now from the keywords file would have.
+    -- IN:
+    filename : the full name of the file of keywords (str)
+    -- OUT:
+    header : dictionary containing the version, the hash of the tokenizer and the signatures of the sources (dic)
+    '''
+    return {"version":lexiconVersion,
+            "tokenizer":UtilsConstants.getTokenizerHash(),
+            "keywords":getFileSignature(filename),
+            "equivalences":getFileSignature(os.path.join(UtilsConstants.pathKeywords,"equivalences.txt"))}
+
+def isLexiconUpToDate(filename, header):
+    '''
+    function that checks if a compiled lexicon can be used for the keywords file
+    -- IN:
+    filename : the full name of the file of keywords (str)
+    header : the header of the compiled lexicon (dic)
+    -- OUT:
+    the function returns True if the lexicon is up to date, False else
+    '''
+    return header.get("version") == lexiconVersion \
+        and header.get("tokenizer") == UtilsConstants.getTokenizerHash() \
+        and checkFileSignature(filename, header.get("keywords")) \
+        and checkFileSignature(os.path.join(UtilsConstants.pathKeywords,"equivalences.txt"), header.get("equivalences"))
+
+def compileLexicon(filename):
+    '''
+    function that tokenizes the keywords file, computes the lexicon and saves it.
+    -- IN:
+    filename : the full name of the file of keywords (str)
+    -- OUT:
+    keywords, dicWordWeight, dicSlug, equivalences : the lexicon (dic), cf. importLexicon()
+    '''
+    import KeywordSelector
+    header = getLexiconHeader(filename)
+    keywords = readKeywordsFile(filename)
+    dicWordWeight = UtilsConstants.importDicWordWeight(keywords)
+    dicSlug = KeywordSelector.computeDicSlug(keywords, dicWordWeight)
+    equivalences = importSlugEquivalence()
+    # items in insertion order
+    keywordItems = []
+    with codecs.open(filename,"r","utf-8") as fichier:
+        seen = set()
+        for line in fichier:
+            keyword = line[:-2]
+            if keyword in keywords and not (keyword in seen):
+                seen.add(keyword)
+                keywordItems.append((keyword, keywords[keyword]))
+    dicWordWeightItems = []
+    for keyword, tokens in keywords.iteritems():
+        for slug in tokens:
+            if slug in dicWordWeight:
+                dicWordWeightItems.append((slug, dicWordWeight.pop(slug)))
+    dicWordWeight = rebuildDict(dicWordWeightItems)
+    equivalenceItems = []
+    if len(equivalences)>0:
+        with codecs.open(os.path.join(UtilsConstants.pathKeywords,"equivalences.txt"),"r","utf-8") as fichier:
+            for line in fichier:
+                for t in line[:-2].split(";")[:-1]:
+                    equivalenceItems.append((t, equivalences[t]))
+    lexicon = {"keywords":keywordItems,
+               "dicWordWeight":dicWordWeightItems,
+               "dicSlug":[(slug, dicSlug[slug]) for slug in dicWordWeight],
+               "equivalences":equivalenceItems}
+    lexiconFilename = getLexiconFilename(filename)
+    try:
+        with open(lexiconFilename+".tmp","wb") as fichier:
+            cPickle.dump(header, fichier, cPickle.HIGHEST_PROTOCOL)
+            cPickle.dump(lexicon, fichier, cPickle.HIGHEST_PROTOCOL)
+        try:
+            os.rename(lexiconFilename+".tmp", lexiconFilename)
+        except OSError:
+            # windows doesn't replace existing files
+            os.remove(lexiconFilename)
+            os.rename(lexiconFilename+".tmp", lexiconFilename)
+    except (IOError, OSError):
+        print "unable to save the lexicon", lexiconFilename
+    return keywords, dicWordWeight, dicSlug, equivalences
+
+def rebuildDict(items):
+    '''
+    function building a dictionary by inserting the items in the given order
+    '''
+    dic = {}
+    for key, value in items:
+        dic[key] = value
+    return dic
+
+def importLexicon(filename = os.path.join(UtilsConstants.pathKeywords,"keywords.txt")):
+    '''
+    function that imports the compiled lexicon of a keywords file,
+    compiling it first if it doesn't exist or if it is not up to date.
+    The returned objects are the same as the ones computed by
+    'importKeywords()', 'UtilsConstants.importDicWordWeight()', 'KeywordSelector.computeDicSlug()' and 'importSlugEquivalence()'
+    -- IN:
+    filename : the full name of the file of keywords (str) default = motscles/keywords.txt
+    -- OUT:
+    keywords : the dictionary containing the keywords {keyword (str): [stems (str)]}
+    dicWordWeight : the dictionary containing stems and their frequencies {stems (str): freq (int)}
+    dicSlug : dictionary of the keywords starting with each slug (dic{slug(str):[keyword(str)]})
+    equivalences : dictionary containing the equivalences ({slug : [slug1, slug2...]})
+    '''
+    lexiconFilename = getLexiconFilename(filename)
+    if os.path.isfile(lexiconFilename):
+        try:
+            with open(lexiconFilename,"rb") as fichier:
+                header = cPickle.load(fichier)
+                if isLexiconUpToDate(filename, header):
+                    lexicon = cPickle.load(fichier)
+                    return (rebuildDict(lexicon["keywords"]),
+                            rebuildDict(lexicon["dicWordWeight"]),
+                            rebuildDict(lexicon["dicSlug"]),
+                            rebuildDict(lexicon["equivalences"]))
+        except Exception:
+            # corrupted or outdated lexicon, compiled again below
+            pass
+    return compileLexicon(filename)
+
 def saveKeywords(keywords, path = UtilsConstants.pathKeywords, filename = "keywords.txt"):  
     '''
     function that saves the list of keywords under the file named filename
@@ -285,13 +767,16 @@ def importDefaultKeywords(codeNAF):
 
 ''' functions about graph saving and importing'''
                    
-def saveGraph(graph):
+def saveGraph(graph, binary=True):
     ''' 
     function that stores one graph in the current directory.
     This is done by creating two files one for the nodes, and one for the edges.
     The name used to save the graph is the one contained in the graph attributes.
+    The graph is also saved in the binary format, read faster by importGraph (cf. saveGraphBinary).
     -- IN:
     graph : the graph to store (Graph)
+    binary : boolean that settles if the binary format is saved too (boolean) default = True
+        (-> if False, the previous binary format is removed)
     -- OUT:
     the function returns True if everything went fine, False else.    
     '''
@@ -321,18 +806,43 @@ def saveGraph(graph):
             except:
                 print "problem during the writing of edges file"
                 return False
+    if binary:
+        return saveGraphBinary(graph)
+    elif os.path.isdir(getGraphBinaryDirectory(graph.name)):
+        shutil.rmtree(getGraphBinaryDirectory(graph.name))
     return True
 
-def importGraph(filename, edges=True):
+def importGraph(filename, edges=True, backend=None, mmap=False):
     '''
     function that imports a complete graph, including graphNodes and graphEdges
     the os path must be settle in the subset file
     -- IN:
     subsetname: name of the subset from which import the graph (str)
     /!\ must be in the correct sub-directory
+    edges : boolean that settles if the edges are imported (boolean) default = True
+    backend : representation of the graph, "dict" or "csr" (str) default = None (-> UtilsConstants.graphBackend)
+        (-> "csr" returns a read-only CSRGraphKeyword, much smaller, cf. GraphProcessing)
+    the graph is read from its binary format if it exists and is up to date (cf. saveGraphBinary),
+    from its text files else.
+    mmap : boolean that settles if the graph is a read-only CSRGraphKeyword whose arrays are memory-mapped
+        from the binary format (which is saved first if needed) (boolean) default = False
+        (-> the processes opening the same graph then share a single copy of it in memory)
+    when edges = "lazy", the graph is a read-only LazyCSRGraphKeyword whose edges are read on demand
+        from the binary format (which is saved first if needed), node by node, the edges of the most
+        recently used nodes being kept in memory (-> cf. GraphProcessing.LazyCSRGraphKeyword)
     --OUT:
-    graph: imported graph (GraphKeyword)
+    graph: imported graph (GraphKeyword or CSRGraphKeyword)
     '''
+    if backend is None:
+        backend = UtilsConstants.graphBackend
+    if mmap or edges == "lazy":
+        if not isGraphBinaryUpToDate("graph_"+filename):
+            saveGraphBinary(importGraph(filename, backend="dict"))
+        return importGraphBinary(filename, edges, "csr", mmapMode="r" if mmap else None)
+    if isGraphBinaryUpToDate("graph_"+filename):
+        return importGraphBinary(filename, edges, backend)
+    if backend == "csr":
+        return importCSRGraph(filename, edges)
     graph = GraphKeyword("graph_"+filename)
     if not("graph_"+filename+"_nodes.txt" in os.listdir(".")):
         print "non-existing graphNodes:",filename
@@ -371,8 +881,260 @@ def importGraph(filename, edges=True):
                     graph.graphNodes[int(tab[0])].neighbours[graph.getNode(int(tab[1]))] = float(tab[2])
                     graph.graphNodes[int(tab[1])].neighbours[graph.getNode(int(tab[0]))] = float(tab[2])
     return graph
+
+def importCSRGraph(filename, edges=True):
+    '''
+    function that imports a graph directly into a compact graph, without creating the Node and Edge objects
+    the os path must be settle in the subset file
+    -- IN:
+    filename: name of the subset from which import the graph (str)
+    edges : boolean that settles if the edges are imported (boolean) default = True
+    --OUT:
+    graph: imported graph (CSRGraphKeyword)
+    '''
+    if not("graph_"+filename+"_nodes.txt" in os.listdir(".")) or not("graph_"+filename+"_edges.txt" in os.listdir(".")):
+        print "non-existing graph:",filename
+        return GraphProcessing.buildCSRGraph("graph_"+filename, [], [])
+    # importing nodes
+    nodes = []
+    with codecs.open("graph_"+filename+"_nodes.txt","r","utf-8") as fichier:
+        for line in fichier:
+            if line[0]==u'\ufeff':
+                tab = line[1:].split("_")
+            else:
+                tab = line.split("_")
+            valuesNAF = []
+            for element in tab[3].split(','):
+                tab1 = element.split("-")
+                if len(tab1)>1:
+                    valuesNAF.append((str(tab1[0]), float(tab1[1])))
+            nodes.append((int(tab[0]), tab[1], float(tab[2]), valuesNAF))
+    # importing edges
+    listEdges = []
+    if edges:
+        with codecs.open("graph_"+filename+"_edges.txt","r","utf-8") as fichier:
+            for line in fichier:
+                if len(line)>3:
+                    tab = line.split("_")
+                    listEdges.append((int(tab[0]), int(tab[1]), float(tab[2]), int(tab[3])))
+    return GraphProcessing.buildCSRGraph("graph_"+filename, nodes, listEdges)
+     
+''' binary graph format '''
+
+# Besides the text files, the graph is saved in a binary format : the directory 'graph_xxx_binary'
+# contains a header ('header.txt') and one numpy file (.npy) per array, which can be memory-mapped.
+# importGraph reads the binary format when it exists and is up to date with the text files,
+# which are still written for the export.
+# The values are rounded as in the text files, so that both formats give the same graph,
+# and the nodes, their codeNAF and the edges are stored in the order of the text files.
+
+graphBinaryVersion = 1
+
+graphBinaryArrays = ["ids", "nameBytes", "nameOffsets", "genericities",
+                     "codesNAF", "nafIndptr", "nafIndices", "nafValues", "sizes",
+                     "edgeIds0", "edgeIds1", "edgeValues", "edgeOccurrences",
+                     "indptr", "indices", "weights", "occurrences"]
+
+def getGraphBinaryDirectory(name):
+    '''
+    function returning the directory of the binary format of a graph
+    -- IN:
+    name : name of the graph, as in its text files ('graph_xxx') (str)
+    '''
+    return name+"_binary"
+
+def saveGraphBinary(graph):
+    '''
+    function that stores a graph in the binary format, in the current directory.
+    The text files of the graph must have been written before, their signatures being kept in the header.
+    -- IN:
+    graph : the graph to store (GraphKeyword or CSRGraphKeyword)
+    -- OUT:
+    the function returns True if everything went fine, False else.
+    '''
+    nodes = []
+    for node in graph.graphNodes.values():
+        valuesNAF = [(str(codeNAF), float(str(node.dicNAF[codeNAF]))) for codeNAF in node.dicNAF]
+        nodes.append((node.id, node.name, float(str(node.genericity)), valuesNAF))
+    edges = [(key[0], key[1], float('%.2f' %edge.value), edge.nbOccurence) for key, edge in graph.graphEdges.items()]
+    compactGraph = GraphProcessing.buildCSRGraph(graph.name, nodes, edges)
+    names = [node[1].encode("utf-8") for node in nodes]
+    arrays = {"ids":compactGraph.ids,
+              "nameBytes":np.fromstring("".join(names), dtype=np.uint8),
+              "nameOffsets":np.cumsum([0]+[len(name) for name in names]).astype(np.int64),
+              "genericities":compactGraph.genericities,
+              "codesNAF":np.array(compactGraph.codesNAF if len(compactGraph.codesNAF)>0 else [""], dtype=str),
+              "nafIndptr":compactGraph.matrixNAF.indptr.astype(np.int64),
+              "nafIndices":compactGraph.matrixNAF.indices.astype(np.int32),
+              "nafValues":compactGraph.matrixNAF.data.astype(np.float64),
+              "sizes":compactGraph.sizes,
+              "edgeIds0":np.array([edge[0] for edge in edges], dtype=np.int64),
+              "edgeIds1":np.array([edge[1] for edge in edges], dtype=np.int64),
+              "edgeValues":np.array([edge[2] for edge in edges], dtype=np.float64),
+              "edgeOccurrences":np.array([edge[3] for edge in edges], dtype=np.int32),
+              "indptr":compactGraph.indptr,
+              "indices":compactGraph.indices,
+              "weights":compactGraph.weights,
+              "occurrences":compactGraph.occurrences}
+    directory = getGraphBinaryDirectory(graph.name)
+    try:
+        if os.path.isdir(directory+".tmp"):
+            shutil.rmtree(directory+".tmp")
+        os.mkdir(directory+".tmp")
+        for key in graphBinaryArrays:
+            np.save(os.path.join(directory+".tmp",key+".npy"), arrays[key])
+        with open(os.path.join(directory+".tmp","header.txt"),"w") as fichier:
+            fichier.write("version;"+str(graphBinaryVersion)+"\n")
+            fichier.write("nbNodes;"+str(len(nodes))+"\n")
+            fichier.write("nbCodesNAF;"+str(len(compactGraph.codesNAF))+"\n")
+            fichier.write("nbEdges;"+str(len(edges))+"\n")
+            for suffix in ["nodes", "edges"]:
+                signature = getFileSignature(graph.name+"_"+suffix+".txt")
+                if not(signature is None):
+                    fichier.write(suffix+";"+";".join([repr(signature[0]), str(signature[1]), signature[2]])+"\n")
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+        os.rename(directory+".tmp", directory)
+    except (IOError, OSError):
+        print "problem during the writing of the binary graph"
+        return False
+    return True
+
+def importGraphHeader(name):
+    '''
+    function that reads the header of the binary format of a graph, in the current directory
+    -- IN:
+    name : name of the graph, as in its text files ('graph_xxx') (str)
+    -- OUT:
+    header : dictionary of the header (dic{"version", "nbNodes", "nbCodesNAF", "nbEdges" : int, "nodes", "edges" : signature}),
+        None if the binary format doesn't exist
+    '''
+    filename = os.path.join(getGraphBinaryDirectory(name),"header.txt")
+    if not os.path.isfile(filename):
+        return None
+    header = {}
+    with open(filename,"r") as fichier:
+        for line in fichier:
+            tab = line.strip().split(";")
+            if tab[0] in ["nodes", "edges"]:
+                header[tab[0]] = (float(tab[1]), int(tab[2]), tab[3])
+            elif len(tab)>1:
+                header[tab[0]] = int(tab[1])
+    return header
+
+def isGraphBinaryUpToDate(name):
+    '''
+    function that checks if the binary format of a graph exists, has the current version
+    and corresponds to its text files (when they exist)
+    -- IN:
+    name : name of the graph, as in its text files ('graph_xxx') (str)
+    -- OUT:
+    the function returns True if the binary format can be used, False else
+    '''
+    header = importGraphHeader(name)
+    if header is None or header.get("version") != graphBinaryVersion:
+        return False
+    for suffix in ["nodes", "edges"]:
+        filename = name+"_"+suffix+".txt"
+        if os.path.isfile(filename) and not checkFileSignature(filename, header.get(suffix)):
+            return False
+    return True
+
+def importGraphArrays(name, mmapMode = None, keys = graphBinaryArrays):
+    '''
+    function that reads the arrays of the binary format of a graph, in the current directory
+    -- IN:
+    name : name of the graph, as in its text files ('graph_xxx') (str)
+    mmapMode : mode of memory-mapping of the arrays, cf. numpy.load (str) default = None
+        (-> let None to read the arrays in memory)
+    keys : names of the arrays to read (list[str]) default = graphBinaryArrays
+    -- OUT:
+    arrays : dictionary of the arrays (dic{name(str):np.array})
+    '''
+    directory = getGraphBinaryDirectory(name)
+    return {key : np.load(os.path.join(directory,key+".npy"), mmap_mode = mmapMode) for key in keys}
+
+def getGraphNames(arrays):
+    nameBytes = arrays["nameBytes"].tostring()
+    nameOffsets = arrays["nameOffsets"].tolist()
+    return [nameBytes[nameOffsets[row]:nameOffsets[row+1]].decode("utf-8") for row in xrange(len(nameOffsets)-1)]
+
+def importGraphBinary(filename, edges=True, backend="dict", mmapMode = None):
+    '''
+    function that imports a graph saved in the binary format, in the current directory
+    -- IN:
+    filename: name of the subset from which import the graph (str)
+    edges : boolean that settles if the edges are imported (boolean) default = True
+        (-> "lazy" to read the edges on demand, with the "csr" backend only, cf. GraphProcessing.LazyCSRGraphKeyword)
+    backend : representation of the graph, "dict" or "csr" (str) default = "dict"
+    mmapMode : mode of memory-mapping of the arrays of the "csr" graph, cf. numpy.load (str) default = None
+    --OUT:
+    graph: imported graph (GraphKeyword, CSRGraphKeyword or LazyCSRGraphKeyword)
+    '''
+    name = "graph_"+filename
+    header = importGraphHeader(name)
+    # only the arrays needed are read
+    edgeArrays = ["edgeIds0", "edgeIds1", "edgeValues", "edgeOccurrences", "indices", "weights", "occurrences"]
+    if edges == "lazy":
+        keys = [key for key in graphBinaryArrays if not key in edgeArrays]
+    elif edges:
+        keys = graphBinaryArrays
+    else:
+        keys = [key for key in graphBinaryArrays if not key in edgeArrays+["indptr"]]
+    arrays = importGraphArrays(name, mmapMode, keys)
+    names = getGraphNames(arrays)
+    codesNAF = arrays["codesNAF"].tolist()[:header["nbCodesNAF"]]
+    if backend == "csr":
+        matrixNAF = scipy.sparse.csr_matrix((arrays["nafValues"], arrays["nafIndices"], arrays["nafIndptr"]),
+                                            shape=(len(names), len(codesNAF)))
+        if edges == "lazy":
+            return GraphProcessing.LazyCSRGraphKeyword(name, arrays["ids"], names, arrays["genericities"], codesNAF,
+                                                       matrixNAF, arrays["sizes"], arrays["indptr"],
+                                                       getGraphBinaryDirectory(name))
+        if edges:
+            indptr = arrays["indptr"]
+            indices = arrays["indices"]
+            weights = arrays["weights"]
+            occurrences = arrays["occurrences"]
+        else:
+            indptr = np.zeros(len(names)+1, dtype=np.int64)
+            indices = np.zeros(0, dtype=np.int32)
+            weights = np.zeros(0, dtype=np.float64)
+            occurrences = np.zeros(0, dtype=np.int32)
+        return GraphProcessing.CSRGraphKeyword(name, arrays["ids"], names, arrays["genericities"], codesNAF,
+                                               matrixNAF, arrays["sizes"], indptr, indices, weights, occurrences)
+    graph = GraphKeyword(name)
+    ids = arrays["ids"].tolist()
+    genericities = arrays["genericities"].tolist()
+    sizes = arrays["sizes"].tolist()
+    nafIndptr = arrays["nafIndptr"].tolist()
+    nafIndices = arrays["nafIndices"].tolist()
+    nafValues = arrays["nafValues"].tolist()
+    for row in xrange(len(ids)):
+        node = Node(ids[row], names[row])
+        node.genericity = genericities[row]
+        dicNAF = node.dicNAF
+        for k in xrange(nafIndptr[row], nafIndptr[row+1]):
+            dicNAF[codesNAF[nafIndices[k]]] = nafValues[k]
+        node.size = sizes[row]
+        graph.dicIdNodes[names[row]] = ids[row]
+        graph.graphNodes[ids[row]] = node
+    if edges:
+        graphNodes = graph.graphNodes
+        graphEdges = graph.graphEdges
+        for id0, id1, value, nbOccurence in zip(arrays["edgeIds0"].tolist(), arrays["edgeIds1"].tolist(),
+                                                 arrays["edgeValues"].tolist(), arrays["edgeOccurrences"].tolist()):
+            edge = Edge(id0, id1)
+            edge.value = value
+            edge.nbOccurence = nbOccurence
+            graphEdges[(id0, id1)] = edge
+            node0 = graphNodes[id0]
+            node1 = graphNodes[id1]
+            node0.neighbours[node1] = value
+            node1.neighbours[node0] = value
+    return graph
      
-def saveGexfFile(filename, graph, thresoldEdge=0.0, codeNAF="", keywords = None, origins = None):
+def saveGexfFile(filename, graph, thresoldEdge=0.0, codeNAF="", keywords = None, origins = None, compress = False):
     '''
     Function that saves the graph under a .gexf file
     to allow a further visualisation using the free software Gephi.
@@ -385,77 +1147,153 @@ def saveGexfFile(filename, graph, thresoldEdge=0.0, codeNAF="", keywords = None,
         (-> let "" to delete the filter over the codeNAF)
     keywords : list or dic selected keywords to display ([] or {}) default = None
         (-> let None to display all the keywords)
-    origins : dic linking all the keywords to an integer reflecting their origin ({keyword(str) : origin(int)}
+        (-> only these nodes and the edges between them are visited, through the name index of the graph)
+    origins : list or dic linking all the keywords to an integer reflecting their origin ({keyword(str) : origin(int)}
         (-> only used if keywords is set)
+    compress : boolean that settles if the file is compressed with gzip (boolean) default = False
+        (-> the extension .gz is then added to the filename, if missing)
     -- OUT
     the function returns True if everything went fine, False else.
     '''
-    with codecs.open(filename,"w","utf-8") as fichier:
-        try:
-            # writing header
-            fichier.write("<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n")
-            fichier.write("<gexf xmlns=\"http://www.gexf.net/1.2draft\" \
+    return saveGexfFiles(graph, [(filename, keywords, origins)], thresoldEdge, codeNAF, compress)
+
+def saveGexfFiles(graph, subgraphs, thresoldEdge=0.0, codeNAF="", compress = False):
+    '''
+    Function that saves many subgraphs of the graph under .gexf files in one pass,
+    typically the selected keywords of each description (cf. KeywordSelector.pipeline).
+    -- IN
+    graph : complete graph object (graph)
+    subgraphs : list of the subgraphs to save ([(filename(str), keywords, origins), ...])
+        (-> cf. saveGexfFile for the keywords and origins)
+    thresoldEdge, codeNAF, compress : cf. saveGexfFile
+    -- OUT
+    the function returns True if everything went fine, False else.
+    '''
+    header = getGexfHeader()
+    result = True
+    for filename, keywords, origins in subgraphs:
+        result = writeGexfFile(filename, graph, header, thresoldEdge, codeNAF, keywords, origins, compress) and result
+    return result
+
+def getGexfHeader():
+    return "".join(["<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n",
+                    "<gexf xmlns=\"http://www.gexf.net/1.2draft\" \
                             xmlns:viz=\"http://www.gexf.net/1.2draft/viz\" \
-                            version=\"1.2\">\n")
-            fichier.write("<meta lastmodifieddate=\""+time.strftime('%d/%m/%y',time.localtime())+"\">\n")
-            fichier.write("<creator>Kevin Bienvenu</creator>\n")
-            fichier.write("<description>A subset graph file</description>\n")
-            fichier.write("</meta>\n")
-            # writing graph
-            fichier.write("<graph>\n")
-            # writing nodes
-            fichier.write("<nodes>\n")
-            for node in graph.graphNodes.values():
-                if (keywords is None and codeNAF=="") \
-                    or ((codeNAF=="" or codeNAF in node.dicNAF) \
-                        and ((keywords is None) or node.name in keywords)):
-                    fichier.write("<node id=\"")
-                    fichier.write(str(node.id))
-                    fichier.write("\" label=\"")
-                    fichier.write(node.name.replace("&","et"))
-                    fichier.write("\">\n")
-                    r,g,b = node.color
-                    if not(keywords is None) and node.name in keywords:
-                        size = int(10*keywords[node.name])
-                        if origins[node.name][0] == 1:
-                            r,g,b = 0,0,255
-                        else:
-                            r,g,b = 255,120,0
-                    elif node.size == 0:
-                        if (codeNAF!="" and codeNAF in node.dicNAF):
-                            size = node.dicNAF[codeNAF]
-                        else:
-                            size = sum(node.dicNAF.values())
-                    else:
-                        size = node.size              
-                    fichier.write("<viz:color r=\""+str(r)+"\" g=\""+str(g)+"\" b=\""+str(b)+"\" a=\"0.9\"/>\n")
-                    fichier.write("<viz:size value=\""+str(size)+"\"/>\n")
-                    fichier.write("</node>")
-            fichier.write("</nodes>\n")
-            # writing edges
-            fichier.write("<edges>\n")
-            i=0
-            for edge in graph.graphEdges.values():
-                if edge.value>thresoldEdge \
-                and (keywords is None \
-                     or (graph.graphNodes[edge.id0].name in keywords \
-                         and graph.graphNodes[edge.id1].name in keywords)):
-                    fichier.write("<edge id=\"")
-                    fichier.write(str(i))
-                    fichier.write("\" source=\"")
-                    fichier.write(str(edge.id0))
-                    fichier.write("\" target=\"")
-                    fichier.write(str(edge.id1))
-                    fichier.write("\" type=\"undirected\" weight=\"")
-                    fichier.write(str(edge.value))
-                    fichier.write("\"/>\n")
-                    i+=1
-            fichier.write("</edges>\n")
-            fichier.write("</graph>\n")
-            fichier.write("</gexf>")
-        except:
-            print "Error during the saving of the graph under .gexf format"
-            False
+                            version=\"1.2\">\n",
+                    "<meta lastmodifieddate=\""+time.strftime('%d/%m/%y',time.localtime())+"\">\n",
+                    "<creator>Kevin Bienvenu</creator>\n",
+                    "<description>A subset graph file</description>\n",
+                    "</meta>\n"])
+
+def getGexfKeywords(keywords, origins):
+    '''
+    function returning the keywords and their origins as dictionaries,
+    the lists being those returned by KeywordSelector.selectKeyword (the value of each keyword is then 1.0)
+    '''
+    if keywords is None or isinstance(keywords, dict):
+        return keywords, origins
+    if not(origins is None) and not(isinstance(origins, dict)):
+        origins = dict(zip(keywords, origins))
+    return {keyword : 1.0 for keyword in keywords}, origins
+
+def getGexfNodes(graph, codeNAF, keywords):
+    '''
+    function returning the nodes to save : the nodes of the keywords if they are set, found through the name index,
+    all the nodes of the graph else, filtered by codeNAF.
+    '''
+    if keywords is None:
+        nodes = graph.graphNodes.itervalues()
+    else:
+        nodes = [graph.getNodeByName(name) for name in keywords]
+        nodes = [node for node in nodes if not(node is None)]
+    if codeNAF != "":
+        return [node for node in nodes if codeNAF in node.dicNAF]
+    return nodes
+
+def getGexfEdges(graph, thresoldEdge, nodes, filtered):
+    '''
+    function returning the edges to save : the edges between the given nodes if they are filtered,
+    all the edges of the graph else, over the threshold.
+    '''
+    if not filtered:
+        return (edge for edge in graph.graphEdges.itervalues() if edge.value>thresoldEdge)
+    graphEdges = graph.graphEdges
+    ids = sorted(set([node.id for node in nodes]))
+    if len(ids)*len(ids)>2*len(graphEdges):
+        ids = set(ids)
+        return (edge for edge in graphEdges.itervalues()
+                if edge.value>thresoldEdge and edge.id0 in ids and edge.id1 in ids)
+    edges = []
+    for k in xrange(len(ids)):
+        for id1 in ids[k+1:]:
+            if (ids[k], id1) in graphEdges:
+                edge = graphEdges[(ids[k], id1)]
+                if edge.value>thresoldEdge:
+                    edges.append(edge)
+    return edges
+
+def writeGexfFile(filename, graph, header, thresoldEdge=0.0, codeNAF="", keywords = None, origins = None, compress = False):
+    '''
+    function writing a .gexf file (cf. saveGexfFile), the file being written by blocks of lines
+    '''
+    keywords, origins = getGexfKeywords(keywords, origins)
+    filtered = not(keywords is None) or codeNAF != ""
+    nodes = getGexfNodes(graph, codeNAF, keywords)
+    if compress:
+        if not filename.endswith(".gz"):
+            filename += ".gz"
+        fichier = gzip.open(filename, "wb")
+    else:
+        fichier = open(filename, "wb")
+    lines = [header, "<graph>\n", "<nodes>\n"]
+    def flush(lines):
+        fichier.write(u"".join(lines).encode("utf-8"))
+        del lines[:]
+    try:
+        # writing nodes
+        if filtered:
+            nodes = list(nodes)
+        for node in nodes:
+            r,g,b = node.color
+            if not(keywords is None):
+                size = int(10*keywords[node.name])
+                if origins is None:
+                    pass
+                elif origins[node.name][0] == 1:
+                    r,g,b = 0,0,255
+                else:
+                    r,g,b = 255,120,0
+            elif node.size == 0:
+                if (codeNAF!="" and codeNAF in node.dicNAF):
+                    size = node.dicNAF[codeNAF]
+                else:
+                    size = sum(node.dicNAF.values())
+            else:
+                size = node.size
+            lines.append(u"<node id=\""+str(node.id)+u"\" label=\""+node.name.replace("&","et")+u"\">\n"
+                         +u"<viz:color r=\""+str(r)+u"\" g=\""+str(g)+u"\" b=\""+str(b)+u"\" a=\"0.9\"/>\n"
+                         +u"<viz:size value=\""+str(size)+u"\"/>\n</node>")
+            if len(lines)>=1000:
+                flush(lines)
+        lines.append("</nodes>\n")
+        # writing edges
+        lines.append("<edges>\n")
+        i = 0
+        for edge in getGexfEdges(graph, thresoldEdge, nodes, filtered):
+            lines.append("<edge id=\""+str(i)+"\" source=\""+str(edge.id0)+"\" target=\""+str(edge.id1)
+                         +"\" type=\"undirected\" weight=\""+str(edge.value)+"\"/>\n")
+            i+=1
+            if len(lines)>=1000:
+                flush(lines)
+        lines.append("</edges>\n")
+        lines.append("</graph>\n")
+        lines.append("</gexf>")
+        flush(lines)
+    except:
+        print "Error during the saving of the graph under .gexf format"
+        return False
+    finally:
+        fichier.close()
     return True
         
   
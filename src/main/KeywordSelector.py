@@ -18,20 +18,20 @@ of the main algorithm.
 ''' Main pipeline functions '''
 
 import codecs
+import collections
+import multiprocessing
 from operator import itemgetter
 import operator
 import os
 import random
 import time
 
-from nltk.corpus import stopwords
-import nltk.stem.snowball
-
-import GraphLearning, IOFunctions, UtilsConstants
+import GraphLearning, GraphProcessing, IOFunctions, UtilsConstants
 import numpy as np
 
 
-def pipeline(descriptions, nbMot = 5, printProgress = False, printGraph = False, toPrint = False, savename = None):
+def pipeline(descriptions, nbMot = 5, printProgress = False, printGraph = False, toPrint = False, savename = None, 
+             graph = None, keywordSet = None, dicWordWeight = None, equivalences = None, dicSlug = None, slugIndex = None):
     '''
     Pipeline function taking as input an array of entreprises containing the codeNAF and description
     and giving as output a list of keywords for each description.
@@ -41,6 +41,8 @@ def pipeline(descriptions, nbMot = 5, printProgress = False, printGraph = False,
     printGraph : boolean that settles if the function has to print the graphs for the descriptions (boolean) default = False
         those graphs will only contain the selected keywords and display them according to their relevance and origins
         they will be saved in the subfolder "graphtest", in pathCodeNAF.
+    graph, keywordSet, dicWordWeight, equivalences, dicSlug, slugIndex : *optional - preloaded graph and keywords (cf. selectKeyword) default = None
+        (-> let None to import them, useful to import them only once when the pipeline is run on many batches)
     -- OUT:
     keywords : list of lists of keywords {description (str) : {"keyword_0": kw0(str), "keyword_1" : ...} }
     '''
@@ -55,28 +57,44 @@ def pipeline(descriptions, nbMot = 5, printProgress = False, printGraph = False,
             print "error : invalid input, format error."
         return {}
     # importing graph and keywords
-    try:
-        os.chdir(os.path.join(UtilsConstants.pathCodeNAF,"graphcomplet"))
-        graph = IOFunctions.importGraph("graphcomplet")
-    except:
-        print "veuillez calculer le graph complet avant de lancer le pipeline"
-        return
-    keywordSet = IOFunctions.importKeywords()
-    dicWordWeight = UtilsConstants.importDicWordWeight(keywordSet)
-    equivalences = IOFunctions.importSlugEquivalence()
+    if graph is None:
+        try:
+            os.chdir(os.path.join(UtilsConstants.pathCodeNAF,"graphcomplet"))
+            graph = IOFunctions.importGraph("graphcomplet")
+        except:
+            print "veuillez calculer le graph complet avant de lancer le pipeline"
+            return
+    if keywordSet is None:
+        keywordSet, dicWordWeight, dicSlug, lexiconEquivalences = IOFunctions.importLexicon()
+        if equivalences is None:
+            equivalences = lexiconEquivalences
+        slugIndex = None
+    if dicWordWeight is None:
+        dicWordWeight = UtilsConstants.importDicWordWeight(keywordSet)
+    if equivalences is None:
+        equivalences = IOFunctions.importSlugEquivalence()
+    if dicSlug is None:
+        dicSlug = computeDicSlug(keywordSet, dicWordWeight)
+        slugIndex = None
+    if slugIndex is None:
+        slugIndex = computeSlugIndex(dicSlug, equivalences)
     keywords = {}
     i = 0
     os.chdir(UtilsConstants.pathCodeNAF+"/graphtest")
     compt = UtilsConstants.Compt(descriptions,0.1, printTime=True)
+    subgraphs = []
     for line in descriptions:
-        keywordlist, origins, _ = selectKeyword(line[2],line[1], graph, keywordSet, dicWordWeight, equivalences, localKeywords=False, n=nbMot, toPrint=toPrint)
+        keywordlist, origins, values = selectKeyword(line[2],line[1], graph, keywordSet, dicWordWeight, equivalences, dicSlug=dicSlug, slugIndex=slugIndex, localKeywords=False, n=nbMot, toPrint=toPrint)
         keywords[line[0]] = {"keyword_"+str(i) : keywordlist[i] for i in range(len(keywordlist))}
         if printGraph:
-            os.chdir(UtilsConstants.pathCodeNAF+"/graphtest")
-            IOFunctions.saveGexfFile("graph_test_"+str(i)+".gexf", graph, keywords = keywordlist, origins = origins)
+            subgraphs.append(("graph_test_"+str(i)+".gexf", dict(zip(keywordlist, values)), dict(zip(keywordlist, origins))))
         i+=1
         if printProgress:
             compt.updateAndPrint()
+    if printGraph:
+        # all the graphs are saved in one pass
+        os.chdir(UtilsConstants.pathCodeNAF+"/graphtest")
+        IOFunctions.saveGexfFiles(graph, subgraphs)
     return keywords
 
 def pipelineTest(n = 1000):
@@ -112,7 +130,7 @@ def pipelineTest(n = 1000):
     print ""
     print "proportion d'entreprises sans keywords :",100.0*nbNoKw/n,"%"
 
-def selectKeyword(description, codeNAF, graph = None, keywordSet = None, dicWordWeight = None, equivalences = {}, localKeywords = False, n=50, steps = 3, toPrint = False):
+def selectKeyword(description, codeNAF, graph = None, keywordSet = None, dicWordWeight = None, equivalences = {}, dicSlug = None, slugIndex = None, localKeywords = False, n=50, steps = 3, toPrint = False):
     '''
     
     === MAIN FUNCTION FOR KEYWORD EXTRACTION ===
@@ -127,8 +145,12 @@ def selectKeyword(description, codeNAF, graph = None, keywordSet = None, dicWord
     keywordSet : dictionary of keywords with stems for values {keyword (str): [stems (str)]}
     dicWordWeight: the dictionary of the frequencies of the stems in keywordSet {stem (str) : freq (int)}
     equivalences : dictionary of the equivalences (dic)
+    dicSlug : dictionary of the keywords starting with each slug, computed from keywordSet (dic{slug(str):[keyword(str)]}) default = None
+    slugIndex : inverted index of the slugs, computed from dicSlug and equivalences (dic{stem(str):[(slug(str), value(float))]}) default = None
+        (-> both should be precomputed once when selecting keywords for many descriptions)
     localKeywords : boolean that settles if the used keywords are the global one or the one corresponding to the codeNAF (boolean) default = False
-        (-> if True, the algorithm will import the keywords in the corresponding codeNAF folder and therefore there is no need to specifiy the keywordSet and dicWordWeight)
+        (-> if True, the algorithm will import the keywords in the corresponding codeNAF folder and therefore there is no need to specifiy the keywordSet and dicWordWeight,
+            the global keywords being used if the codeNAF has no local keywords, cf. IOFunctions.importLocalKeywords)
     n : maximal number of returned keywords (int) default = 50
     steps: the higher step to perform in the algorithm, if 0 no step will be performed, if 4 all will be.
     toPrint : boolean that settles if the function must print the results or not (boolean) default = False
@@ -142,7 +164,9 @@ def selectKeyword(description, codeNAF, graph = None, keywordSet = None, dicWord
         print description
     origin = {}
     if localKeywords:
-        keywordSet = IOFunctions.importKeywords(codeNAF)
+        keywordSet = IOFunctions.importLocalKeywords(codeNAF)
+        dicSlug = None
+        slugIndex = None
     elif keywordSet is None or dicWordWeight is None:
         keywordSet = IOFunctions.importKeywords()
     if dicWordWeight is None:
@@ -164,6 +188,8 @@ def selectKeyword(description, codeNAF, graph = None, keywordSet = None, dicWord
                                                      keywords = keywordSet,
                                                      dicWordWeight = dicWordWeight, 
                                                      equivalences = equivalences, 
+                                                     dicSlug = dicSlug,
+                                                     slugIndex = slugIndex,
                                                      booleanMatchParfait=True, 
                                                      toPrint=False)
         except:
@@ -471,9 +497,9 @@ def computeSlugEquivalence():
     print len(similaires)
     print ""
     exemples = [[] for _ in similaires]
-    stem = nltk.stem.snowball.FrenchStemmer()
+    stem = UtilsConstants.tokenizerContext.stemmer
     for keyword in keywords:
-        mots = UtilsConstants.tokenizeAndStemmerize(keyword, keepComa=False, stem = stem, method="")
+        mots = UtilsConstants.tokenizeAndStemmerize(keyword, keepComa=False)
         stems = [stem.stem(mot) for mot in mots]
         j=0
         for si in similaires:
@@ -534,7 +560,7 @@ def deleteKeyword(keywords, varProgress = None, toPrint = False):
                             os.chdir(os.path.join(UtilsConstants.pathCodeNAF,"graphcomplet"))
                     except:
                         continue
-                    graph = IOFunctions.importGraph(name)
+                    graph = IOFunctions.importGraph(name, backend="dict")
                     
                 graph.deleteNode(keyword)
         if flag:
@@ -581,12 +607,25 @@ def extractGraphFromSubset(subsetname,
                            keywords = None,
                            dicWordWeight = None,
                            equivalences = None, 
-                           toPrint = False):
+                           toPrint = False,
+                           dicSlug = None,
+                           slugIndex = None,
+                           printProgress = True,
+                           nbWorkers = 1,
+                           shardSize = None):
     '''
     function that computes a graph (ie. dicIdNodes, graphNodes, graphEdges)
     out of a subset file, containing a 'keywords.txt' and a 'subsey_entreprises.txt' file
     -- IN:
     subsetname : name of the subset (string)
+    dicSlug, slugIndex : *optional - precomputed slugs of the keywords (cf. computeDicSlug, computeSlugIndex) default = None
+        (-> let None to compute them, useful to compute them only once when many subsets are processed)
+    printProgress : boolean that settles if the progress over the entreprises is printed (boolean) default = True
+    nbWorkers : number of processes building the graph (int) default = 1
+    shardSize : number of entreprises of the parts of the subset whose partial graphs are merged (int) default = None
+        (-> cf. buildGraphByShards, let None to build the graph over all the entreprises at once when nbWorkers = 1,
+        to use parts of shardSize entreprises else. The graph is the same as the graph built at once,
+        whatever nbWorkers and shardSize)
     -- OUT:
     graph : graph object containing the following attributes:
         dicIdNodes : dic of id of the nodes
@@ -597,54 +636,37 @@ def extractGraphFromSubset(subsetname,
         print "== Extracting graph from subset:",subsetname
     if toPrint:
         print "- importing subset",
-    entreprises = IOFunctions.importSubset(subsetname, path)
+    # the stems saved with the subset are used if they are up to date (cf. IOFunctions.saveSubsetTokens)
+    entreprises = IOFunctions.importSubset(subsetname, path, withTokens = True)
     if toPrint:
         print "... done"
     if entreprises is None or len(entreprises) == 0:
         return
-    graph = IOFunctions.GraphKeyword("graph_"+str(subsetname))
     if toPrint:
         print "- analyzing entreprises"
-    french_stopwords = set(stopwords.words('french')),
-    stem = nltk.stem.snowball.FrenchStemmer()
     # importing keywords and dicwords weight
     #     here, we also keep the global keywords for the keywords may change and become local.
     if keywords is None:
         keywords = IOFunctions.importKeywords()
         dicWordWeight = UtilsConstants.importDicWordWeight(keywords)
         equivalences = IOFunctions.importSlugEquivalence()
-    # computing dicslug 
-    dicSlug = {dic : [] for dic in dicWordWeight}
-    for keyword in keywords:
-        dicSlug[keywords[keyword][0]].append(keyword)
-    if localKeywords:
-        globalKeywords = dict(keywords)
-    else:
-        globalKeywords = None
-    
-    currentNAF = ""
+    # computing dicslug and the inverted index of the slugs
+    if dicSlug is None:
+        dicSlug = computeDicSlug(keywords, dicWordWeight)
+        slugIndex = None
+    if slugIndex is None:
+        slugIndex = computeSlugIndex(dicSlug, equivalences)
     if percent<100 and percent>0:
         entreprises = random.sample(entreprises, int(len(entreprises)*percent/100))
     # extracting information from the data
-    compt = UtilsConstants.Compt(entreprises, 0.1 if subsetname=="graphcomplet" else 10, printTime=subsetname=="graphcomplet")
-    for entreprise in entreprises:
-        if localKeywords and currentNAF != entreprise[0]:
-            currentNAF = entreprise[0]
-            if currentNAF!="nan" and "keywords.txt" in os.listdir(UtilsConstants.pathCodeNAF+"/subset_NAF_"+currentNAF):
-                keywords = IOFunctions.importKeywords(currentNAF)
-            else: 
-                keywords = IOFunctions.importKeywords()
-        stemmedDesc = UtilsConstants.tokenizeAndStemmerize(entreprise[1],True,french_stopwords,stem)
-        buildFromDescription(stemmedDesc = stemmedDesc, 
-                             codeNAF = entreprise[0], 
-                             keywords = keywords, 
-                             graph = graph, 
-                             dicWordWeight = dicWordWeight, 
-                             globalKeywords = globalKeywords, 
-                             equivalences = equivalences, 
-                             dicSlug = dicSlug,
-                             description = entreprise[1])
-        compt.updateAndPrint()
+    if nbWorkers>1 or not(shardSize is None):
+        graph = buildGraphByShards("graph_"+str(subsetname), entreprises, keywords, dicWordWeight, equivalences,
+                                   dicSlug, slugIndex, localKeywords, nbWorkers, shardSize, printProgress)
+    else:
+        graph = IOFunctions.GraphKeyword("graph_"+str(subsetname))
+        compt = UtilsConstants.Compt(entreprises, 0.1 if subsetname=="graphcomplet" else 10, printTime=subsetname=="graphcomplet")
+        buildFromEntreprises(entreprises, graph, keywords, dicWordWeight, equivalences, dicSlug, slugIndex,
+                             localKeywords, compt, printProgress)
     graph.removeLonelyNodes()
     keywordsGraph = []
     for node in graph.graphNodes.values():
@@ -660,6 +682,192 @@ def extractGraphFromSubset(subsetname,
         print "... done"
     return graph
 
+# keywords shared by the processes computing the graphs of the codeNAF (cf. extractGraphFromSubsets)
+# or the partial graphs of the graphcomplet (cf. buildGraphByShards),
+# they are inherited by the processes when they are forked and never modified.
+# (the main process also uses them when it computes the graphs by itself)
+graphWorkerState = {}
+
+def loadGraphWorkerState(keywords, dicWordWeight, equivalences, dicSlug, slugIndex):
+    '''
+    function that sets the keywords used to compute the graphs in the current process.
+    It is used as the initializer of the workers.
+    '''
+    graphWorkerState["keywords"] = keywords
+    graphWorkerState["dicWordWeight"] = dicWordWeight
+    graphWorkerState["equivalences"] = equivalences
+    graphWorkerState["dicSlug"] = dicSlug
+    graphWorkerState["slugIndex"] = slugIndex
+
+def buildFromEntreprises(entreprises, graph, keywords, dicWordWeight, equivalences, dicSlug, slugIndex,
+                         localKeywords = False, compt = None, printProgress = True):
+    '''
+    function that fills the graph with the descriptions of the entreprises (cf. buildFromDescription)
+    -- IN
+    entreprises : entreprises sorted by codeNAF (array) [[naf,desc]]
+        (-> or [[naf,desc,ids]] with the ids of the stems of the descriptions, cf. IOFunctions.importSubset)
+    graph : graph to fill (GraphKeyword or PartialGraphKeyword)
+    keywords, dicWordWeight, equivalences, dicSlug, slugIndex : keywords and slugs used (cf. buildFromDescription)
+    localKeywords : boolean that settles if the local keywords of each codeNAF are used (boolean) default = False
+        (-> the keywords are then kept as global keywords)
+    compt : progress over the entreprises (Compt) default = None
+    -- OUT
+    the function returns nothing
+    '''
+    if localKeywords:
+        globalKeywords = dict(keywords)
+    else:
+        globalKeywords = None
+    currentNAF = ""
+    for entreprise in entreprises:
+        if localKeywords and currentNAF != entreprise[0]:
+            currentNAF = entreprise[0]
+            keywords = IOFunctions.importLocalKeywords(currentNAF)
+        if len(entreprise)>2 and isinstance(entreprise[2], np.ndarray):
+            # the ids of the stems are matched with the encoded index of the slugs
+            stemmedDesc = entreprise[2]
+            encodedIndex = getEncodedSlugIndex(slugIndex)
+        else:
+            stemmedDesc = UtilsConstants.tokenizeAndStemmerize(entreprise[1],True,UtilsConstants.graphStopwords)
+            encodedIndex = None
+        buildFromDescription(stemmedDesc = stemmedDesc, 
+                             codeNAF = entreprise[0], 
+                             keywords = keywords, 
+                             graph = graph, 
+                             dicWordWeight = dicWordWeight, 
+                             globalKeywords = globalKeywords, 
+                             equivalences = equivalences, 
+                             dicSlug = dicSlug,
+                             slugIndex = slugIndex,
+                             description = entreprise[1],
+                             encodedIndex = encodedIndex)
+        if not(compt is None):
+            compt.updateAndPrint(printProgress)
+
+def processGraphShard(task):
+    '''
+    function computing the partial graph of a part of the entreprises, using the keywords of graphWorkerState
+    -- IN
+        task : entreprises of the part and boolean settling if the local keywords are used (tuple(array, boolean))
+    -- OUT
+        partial graph (PartialGraphKeyword), pid of the process (int) and time spent (float)
+    '''
+    entreprises, localKeywords = task
+    startTime = time.time()
+    graph = GraphProcessing.PartialGraphKeyword()
+    buildFromEntreprises(entreprises, graph, localKeywords = localKeywords, **graphWorkerState)
+    return graph, os.getpid(), time.time()-startTime
+
+def buildGraphByShards(name, entreprises, keywords, dicWordWeight, equivalences, dicSlug, slugIndex,
+                       localKeywords = False, nbWorkers = 1, shardSize = None, printProgress = True):
+    '''
+    function that builds the graph of the entreprises by cutting them into parts of shardSize entreprises,
+    whose partial graphs are computed by a pool of nbWorkers processes and then merged following the order of the parts.
+    The merged graph is the graph built over all the entreprises at once, whatever shardSize and the number of processes.
+    -- IN
+    name : name of the graph (str)
+    entreprises : entreprises sorted by codeNAF (array) [[naf,desc]]
+    keywords, dicWordWeight, equivalences, dicSlug, slugIndex : keywords and slugs used (cf. buildFromDescription)
+    localKeywords : boolean that settles if the local keywords of each codeNAF are used (boolean) default = False
+    nbWorkers : number of processes (int) default = 1
+    shardSize : number of entreprises of a part (int) default = None
+        (-> let None to use 10000 entreprises)
+    printProgress : boolean that settles if the progress over the parts is printed (boolean) default = True
+    -- OUT
+    graph : the graph built (GraphKeyword)
+    '''
+    if shardSize is None:
+        shardSize = 10000
+    tasks = [(entreprises[start:start+shardSize], localKeywords) for start in xrange(0, len(entreprises), shardSize)]
+    loadGraphWorkerState(keywords, dicWordWeight, equivalences, dicSlug, slugIndex)
+    if nbWorkers<=1:
+        results = (processGraphShard(task) for task in tasks)
+    else:
+        pool = multiprocessing.Pool(nbWorkers, initializer=loadGraphWorkerState,
+                                    initargs=(keywords, dicWordWeight, equivalences, dicSlug, slugIndex))
+        # the partial graphs are merged in the order of the parts, while the next ones are computed
+        results = pool.imap(processGraphShard, tasks)
+    try:
+        graph = GraphProcessing.PartialGraphKeyword()
+        compt = UtilsConstants.Compt(tasks, 10)
+        for partialGraph, _, _ in results:
+            # the values of the merged parts are summed, the graph starting at the first entreprise
+            graph.merge(partialGraph).compact()
+            compt.updateAndPrint(printProgress)
+    finally:
+        if nbWorkers>1:
+            pool.close()
+            pool.join()
+    return graph.toGraph(name)
+
+def processGraphNAF(task):
+    '''
+    function computing and saving the graph and the keywords of a codeNAF, using the keywords of graphWorkerState
+    -- IN
+        task : codeNAF and path of the subsets (tuple(str, str))
+    -- OUT
+        codeNAF (str), pid of the process (int) and time spent (float)
+    '''
+    codeNAF, path = task
+    startTime = time.time()
+    extractGraphFromSubset(subsetname = "subset_NAF_"+codeNAF,
+                           path = path,
+                           localKeywords = False,
+                           toPrint = False,
+                           printProgress = False,
+                           **graphWorkerState)
+    return codeNAF, os.getpid(), time.time()-startTime
+
+def extractGraphFromSubsets(codeNAFs, path = UtilsConstants.pathCodeNAF, keywords = None, dicWordWeight = None, 
+                            equivalences = None, nbWorkers = 1):
+    '''
+    function that computes and saves the graph and the keywords of each codeNAF (substep 1 of pipelineGraph).
+    The codeNAF are independent, they can be processed by a pool of nbWorkers processes
+    sharing the keywords, which only changes the order in which the codeNAF are processed,
+    the saved files being the same as with a single process.
+    -- IN:
+        codeNAFs : list of the codeNAF whose subsets are processed ([str])
+        path : the path were the subsets are located (str) default = UtilsConstants.pathCodeNAF
+        keywords, dicWordWeight, equivalences : *optional - preloaded keywords default = None
+            (-> let None to import them)
+        nbWorkers : number of processes (int) default = 1
+    -- OUT:
+        the function returns nothing
+    '''
+    if keywords is None:
+        keywords = IOFunctions.importKeywords()
+        dicWordWeight = UtilsConstants.importDicWordWeight(keywords)
+        equivalences = IOFunctions.importSlugEquivalence()
+    dicSlug = computeDicSlug(keywords, dicWordWeight)
+    slugIndex = computeSlugIndex(dicSlug, equivalences)
+    # loading the state before creating the pool, the workers inherit it
+    loadGraphWorkerState(keywords, dicWordWeight, equivalences, dicSlug, slugIndex)
+    tasks = [(codeNAF, path) for codeNAF in codeNAFs]
+    if nbWorkers<=1:
+        results = (processGraphNAF(task) for task in tasks)
+    else:
+        pool = multiprocessing.Pool(nbWorkers, initializer=loadGraphWorkerState,
+                                    initargs=(keywords, dicWordWeight, equivalences, dicSlug, slugIndex))
+        results = pool.imap_unordered(processGraphNAF, tasks)
+    try:
+        # progress over all the workers
+        i = 0
+        workerStats = {}
+        for codeNAF, pid, totalTime in results:
+            i+=1
+            print codeNAF,"- "+str(i)+"/"+str(len(tasks))
+            if not(pid in workerStats):
+                workerStats[pid] = [0,0.0]
+            workerStats[pid][0] += 1
+            workerStats[pid][1] += totalTime
+        if nbWorkers>1:
+            for pid in sorted(workerStats):
+                print "   worker",pid,":",workerStats[pid][0],"codeNAF,",int(workerStats[pid][1]),"s"
+    finally:
+        if nbWorkers>1:
+            pool.close()
+            pool.join()
+
 def buildFromDescription(stemmedDesc,
                          codeNAF,
                          keywords, 
@@ -668,21 +876,24 @@ def buildFromDescription(stemmedDesc,
                          globalKeywords = None, 
                          equivalences = None,
                          dicSlug = None, 
-                         description = ""):
+                         slugIndex = None,
+                         description = "",
+                         encodedIndex = None):
     '''
     function that extracts the content of a description and fills the graph.
     extraction of the keywords ?
     -- IN
     desc : the description to extract (str)
+        (-> the stems of the description, or their ids when encodedIndex is given, cf. extractFromDescription)
     codeNAF : the corresponding codeNAF (str)
     keywords : global dic of keywords
     dicWordWeight : global dic of word weight
     -- OUT
     the function returns nothing
     '''
-    listKeywords = extractFromDescription(None,keywords, dicWordWeight,preprocessedString=stemmedDesc, equivalences=equivalences, dicSlug = dicSlug, returnStem=True)
+    listKeywords = extractFromDescription(None,keywords, dicWordWeight,preprocessedString=stemmedDesc, equivalences=equivalences, dicSlug = dicSlug, slugIndex = slugIndex, returnStem=True, encodedIndex = encodedIndex)
     if len(listKeywords)==0 and globalKeywords is not None:
-        listKeywords = extractFromDescription(None,globalKeywords, dicWordWeight,preprocessedString=stemmedDesc, equivalences=equivalences, dicSlug = dicSlug)
+        listKeywords = extractFromDescription(None,globalKeywords, dicWordWeight,preprocessedString=stemmedDesc, equivalences=equivalences, dicSlug = dicSlug, slugIndex = slugIndex, encodedIndex = encodedIndex)
     for k in listKeywords:
         graph.addNodeValues(k, codeNAF=codeNAF, valueNAF=listKeywords[k])
     l = listKeywords.items()
@@ -694,7 +905,7 @@ def buildFromDescription(stemmedDesc,
                 edgeValue = k[1]*k1[1]
                 graph.addEdgeValues(graph.dicIdNodes[k[0]], graph.dicIdNodes[k1[0]], edgeValue)  
      
-def pipelineGraph(n, percent=100, steps = [True, True, True]):
+def pipelineGraph(n, percent=100, steps = [True, True, True], nbWorkers = 1, seed = None):
     '''
     function that builds the complete graph
     the pipeline is composed of three substeps:
@@ -705,6 +916,10 @@ def pipelineGraph(n, percent=100, steps = [True, True, True]):
         n : size of the sample for the code NAF subset (int)
         percent : percent of entreprises used for the computation of the graph (float) default=100
         steps : array of boolean of size 3, defining which steps to perform ([boolean, boolean, boolean]) default=[True,True,True]
+        nbWorkers : number of processes computing the graphs of the substeps 1 and 2 (int) default=1
+            (-> cf. extractGraphFromSubsets and extractGraphFromSubset)
+        seed : seed of the random sampling of the substep 0 (int) default=None
+            (-> cf. IOFunctions.extractAndSaveSubsets, the same seed gives the same subsets)
     -- OUT:
         the function returns nothing
     '''
@@ -719,10 +934,8 @@ def pipelineGraph(n, percent=100, steps = [True, True, True]):
     if(steps[0]):
         startTime = time.time()
         print "Step 0 : creating subset for all NAF"
-        compt = UtilsConstants.Compt(codeNAFs, 1, True)
-        for codeNAF in codeNAFs:
-            compt.updateAndPrint()
-            IOFunctions.extractAndSaveSubset(codeNAF, n, path = path, toPrint=False)
+        # all the subsets are sampled in a single pass over the descriptions
+        IOFunctions.extractAndSaveSubsets(codeNAFs, n, path = path, seed = seed, toPrint=False, saveTokens = True)
         UtilsConstants.printTime(startTime)
         print ""
     
@@ -735,17 +948,7 @@ def pipelineGraph(n, percent=100, steps = [True, True, True]):
     if(steps[1]):
         startTime = time.time()
         print "Step 1 : computing graph and keywords for all code NAF, using all keywords"
-        i = 0
-        for codeNAF in codeNAFs:
-            print codeNAF,"- "+str(i)+"/732"
-            i+=1
-            extractGraphFromSubset(subsetname = "subset_NAF_"+codeNAF, 
-                                   path = path,
-                                   localKeywords=False,
-                                   keywords = keywords,
-                                   dicWordWeight = dicWordWeight,
-                                   equivalences = equivalences,
-                                   toPrint = False)
+        extractGraphFromSubsets(codeNAFs, path, keywords, dicWordWeight, equivalences, nbWorkers)
         UtilsConstants.printTime(startTime)
         print ""
         
@@ -756,7 +959,7 @@ def pipelineGraph(n, percent=100, steps = [True, True, True]):
         # checking if the subset exists
         if not("graphcomplet" in os.listdir(UtilsConstants.pathCodeNAF)):
             print "- creating subset for the graphcomplet"
-            IOFunctions.extractAndSaveSubset()
+            IOFunctions.extractAndSaveSubset(saveTokens = True)
         extractGraphFromSubset(subsetname = "graphcomplet", 
                                path = path, 
                                localKeywords = False, 
@@ -764,7 +967,8 @@ def pipelineGraph(n, percent=100, steps = [True, True, True]):
                                dicWordWeight = dicWordWeight,
                                equivalences = equivalences,
                                percent = percent, 
-                               toPrint = True)
+                               toPrint = True,
+                               nbWorkers = nbWorkers)
         UtilsConstants.printTime(startTime)
         print ""  
         
@@ -805,14 +1009,17 @@ def extractFromDescription(string,
                            dicWordWeight = None,
                            equivalences = None,
                            booleanMatchParfait = True,
-                           french_stopwords = set(stopwords.words('french')),
-                           stem = nltk.stem.snowball.FrenchStemmer(),
+                           french_stopwords = None,
+                           stem = None,
                            parametersStep01 = UtilsConstants.parametersStep01,
                            normalisationFunction = UtilsConstants.normalisationFunction,
                            dicSlug = None,
+                           slugIndex = None,
+                           initialValues = None,
                            returnStem = False,
                            toPrint=False,
-                           preprocessedString = None):
+                           preprocessedString = None,
+                           encodedIndex = None):
     '''
     function that returns a list of keywords out of a description
     the function takes a dic of parameters as an input.
@@ -826,14 +1033,22 @@ def extractFromDescription(string,
             # obtained by 'equivalences = IOFunctions.importSlugEquivalence()'
         booleanMatchParfait: boolean that settles if we discard keywords that aren't match perfectly (boolean) default = True
             # reminder - a match is perfect according to the function isMatch()
-        french_stopwords : *optional - the set of stopwords for the french language, can be precomputed and passed as an argument or not (set)
-        stem : *optional - stemmerize provided by the nltk library, can be precomputed and passed as an argument or not
+        french_stopwords : *optional - the set of normalized stopwords for the french language (frozenset) default = None (-> UtilsConstants.tokenizerContext.stopwords)
+        stem : *optional - stemmerize provided by the nltk library default = None (-> UtilsConstants.tokenizerContext.stemmer)
         parametersStep01 : *optional - dictionary of parameters used for the matching analysis
             # obtained by 'UtilsConstants.parametersStep01
             -> it is also possible to give as input an array of such dictionary (useful for the genetic algorithm)
+            -> or a PopulationStep01, the chromosomes being then scored together
+        slugIndex : *optional - inverted index linking description stems to keyword slugs (dic{stem(str):[(slug(str), value(float))]}) default = None
+            # obtained by 'slugIndex = computeSlugIndex(dicSlug, equivalences)', should be precomputed when extracting many descriptions
+        initialValues : *optional - cache of the initial values of the slugs for parametersStep01, filled during the extraction (dic{slug(str):[float]}) default = None
+            -> must only be shared between calls using the same parametersStep01 and dicWordWeight
         returnStem : only in the usual case : one set of parameters as input - add all matched stem in the result with value 0 to help the step 3
         toPrint : *optional - boolean that settles if the function must print the results (boolean) default=False
         preprocessingString : *optional - array of tokens containing the preprocessed String ([unicode]) default=None
+            -> it is also possible to give the array of the ids of the tokens (cf. encodeDescription)
+        encodedIndex : *optional - index of the slugs over the ids of the stems (EncodedSlugIndex) default = None
+            # obtained by 'encodedIndex = EncodedSlugIndex(slugIndex)', the matches are then found with numpy operations
     -- OUT
         dic : dic of keywords which values are the importance of the keyword (dic{str:float})
     '''
@@ -847,15 +1062,31 @@ def extractFromDescription(string,
     # initializing description
     if preprocessedString is None:
         preprocessedString = UtilsConstants.tokenizeAndStemmerize(string,keepComa=True, french_stopwords=french_stopwords, stem=stem)
-    # creating set of keywords to check
-    keywords, tableMatch = preprocessExtraction(preprocessedString = preprocessedString, 
-                                                keywords = keywords, 
-                                                dicWordWeight = dicWordWeight, 
-                                                equivalences = equivalences, 
-                                                dicSlug = dicSlug,
-                                                toPrint = toPrint)
+    if isinstance(parametersStep01, collections.Mapping) and not isinstance(parametersStep01, dict):
+        # the parameters loaded on their first use (cf. UtilsConstants.LazyDict) are read once as a usual dictionary
+        parametersStep01 = dict(parametersStep01)
+    if not isinstance(parametersStep01, dict) and not isinstance(parametersStep01, PopulationStep01):
+        # the parameters of the chromosomes are stored in arrays once for all the keywords
+        parametersStep01 = PopulationStep01(parametersStep01)
+    if encodedIndex is not None and dicSlug is not None:
+        # creating set of keywords to check and listing all the matches with the encoded index
+        keywords, tableMatch, matchList, posSpecial = encodedIndex.preprocessExtraction(encodedIndex.encode(preprocessedString), 
+                                                                                        keywords, 
+                                                                                        dicSlug)
+    else:
+        if isinstance(preprocessedString, np.ndarray):
+            preprocessedString = UtilsConstants.stemVocabulary.getStems(preprocessedString)
+        # creating set of keywords to check
+        keywords, tableMatch = preprocessExtraction(preprocessedString = preprocessedString, 
+                                                    keywords = keywords, 
+                                                    dicWordWeight = dicWordWeight, 
+                                                    equivalences = equivalences, 
+                                                    dicSlug = dicSlug,
+                                                    slugIndex = slugIndex,
+                                                    toPrint = toPrint)
+        # listing all the matches of the slugs in one pass over the description
+        matchList, posSpecial = computeMatchList(preprocessedString, tableMatch)
     dicResults = {}
-    posSpecial = { key : set([i for i, x in enumerate(preprocessedString) if x == key]) for key in ["non",".",","]}
     for keyword in keywords:
         if toPrint:
             print "trying to match",keyword
@@ -870,7 +1101,9 @@ def extractFromDescription(string,
                                               equivalences = equivalences, 
                                               dicWordWeight = dicWordWeight,
                                               tableMatch = tableMatch,
+                                              matchList = matchList,
                                               posSpecial = posSpecial,
+                                              initialValues = initialValues,
                                               toPrint=toPrint)
         if b:
             dicResults[keyword] = v
@@ -898,12 +1131,66 @@ def extractFromDescription(string,
         for i in range(len(parametersStep01)):
             finalDic.append({kw : dicResults[kw][i] for kw in dicResults})
         return finalDic
+
+def extractFromDescriptionBatch(descriptions,
+                                keywords = None,
+                                dicWordWeight = None,
+                                equivalences = None,
+                                parametersStep01 = UtilsConstants.parametersStep01,
+                                normalisationFunction = UtilsConstants.normalisationFunction,
+                                dicSlug = None,
+                                slugIndex = None,
+                                returnStem = False):
+    '''
+    function that performs the extraction of keywords over many descriptions.
+    The keywords, the slug index and the values depending only on the parameters
+    are computed once and shared by the whole batch.
+    The result for each description is the same as the one of extractFromDescription().
+    -- IN
+        descriptions : list or iterator of preprocessed descriptions ([[unicode]])
+            # obtained by 'UtilsConstants.tokenizeAndStemmerize(description, keepComa=True)'
+            -> the descriptions can also be encoded as the arrays of the ids of their stems (cf. encodeDescription)
+        keywords, dicWordWeight, equivalences, parametersStep01, normalisationFunction, dicSlug, slugIndex, returnStem :
+            cf. extractFromDescription()
+    -- OUT
+        results : list of the dictionaries of keywords, one for each description ([dic{str:float}])
+    '''
+    # initializing keywords, dicWordWeight and equivalences
+    if keywords is None:
+        keywords = IOFunctions.importKeywords()
+    if dicWordWeight is None:
+        dicWordWeight = UtilsConstants.importDicWordWeight(keywords)
+    if equivalences is None:
+        equivalences = IOFunctions.importSlugEquivalence()
+    # computing the structures shared by the batch
+    if dicSlug is None:
+        dicSlug = computeDicSlug(keywords, dicWordWeight)
+    if slugIndex is None:
+        slugIndex = computeSlugIndex(dicSlug, equivalences)
+    encodedIndex = getEncodedSlugIndex(slugIndex)
+    initialValues = {}
+    results = []
+    for preprocessedString in descriptions:
+        results.append(extractFromDescription(string = None, 
+                                              keywords = keywords, 
+                                              dicWordWeight = dicWordWeight, 
+                                              equivalences = equivalences, 
+                                              parametersStep01 = parametersStep01, 
+                                              normalisationFunction = normalisationFunction, 
+                                              dicSlug = dicSlug, 
+                                              slugIndex = slugIndex, 
+                                              initialValues = initialValues, 
+                                              returnStem = returnStem, 
+                                              preprocessedString = preprocessedString,
+                                              encodedIndex = encodedIndex))
+    return results
     
 def preprocessExtraction(preprocessedString,
                          keywords = None, 
                          dicWordWeight = None,
                          equivalences = None,
                          dicSlug = None,
+                         slugIndex = None,
                          toPrint=False):
     '''
     function that preprocess the string and the global list of keywords to extract only those which might be found in
@@ -918,6 +1205,8 @@ def preprocessExtraction(preprocessedString,
             # obtained by 'equivalences = IOFunctions.importSlugEquivalence()'
         french_stopwords : *optional - the set of stopwords for the french language, can be precomputed and passed as an argument or not (set)
         stem : *optional - stemmerize provided by the nltk library, can be precomputed and passed as an argument or not
+        slugIndex : *optional - inverted index linking description stems to keyword slugs (dic{stem(str):[(slug(str), value(float))]}) default = None
+            # obtained by 'slugIndex = computeSlugIndex(dicSlug, equivalences)'
         toPrint : *optional - boolean that settles if the function must print the results (boolean) default=False
     -- OUT
         KeywordSet : the dictionary of keywords to be used in the rest of the pipeline (dic{keyword(str):[slugs(str)]}) (for this description)
@@ -932,9 +1221,10 @@ def preprocessExtraction(preprocessedString,
         equivalences = IOFunctions.importSlugEquivalence()
     # computing the dictionary linking slugs and keywords
     if dicSlug is None:
-        dicSlug = {dic : [] for dic in dicWordWeight}
-        for keyword in keywords:
-            dicSlug[keywords[keyword][0]].append(keyword)
+        dicSlug = computeDicSlug(keywords, dicWordWeight)
+    # computing the inverted index linking stems and slugs
+    if slugIndex is None:
+        slugIndex = computeSlugIndex(dicSlug, equivalences)
     # creating the set of keywords to check
     keywordSet = {}
     tableMatch = [{} for _ in preprocessedString]
@@ -944,15 +1234,336 @@ def preprocessExtraction(preprocessedString,
         if descslug=="," or descslug==".":
             i += 1
             continue
-        for kwslug in dicSlug:
-            value = isMatch(descslug, kwslug, equivalences, toPrint)
-            if value>0:
+        if descslug in slugIndex:
+            for kwslug, value in slugIndex[descslug]:
                 # we then check all keywords starting with this slug
                 for keyword in dicSlug[kwslug]:   
                     keywordSet[keyword] = keywords[keyword] 
                 tableMatch[i][kwslug] = value
         i += 1
     return keywordSet, tableMatch  
+
+def computeDicSlug(keywords, dicWordWeight):
+    '''
+    function that computes the dictionary linking each slug to the keywords starting with this slug.
+    every slug of dicWordWeight gets an entry, even if no keyword starts with it.
+    -- IN
+        keywords : the dictionary of keywords (dic{str:[tokens]})
+        dicWordWeight : the dictionary containing slug weights (dic{str:int})
+    -- OUT
+        dicSlug : dictionary of the keywords starting with each slug (dic{slug(str):[keyword(str)]})
+    '''
+    dicSlug = {dic : [] for dic in dicWordWeight}
+    for keyword in keywords:
+        dicSlug[keywords[keyword][0]].append(keyword)
+    return dicSlug
+
+def computeMatchList(preprocessedString, tableMatch, seuilMatch = None):
+    '''
+    function that reads the description once, from left to right, and lists for each slug
+    all the positions where it is matched, with the information needed by resolveMatch()
+    and the 'extractFeature' functions. The scoring of the keywords is then performed
+    on these lists and the description is never scanned again.
+    -- IN
+        preprocessedString : array of tokens containing the preprocessed String ([unicode])
+        tableMatch : array of dictionaries of the matches for each word of the description [ { slug(str) : value (float) }, ...]
+            # obtained by 'preprocessExtraction()'
+        seuilMatch : *optional - threshold under which a match is discarded (float) default = None
+            (-> let None to use UtilsConstants.parametersMatchStep01["seuilMatch"])
+    -- OUT
+        matchList : dictionary of the matches of each slug, in order of appearance (dic{slug(str):[(nbMot(int), nbComa(int), value(float))]})
+        posSpecial : dictionary of the positions of the special stems (dic{'non'|'.'|',' : set(int)})
+    '''
+    if seuilMatch is None:
+        seuilMatch = UtilsConstants.parametersMatchStep01["seuilMatch"]
+    matchList = {}
+    posSpecial = {"non":set(), ".":set(), ",":set()}
+    nbComa = 0
+    nbMot = 0
+    for descslug in preprocessedString:
+        if descslug in posSpecial:
+            posSpecial[descslug].add(nbMot)
+        if descslug==",":
+            # updating comas number
+            nbComa += 1
+        if descslug==".":
+            nbComa = 0
+        for kwslug, im in tableMatch[nbMot].iteritems():
+            if im>0 and im>=seuilMatch:
+                if not(kwslug in matchList):
+                    matchList[kwslug] = []
+                matchList[kwslug].append((nbMot, nbComa, im))
+        nbMot += 1
+    return matchList, posSpecial
+
+def computeSlugIndex(dicSlug, equivalences = None):
+    '''
+    function that computes the inverted index of the slugs:
+    for each stem that can be found in a description, the index gives the slugs of dicSlug
+    it matches and the value of the match, the same way isMatch() would.
+    The index only has to be computed once for a set of keywords and equivalences,
+    the cost of the extraction then depends on the length of the description and not on the number of slugs.
+    For each stem, the slugs are listed in the order of dicSlug so that the keywords
+    are found in the same order as when looking through dicSlug.
+    -- IN
+        dicSlug : dictionary of the keywords starting with each slug (dic{slug(str):[keyword(str)]})
+            # obtained by 'dicSlug = computeDicSlug(keywords, dicWordWeight)'
+        equivalences : *optional - the dictionary containing classes of equivalence (dic{str:[str]})
+    -- OUT
+        slugIndex : dictionary linking stems to matched slugs and values (dic{stem(str):[(slug(str), value(float))]})
+            1.0 : perfect match
+            0.9 : match via equivalence
+    '''
+    if equivalences is None:
+        equivalences = IOFunctions.importSlugEquivalence()
+    # stems matching each slug via equivalence
+    dicEquivalentStems = {}
+    for descslug in equivalences:
+        for kwslug in set(equivalences[descslug]):
+            if kwslug != descslug:
+                if not(kwslug in dicEquivalentStems):
+                    dicEquivalentStems[kwslug] = []
+                dicEquivalentStems[kwslug].append(descslug)
+    slugIndex = {}
+    for kwslug in dicSlug:
+        # perfect match
+        if not(kwslug in slugIndex):
+            slugIndex[kwslug] = []
+        slugIndex[kwslug].append((kwslug, 1.0))
+        # matches via equivalence
+        for descslug in dicEquivalentStems.get(kwslug, []):
+            if not(descslug in slugIndex):
+                slugIndex[descslug] = []
+            slugIndex[descslug].append((kwslug, 0.9))
+    return slugIndex
+
+def encodeDescription(stemmedDesc, vocabulary = None):
+    '''
+    function that encodes a preprocessed description as the array of the ids of its stems.
+    The vocabulary isn't changed : the stems which are not in it get the id StemVocabulary.unknownId and are never matched,
+    the stems of the keywords must then be added to the vocabulary before (cf. EncodedSlugIndex, addKeywordStems)
+    -- IN
+        stemmedDesc : the tokenized description ([stem(str)]), or the array of its ids (np.array[int32])
+        vocabulary : *optional - vocabulary of the stems (StemVocabulary) default = None (-> UtilsConstants.stemVocabulary)
+    -- OUT
+        descIds : the ids of the stems of the description (np.array[int32])
+    '''
+    if isinstance(stemmedDesc, np.ndarray):
+        return stemmedDesc
+    if vocabulary is None:
+        vocabulary = UtilsConstants.stemVocabulary
+    return vocabulary.lookupIds(stemmedDesc)
+
+def addKeywordStems(slugs, equivalences, vocabulary = None):
+    '''
+    function that adds to the vocabulary the stems which can be matched with the slugs of a keyword,
+    and the special stems, so that they are found in the descriptions encoded afterwards (cf. encodeDescription)
+    -- IN
+        slugs : the slugs of the keyword ([slug(str)])
+        equivalences : the dictionary containing the equivalences (dic{stem(str):[stem(str)]})
+        vocabulary : *optional - vocabulary of the stems (StemVocabulary) default = None (-> UtilsConstants.stemVocabulary)
+    -- OUT
+        the function returns nothing
+    '''
+    if vocabulary is None:
+        vocabulary = UtilsConstants.stemVocabulary
+    stems = ["non", ".", ","]
+    for slug in slugs:
+        stems.append(slug)
+        stems += equivalences.get(slug, [])
+    vocabulary.getIds(stems)
+
+def findStem(descIds, stem, vocabulary):
+    '''
+    function returning the positions of a stem in an encoded description as an array of booleans,
+    a stem which isn't in the vocabulary being found nowhere (cf. encodeDescription)
+    '''
+    stemId = vocabulary.lookupIds([stem])[0]
+    if stemId == UtilsConstants.StemVocabulary.unknownId:
+        return np.zeros(len(descIds), dtype=bool)
+    return descIds==stemId
+
+def computeNbComas(descIds, vocabulary = None):
+    '''
+    function that computes, for each word of an encoded description, the number of comas
+    since the beginning of the sentence (cf. computeMatchList)
+    -- IN
+        descIds : the ids of the stems of the description (np.array[int32])
+        vocabulary : *optional - vocabulary of the stems (StemVocabulary) default = None (-> UtilsConstants.stemVocabulary)
+    -- OUT
+        nbComas : number of comas before each word (np.array[int])
+    '''
+    if vocabulary is None:
+        vocabulary = UtilsConstants.stemVocabulary
+    nbComas = np.cumsum(findStem(descIds, ",", vocabulary))
+    # the count starts again after each point
+    return nbComas - np.maximum.accumulate(np.where(findStem(descIds, ".", vocabulary), nbComas, 0))
+
+def computePosSpecial(descIds, vocabulary = None):
+    '''
+    function that computes the positions of the special stems of an encoded description (cf. computeMatchList)
+    -- IN
+        descIds : the ids of the stems of the description (np.array[int32])
+        vocabulary : *optional - vocabulary of the stems (StemVocabulary) default = None (-> UtilsConstants.stemVocabulary)
+    -- OUT
+        posSpecial : dictionary of the positions of the special stems (dic{'non'|'.'|',' : set(int)})
+    '''
+    if vocabulary is None:
+        vocabulary = UtilsConstants.stemVocabulary
+    return {stem : set(np.flatnonzero(findStem(descIds, stem, vocabulary)).tolist()) for stem in ["non", ".", ","]}
+
+def computeSlugMatches(descIds, slug, equivalences, vocabulary = None):
+    '''
+    function that computes the value of the match of a slug with each word of an encoded description,
+    the same way isMatch() would. The class of equivalence of the slug is resolved once as an array of ids.
+    -- IN
+        descIds : the ids of the stems of the description (np.array[int32])
+        slug : the slug to match (str)
+        equivalences : the dictionary containing the equivalences (dic{stem(str):[stem(str)]})
+        vocabulary : *optional - vocabulary of the stems (StemVocabulary) default = None (-> UtilsConstants.stemVocabulary)
+    -- OUT
+        values : the value of the match for each word (np.array[float])
+    '''
+    if vocabulary is None:
+        vocabulary = UtilsConstants.stemVocabulary
+    values = np.where(findStem(descIds, slug, vocabulary), 1.0, 0.0)
+    if slug in equivalences:
+        classIds = vocabulary.lookupIds(equivalences[slug])
+        classIds = classIds[classIds != UtilsConstants.StemVocabulary.unknownId]
+        values[(values==0.0) & (descIds[:,None]==classIds).any(axis=1)] = 0.9
+    return values
+
+class EncodedSlugIndex():
+    '''
+    class which implements the inverted index of the slugs (cf. computeSlugIndex) over the ids of the stems
+    of a vocabulary (UtilsConstants.stemVocabulary by default) : for each id, the index gives the numbers
+    of the slugs it matches and the values of the matches, stored in numpy arrays.
+    All the matches of an encoded description (cf. encodeDescription) are then found by numpy operations
+    instead of looking up each stem of the description in slugIndex.
+    The stems of slugIndex are added to the vocabulary, so the descriptions must be encoded after the index (cf. encode).
+    The index is computed again if the vocabulary is read again, its ids being then different.
+    '''
+    def __init__(self, slugIndex, vocabulary = None):
+        if vocabulary is None:
+            vocabulary = UtilsConstants.stemVocabulary
+        self.slugIndex = slugIndex
+        self.vocabulary = vocabulary
+        self.vocabularyStems = None
+        self.check()
+
+    def check(self):
+        '''
+        function that computes the index if it doesn't match the vocabulary anymore
+        '''
+        self.vocabulary.load()
+        if self.vocabularyStems is self.vocabulary.stems:
+            return
+        vocabulary = self.vocabulary
+        self.comaId = vocabulary.getId(",")
+        self.pointId = vocabulary.getId(".")
+        vocabulary.getId("non")
+        # slugs of the keywords, in order of appearance in slugIndex
+        self.slugs = []
+        slugNumbers = {}
+        stemIds = vocabulary.getIds(self.slugIndex.keys())
+        # the last row is empty, it is used for the unknown stems and the stems added to the vocabulary after the index
+        counts = np.zeros(len(vocabulary.stems)+1, dtype=np.int64)
+        for stemId, descslug in zip(stemIds, self.slugIndex):
+            counts[stemId] = len(self.slugIndex[descslug])
+        self.indptr = np.concatenate([[0], np.cumsum(counts)])
+        self.slugNumbers = np.zeros(self.indptr[-1], dtype=np.int32)
+        self.values = np.zeros(self.indptr[-1], dtype=np.float64)
+        for stemId, descslug in zip(stemIds, self.slugIndex):
+            start = self.indptr[stemId]
+            for i, (kwslug, value) in enumerate(self.slugIndex[descslug]):
+                if not(kwslug in slugNumbers):
+                    slugNumbers[kwslug] = len(self.slugs)
+                    self.slugs.append(kwslug)
+                self.slugNumbers[start+i] = slugNumbers[kwslug]
+                self.values[start+i] = value
+        self.vocabularyStems = vocabulary.stems
+
+    def encode(self, stemmedDesc):
+        '''
+        function that encodes a preprocessed description with the vocabulary of the index (cf. encodeDescription)
+        '''
+        self.check()
+        return encodeDescription(stemmedDesc, self.vocabulary)
+
+    def getMatches(self, descIds):
+        '''
+        function that lists all the matches of an encoded description, in order of position and then in the order of slugIndex
+        -- IN
+            descIds : the ids of the stems of the description (np.array[int32])
+        -- OUT
+            positions : position of the matched word (np.array[int])
+            nbComas : number of comas before the matched word (np.array[int])
+            slugNumbers : number of the matched slug in self.slugs (np.array[int32])
+            values : value of the match (np.array[float])
+        '''
+        self.check()
+        descIds = np.asarray(descIds, dtype=np.int32)
+        emptyRow = len(self.indptr)-2
+        rows = np.where((descIds<0) | (descIds>emptyRow), emptyRow, descIds)
+        starts = self.indptr[rows]
+        counts = self.indptr[rows+1]-starts
+        # the comas and points are never matched
+        counts[(descIds==self.comaId) | (descIds==self.pointId)] = 0
+        positions = np.repeat(np.arange(len(descIds)), counts)
+        entries = np.arange(counts.sum()) - np.repeat(np.cumsum(counts)-counts-starts, counts)
+        nbComas = computeNbComas(descIds, self.vocabulary)
+        return positions, nbComas[positions], self.slugNumbers[entries], self.values[entries]
+
+    def preprocessExtraction(self, descIds, keywords, dicSlug, seuilMatch = None):
+        '''
+        function that computes with the index the same objects as preprocessExtraction(), computeMatchList()
+        for an encoded description. The tableMatch only contains the dictionaries of the matched words,
+        which is enough to list the matched slugs (cf. extractFromDescription).
+        -- IN
+            descIds : the ids of the stems of the description (np.array[int32])
+            keywords : the dictionary of keywords (dic{str:[tokens]})
+            dicSlug : dictionary of the keywords starting with each slug (dic{slug(str):[keyword(str)]})
+            seuilMatch : *optional - threshold under which a match is discarded (float) default = None
+                (-> let None to use UtilsConstants.parametersMatchStep01["seuilMatch"])
+        -- OUT
+            keywordSet, tableMatch : cf. preprocessExtraction()
+            matchList, posSpecial : cf. computeMatchList()
+        '''
+        if seuilMatch is None:
+            seuilMatch = UtilsConstants.parametersMatchStep01["seuilMatch"]
+        positions, nbComas, slugNumbers, values = self.getMatches(descIds)
+        keywordSet = {}
+        tableMatch = []
+        matchList = {}
+        slugs = self.slugs
+        previousPosition = -1
+        for nbMot, nbComa, slugNumber, im in zip(positions.tolist(), nbComas.tolist(), slugNumbers.tolist(), values.tolist()):
+            kwslug = slugs[slugNumber]
+            for keyword in dicSlug[kwslug]:
+                keywordSet[keyword] = keywords[keyword]
+            if nbMot != previousPosition:
+                tableMatch.append({})
+                previousPosition = nbMot
+            tableMatch[-1][kwslug] = im
+            if im>0 and im>=seuilMatch:
+                if not(kwslug in matchList):
+                    matchList[kwslug] = []
+                matchList[kwslug].append((nbMot, nbComa, im))
+        return keywordSet, tableMatch, matchList, computePosSpecial(descIds, self.vocabulary)
+
+# last encoded index computed by getEncodedSlugIndex
+encodedSlugIndexCache = {}
+
+def getEncodedSlugIndex(slugIndex):
+    '''
+    function returning the encoded index of slugIndex (cf. EncodedSlugIndex),
+    which is only computed again when slugIndex changes
+    '''
+    encodedIndex = encodedSlugIndexCache.get("index")
+    if encodedIndex is None or not(encodedIndex.slugIndex is slugIndex):
+        encodedIndex = EncodedSlugIndex(slugIndex)
+        encodedSlugIndexCache["index"] = encodedIndex
+    return encodedIndex
     
 def getProbKeywordInDescription(keyword, 
                                 string = "",
@@ -962,7 +1573,9 @@ def getProbKeywordInDescription(keyword,
                                 equivalences = None, 
                                 dicWordWeight = None,  
                                 tableMatch = None,
+                                matchList = None,
                                 posSpecial = None,
+                                initialValues = None,
                                 normalisationFunction=UtilsConstants.normalisationFunction, 
                                 toPrint = False):
     '''
@@ -973,12 +1586,16 @@ def getProbKeywordInDescription(keyword,
         keyword : the keyword to analyze (str)
         slugs : the slugs in the keyword to analyze ([slug(str)])
             # obtained as the value of the key 'keyword' in the dictionary 'keywords'
-        stemmedDesc : the tokennized description ([stem(str)])
+        stemmedDesc : the tokennized description ([stem(str)]), or the ids of its stems (np.array[int32], cf. encodeDescription)
         parametersStep01 : the dictionary containing the parameters of the step 01 (dic{parameter(str) : value(int)})
             # it is also possible to give an array of dictionaries (useful for genetic algorithm)
+            -> all the chromosomes are then scored together (cf. PopulationStep01), the array can be given as a PopulationStep01
         normalisationFunction : the associated normalisation function for the parameters
         equivalences : the dictionary containing the equivalences
         dicWordWeight : the dictionary containing the frequencies for the slugs (dic{slug(str):freq(int)})
+        matchList : *optional - the positions of the matches of each slug in stemmedDesc (dic{slug(str):[(nbMot(int), nbComa(int), value(float))]})
+            # obtained by 'computeMatchList()', if given the description is not scanned again
+        initialValues : *optional - cache of the initial values of the slugs (dic{slug(str):[float]}), cf. extractFromDescription()
         toPrint : boolean that settles if the results must be print *optional (boolean) default = False
     '''
     # initializing keywords, dicWordWeight and equivalences
@@ -997,65 +1614,87 @@ def getProbKeywordInDescription(keyword,
     nSlug=0
     nbTotalMot = len(stemmedDesc)
     b = True
-    if isinstance(parametersStep01,dict):
+    population = None
+    if isinstance(parametersStep01, collections.Mapping):
         parametersStep01 = [parametersStep01]
         normalisationFunction = [normalisationFunction]
+    else:
+        if not isinstance(parametersStep01, PopulationStep01):
+            parametersStep01 = PopulationStep01(parametersStep01)
+        if parametersStep01.vectorized:
+            population = parametersStep01
     v=[0.0]*len(parametersStep01)
+    if matchList is None and tableMatch is not None:
+        # listing the matches of the slugs given by tableMatch
+        matchList, posSpecialTable = computeMatchList(stemmedDesc, tableMatch)
+        if posSpecial is None:
+            posSpecial = posSpecialTable
+    if matchList is None or posSpecial is None:
+        # encoding the description, the matches and the special stems are then found with numpy operations
+        if not isinstance(stemmedDesc, np.ndarray):
+            addKeywordStems(slugs, equivalences)
+        descIds = encodeDescription(stemmedDesc)
     # looking for special stem in description
     if posSpecial is None:
-        posSpecial = {"non":set(), ".":set(), ",":set()}
-        for key in posSpecial:
-            for i in range(len(stemmedDesc)):
-            # checking the 'non','.' and ',' token in description
-                if stemmedDesc[i]==key:
-                    posSpecial[key].add(i)
+        posSpecial = computePosSpecial(descIds)
+    if matchList is None:
+        nbComas = computeNbComas(descIds)
     for keywordslug in slugs:
         if toPrint:
             print "  ", keywordslug
         # feature 0 : valeur initiale
-        coeff = [extractFeature0_InitialValue(p, keywordslug, dicWordWeight, toPrint) for p in parametersStep01]
-        nbMot=0
-        nbComa = 0
+        if initialValues is not None and keywordslug in initialValues and not toPrint:
+            coeff = initialValues[keywordslug]
+        else:
+            if population is None:
+                coeff = [extractFeature0_InitialValue(p, keywordslug, dicWordWeight, toPrint) for p in parametersStep01]
+            else:
+                coeff = population.extractInitialValues(keywordslug, dicWordWeight, toPrint)
+            if initialValues is not None:
+                initialValues[keywordslug] = coeff
         vt = [0]*len(parametersStep01)
         b1 = False
-        for descslug in stemmedDesc:
-            if descslug==",":
-                # updating comas number
-                nbComa += 1
-            if descslug==".":
-                nbComa = 0
-            # performing the test to match
-            if tableMatch is None:
-                im = isMatch(keywordslug, descslug, equivalences, toPrint)
-            else:
-                im = tableMatch[nbMot][keywordslug] if keywordslug in tableMatch[nbMot] else 0.0
-            if im<UtilsConstants.parametersMatchStep01["seuilMatch"]:
-                im = 0
-            if im>0:  
-                coeff2 = [c * im for c in coeff]
-                # Match !
-                rm = [resolveMatch(parametersStep01 = p[0], 
-                                   nSlug = nSlug, 
-                                   coefSlug = p[1], 
-                                   nbMot = nbMot, 
-                                   nbComa = nbComa, 
-                                   nbTotalMot = nbTotalMot,  
-                                   pos = pos,
-                                   posSpecial = posSpecial,
-                                   normalisationFunction = UtilsConstants.normalisationFunction,
-                                   toPrint = toPrint)
-                      for p in zip(parametersStep01,coeff2, normalisationFunction)]
-                b1 = b1 or rm[0][1]
-                vt = [max(vt1[0],vt1[1][0]) for vt1 in zip(vt,rm)]
+        if matchList is None:
+            # matching the slug with all the words of the description (cf. isMatch)
+            values = computeSlugMatches(descIds, keywordslug, equivalences)
+            positions = np.flatnonzero((values>0) & (values>=UtilsConstants.parametersMatchStep01["seuilMatch"]))
+            matches = zip(positions.tolist(), nbComas[positions].tolist(), values[positions].tolist())
+        else:
+            matches = matchList.get(keywordslug, [])
+        for nbMot, nbComa, im in matches:
+            if not(population is None):
+                # the features of the match are extracted once for the whole population
+                score, nextTo = resolveMatchPopulation(population, nSlug, coeff*im, nbMot, nbComa, nbTotalMot, pos, posSpecial, toPrint)
+                b1 = b1 or nextTo
+                vt = np.maximum(vt, score)
                 pos[nSlug].append(nbMot)
-            nbMot+=1
+                continue
+            coeff2 = [c * im for c in coeff]
+            # Match !
+            rm = [resolveMatch(parametersStep01 = p[0], 
+                               nSlug = nSlug, 
+                               coefSlug = p[1], 
+                               nbMot = nbMot, 
+                               nbComa = nbComa, 
+                               nbTotalMot = nbTotalMot,  
+                               pos = pos,
+                               posSpecial = posSpecial,
+                               normalisationFunction = UtilsConstants.normalisationFunction,
+                               toPrint = toPrint)
+                  for p in zip(parametersStep01,coeff2, normalisationFunction)]
+            b1 = b1 or rm[0][1]
+            vt = [max(vt1[0],vt1[1][0]) for vt1 in zip(vt,rm)]
+            pos[nSlug].append(nbMot)
         if len(pos[nSlug])==0:
             # No Match !
             v = [0.0] * len(parametersStep01)
             b = False
             break
         b = b and b1
-        v = map(operator.add, v, vt)
+        if population is None:
+            v = map(operator.add, v, vt)
+        else:
+            v = (np.array(v)+vt).tolist()
         nSlug+=1
         if toPrint:
             print "score du slug :",vt
@@ -1078,6 +1717,7 @@ def isMatch(slug1, slug2,  equivalences=None, toPrint = False):
         slug1 : first slug/stem to match
         slug2 : second slug/stem to match
             # the function is totally symmetric
+            # the slugs can also be the ids of the stems (cf. UtilsConstants.stemVocabulary), equivalences being then given by ids
         equivalences : the dictionary for equivalence for stems (dic{stem(str):[stem(str]})
         toPrint : boolean that settles if the results must be printed (boolean) default = False
     -- OUT:
@@ -1091,7 +1731,7 @@ def isMatch(slug1, slug2,  equivalences=None, toPrint = False):
     if equivalences is None:
         equivalences = IOFunctions.importSlugEquivalence()
         
-    if (str(slug1) == str(slug2)):
+    if slug1 == slug2:
         return 1.0
     try:
         if slug1 in equivalences and slug2 in equivalences[slug1]:
@@ -1150,6 +1790,86 @@ def resolveMatch(parametersStep01,
         print "     => score =",score
     return score, coefNextTo>0
 
+class PopulationStep01():
+    '''
+    class which holds the parameters of the step 01 of a population of chromosomes (cf. GeneticKeywords01) :
+    the values of each parameter are stored in an array, one value for each chromosome,
+    so that the features of a match are extracted once and all the chromosomes are scored together (cf. resolveMatchPopulation).
+    The population can be used as the list of the dictionaries of parameters.
+    '''
+    def __init__(self, parametersStep01):
+        self.parametersStep01 = list(parametersStep01)
+        keys = set(self.parametersStep01[0]) if len(self.parametersStep01)>0 else set()
+        # the values are only stored in arrays when all the chromosomes have the same float parameters
+        self.vectorized = len(keys)>0 and all(set(p)==keys and all(type(value) is float for value in p.itervalues()) 
+                                              for p in self.parametersStep01)
+        self.parameters = {}
+        if self.vectorized:
+            for key in keys:
+                self.parameters[key] = np.array([p[key] for p in self.parametersStep01], dtype=np.float64)
+
+    def __len__(self):
+        return len(self.parametersStep01)
+
+    def __iter__(self):
+        return iter(self.parametersStep01)
+
+    def __getitem__(self, i):
+        return self.parametersStep01[i]
+
+    def extractInitialValues(self, keywordslug, dicWordWeight, toPrint = False):
+        '''
+        function that returns the initial value of a keyword slug for each chromosome (cf. extractFeature0_InitialValue)
+        '''
+        try:
+            weight = int(dicWordWeight[keywordslug])
+        except:
+            weight = 0
+        if weight == 0:
+            coeff = np.zeros(len(self))+0.5
+        else:
+            coeff = self.parameters['freqSlugAlpha']*weight + self.parameters['freqSlugGamma']/weight
+        if toPrint:
+            print "   valeur initiale:",coeff
+        return coeff
+
+def resolveMatchPopulation(population, 
+                           nSlug, 
+                           coefSlug, 
+                           nbMot, 
+                           nbComa, 
+                           nbTotalMot,  
+                           pos,
+                           posSpecial,
+                           toPrint = False):
+    '''
+    function that resolves the match for all the chromosomes of a population at once (cf. resolveMatch) :
+    the 'extractFeature' functions are called once with the arrays of the parameters,
+    and the scores of all the chromosomes are computed by numpy operations.
+    -- IN
+        population : parameters of the chromosomes (PopulationStep01)
+        coefSlug : initial values of the slug times the value of the match (np.array)
+        nSlug, nbMot, nbComa, nbTotalMot, pos, posSpecial : cf. resolveMatch()
+    -- OUT
+        score : normalised scores of the match for each chromosome (np.array)
+        nextTo : boolean that settles if the slug is next to the previous one (boolean)
+    '''
+    if toPrint:
+        print "   match !"
+    parameters = population.parameters
+    coefComa = extractFeature1_AboutComas(parameters, nbComa, nbTotalComa = len(posSpecial[","]), toPrint = toPrint)
+    coefPlace = extractFeature2_AboutPlace(parameters, nbMot, nbTotalMot, toPrint)
+    if nSlug==0:
+        coefNextTo = parameters['coefProxi']/2.0
+    else:
+        coefNextTo = extractFeature3_AboutSlugProximity(parameters, nSlug, nbMot, pos, posSpecial, toPrint)
+    # the proximity is 0 when the slug isn't next to the previous one
+    coefNextTo = coefNextTo+np.zeros(len(population))
+    score = UtilsConstants.normalisationFunction.normalise((coefSlug+coefNextTo)*coefPlace*coefComa)
+    if toPrint:
+        print "     => score =",score
+    return score, coefNextTo[0]>0
+
 def extractFeature0_InitialValue(parametersStep01, keywordslug, dicWordWeight, toPrint):
     '''
     function that returns the initial value of a keyword slug
@@ -1191,9 +1911,9 @@ def extractFeature2_AboutPlace(parametersStep01, nbMot, nbTotalMot, toPrint):
             coefPlace += parametersStep01['placeDernierTier']
         
     if "placeMot"+str(nbMot) in parametersStep01:
-        coefPlace *= parametersStep01["placeMot"+str(nbMot)] 
+        coefPlace = coefPlace*parametersStep01["placeMot"+str(nbMot)] 
     elif "placeMot"+str(nbMot-nbTotalMot) in parametersStep01:                    
-        coefPlace *= parametersStep01["placeMot"+str(nbMot-nbTotalMot)]   
+        coefPlace = coefPlace*parametersStep01["placeMot"+str(nbMot-nbTotalMot)]   
     if toPrint:
         print "      coefPlace :",coefPlace
     return coefPlace
@@ -1221,7 +1941,7 @@ def extractFeature3_AboutSlugProximity(parametersStep01, nSlug, nbMot, pos, posS
             coefNextTo = 0
         # check if there is "," between our match and the previous one, if so we reduce the value
         if i in posSpecial[","]:
-            value*=0.9
+            value = value*0.9
             j+=1
         i-=1
         j-=1
@@ -1249,8 +1969,7 @@ def extractPotentielNodes(graph, dicKeywords, nRegularSuggestions = 0, nBonusSug
     potentielNodes = {}
     potentielNodesBonus = {}
     maxEdge = 0
-    for i in graph.graphNodes:
-        graph.graphNodes[i].state = 0
+    graph.resetNodeStates()
     for name in dicKeywords:
         if not(graph.getNodeByName(name) is None):
             maxEdge = max(maxEdge, max(graph.getNodeByName(name).neighbours.values()))
@@ -1351,10 +2070,8 @@ def mergingKeywords(keywordsFromDesc, keywordsFromGraph, graph, codeNAF, keyword
             keywords[name][1] = 1.0*keywords[name][1]/maxNode
     # Computing relation sémantique
     stems = {}
-    french_stopwords = set(stopwords.words('french'))
-    stem = nltk.stem.snowball.FrenchStemmer()
     for name in keywords:
-        l = UtilsConstants.tokenizeAndStemmerize(name, False, french_stopwords, stem)
+        l = UtilsConstants.tokenizeAndStemmerize(name, False)
         for i in range(len(l)):
             if l[i] in equivalence:
                 l[i] = min(equivalence[l[i]])
@@ -9,30 +9,28 @@ Created on 25 avr. 2016
 import os
 import time
 
-import KeywordSelector
+import KeywordSelector, PipelineRunner
 import UtilsConstants
 import pandas as pd
 
 
-def main(arg):
+def main(arg, nbWorkers = 1, restart = False):
     if arg=="compute graph pipeline":
         # pipeline graph
-        KeywordSelector.pipelineGraph(200, percent=100, steps = [False, False, True])
+        KeywordSelector.pipelineGraph(200, percent=100, steps = [False, False, True], nbWorkers = nbWorkers)
+    if arg=="main pipeline parallel":
+        # global keyword selector, rows shared between nbWorkers processes
+        # (restart = True resumes the previous run from its checkpoint)
+        PipelineRunner.runPipeline(PipelineRunner.filenames, nbWorkers = nbWorkers, restart = restart)
+    if arg=="main pipeline streaming":
+        # global keyword selector, files read and written by chunks
+        PipelineRunner.runPipelineStreaming(PipelineRunner.filenames, chunksize = 10000, restart = restart)
     if arg=="main pipeline":
         # global keyword selector
         startTime = time.time()
         print "== GLOBAL PIPELINE"
         print ""
-        for fname in ["BRep_Step2_0_1000000",
-                      "BRep_Step2_1000000_2000000",
-                      "BRep_Step2_2000000_3000000",
-                      "BRep_Step2_3000000_4000000",
-                      "BRep_Step2_4000000_5000000",
-                      "BRep_Step2_5000000_6000000",
-                      "BRep_Step2_6000000_7000000",
-                      "BRep_Step2_7000000_8000000",
-                      "BRep_Step2_8000000_9176180",
-                      ]:
+        for fname in PipelineRunner.filenames:
             print "computing ",fname
             filename = os.path.join(UtilsConstants.pathAgreg,fname+".csv")
             df = pd.read_csv(filename,usecols=["siren","codeNaf","description"],encoding="utf8").values
@@ -50,5 +48,8 @@ def main(arg):
 # main("compute graph pipeline")
 
 
-main("main pipeline")
+if __name__ == "__main__":
+    main("main pipeline")
+#     main("main pipeline parallel", nbWorkers = 4)
+#     main("main pipeline streaming", restart = True)
 
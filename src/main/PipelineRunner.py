@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+'''
+Module running the main keyword pipeline over the 'BRep_Step2_*' files
+located in UtilsConstants.pathAgreg.
+The rows of each file are cut into shards that are processed by a pool of workers.
+Each worker computes the keywords of its shard and saves them in a shard file,
+the shard files are then merged into the usual '_keywords.csv' output, in the format of the single process pipeline.
+The files can also be streamed in a single process, chunk by chunk,
+the keywords of each chunk being appended to the output as soon as they are computed.
+'''
+
+import cPickle
+import multiprocessing
+import os
+import time
+
+import IOFunctions, KeywordSelector, UtilsConstants
+import pandas as pd
+
+
+filenames = ["BRep_Step2_0_1000000",
+             "BRep_Step2_1000000_2000000",
+             "BRep_Step2_2000000_3000000",
+             "BRep_Step2_3000000_4000000",
+             "BRep_Step2_4000000_5000000",
+             "BRep_Step2_5000000_6000000",
+             "BRep_Step2_6000000_7000000",
+             "BRep_Step2_7000000_8000000",
+             "BRep_Step2_8000000_9176180",
+             ]
+
+''' state of the workers '''
+
+# graph and keywords used by the workers.
+# the state is loaded by the main process before the pool is created,
+# so that the workers inherit it when the process is forked instead of loading it again.
+# the graph is read-only and memory-mapped from its binary format,
+# so that all the workers share a single copy of it, even when they load it themselves.
+workerState = {}
+
+def loadWorkerState():
+    '''
+    function that loads the graph and the keywords used by the pipeline,
+    if they haven't been loaded yet in the current process.
+    It is used as the initializer of the workers.
+    -- IN
+        the function takes no argument
+    -- OUT
+        the function returns nothing
+    '''
+    if len(workerState)>0:
+        return
+    os.chdir(os.path.join(UtilsConstants.pathCodeNAF,"graphcomplet"))
+    graph = IOFunctions.importGraph("graphcomplet", mmap=True)
+    keywordSet, dicWordWeight, dicSlug, equivalences = IOFunctions.importLexicon()
+    workerState["graph"] = graph
+    workerState["keywordSet"] = keywordSet
+    workerState["dicWordWeight"] = dicWordWeight
+    workerState["equivalences"] = equivalences
+    workerState["dicSlug"] = dicSlug
+    workerState["slugIndex"] = KeywordSelector.computeSlugIndex(dicSlug, equivalences)
+
+
+''' writing results '''
+
+def getKeywordsFilename(fname):
+    return os.path.join(UtilsConstants.pathAgreg,fname+"_keywords.csv")
+
+def getKeywordsColumns(nbMot):
+    '''
+    function returning the columns of the keywords, in the order DataFrame.from_dict gives them
+    for the keywords returned by KeywordSelector.pipeline
+    '''
+    return pd.DataFrame.from_dict({0:{"keyword_"+str(i) : "" for i in range(nbMot)}}, orient="index").columns
+
+def writeKeywords(dic, filename, mode = "w", columns = None):
+    '''
+    function that writes the keywords computed by the pipeline in a csv file,
+    in the format of the single process pipeline (DataFrame.from_dict(dic, orient="index")).
+    -- IN
+        dic : keywords returned by KeywordSelector.pipeline (dic{siren:{"keyword_0":kw0(str), ...}})
+        filename : path of the csv file (str)
+        mode : "w" to write a new file, "a" to append the rows to an existing file (str) default = "w"
+            (the header is only written in "w" mode)
+        columns : *optional - columns written, so that the rows appended to a file have the same columns (cf. getKeywordsColumns) default = None
+            (-> let None to write the columns given by DataFrame.from_dict)
+    -- OUT
+        the function returns nothing
+    '''
+    df = pd.DataFrame.from_dict(dic, orient="index")
+    if not(columns is None):
+        df = df.reindex(columns=columns)
+    with open(filename, mode) as fichier:
+        df.to_csv(fichier, header=(mode=="w"), encoding="utf8")
+        fichier.flush()
+        os.fsync(fichier.fileno())
+
+
+''' checkpoints '''
+
+# the checkpoint file stores, for each file, the number of rows whose keywords are saved,
+# the size of the output at that point and whether the file is finished.
+# when a run is restarted, the output is cut back to the saved size, so that the rows written
+# after the last checkpoint are computed again without being duplicated.
+
+def getCheckpointFilename():
+    return os.path.join(UtilsConstants.pathAgreg,"pipeline_checkpoint.txt")
+
+def importCheckpoint():
+    '''
+    function that imports the checkpoint of the last run of the pipeline
+    -- IN
+        the function takes no argument
+    -- OUT
+        checkpoint : dictionary of the progress of each file (dic{fname(str):[nbRows(int), outputSize(int), done(boolean)]})
+            (empty if there is no checkpoint)
+    '''
+    checkpoint = {}
+    if not os.path.isfile(getCheckpointFilename()):
+        return checkpoint
+    with open(getCheckpointFilename(),"r") as fichier:
+        for line in fichier:
+            tab = line.strip().split(";")
+            if len(tab)==4:
+                checkpoint[tab[0]] = [int(tab[1]), int(tab[2]), tab[3]=="1"]
+    return checkpoint
+
+def saveCheckpoint(checkpoint):
+    '''
+    function that saves the checkpoint of the pipeline.
+    The checkpoint is written in a temporary file that then replaces the previous one,
+    so that a crash while saving doesn't corrupt it.
+    -- IN
+        checkpoint : dictionary of the progress of each file (dic{fname(str):[nbRows(int), outputSize(int), done(boolean)]})
+    -- OUT
+        the function returns nothing
+    '''
+    filename = getCheckpointFilename()
+    with open(filename+".tmp","w") as fichier:
+        for fname in sorted(checkpoint):
+            nbRows, outputSize, done = checkpoint[fname]
+            fichier.write(fname+";"+str(nbRows)+";"+str(outputSize)+";"+("1" if done else "0")+"\n")
+        fichier.flush()
+        os.fsync(fichier.fileno())
+    try:
+        os.rename(filename+".tmp", filename)
+    except OSError:
+        # windows doesn't replace existing files
+        os.remove(filename)
+        os.rename(filename+".tmp", filename)
+
+def startCheckpoint(restart):
+    '''
+    function returning the checkpoint to start a run from
+    -- IN
+        restart : boolean that settles if the previous run is resumed (boolean)
+            if False, the previous checkpoint is removed
+    -- OUT
+        checkpoint : dictionary of the progress of each file (dic{fname(str):[nbRows(int), outputSize(int), done(boolean)]})
+    '''
+    if restart:
+        return importCheckpoint()
+    if os.path.isfile(getCheckpointFilename()):
+        os.remove(getCheckpointFilename())
+    return {}
+
+
+''' sharded runner '''
+
+def getShardFilename(fname, nShard):
+    return os.path.join(UtilsConstants.pathAgreg,fname+"_keywords_shard_"+str(nShard)+".pkl")
+
+def processShard(task):
+    '''
+    function that computes the keywords of one shard of rows and saves them in the shard file,
+    as the list of the sirens and keywords following the order of the rows (cf. mergeShards).
+    The shard is written in a temporary file renamed once complete,
+    so that an existing shard file is always a finished shard.
+    -- IN
+        task : tuple (fname(str), nShard(int), rows(array [[siren, codeNAF, description]]), nbMot(int))
+    -- OUT
+        result : tuple (fname(str), nShard(int), nbRows(int), time(float), pid(int))
+    '''
+    fname, nShard, rows, nbMot = task
+    startTime = time.time()
+    loadWorkerState()
+    dic = KeywordSelector.pipeline(rows, nbMot = nbMot, **workerState)
+    filename = getShardFilename(fname, nShard)
+    with open(filename+".tmp","wb") as fichier:
+        cPickle.dump([(row[0], dic[row[0]]) for row in rows], fichier, cPickle.HIGHEST_PROTOCOL)
+        fichier.flush()
+        os.fsync(fichier.fileno())
+    if os.path.isfile(filename):
+        os.remove(filename)
+    os.rename(filename+".tmp", filename)
+    return fname, nShard, len(rows), time.time()-startTime, os.getpid()
+
+def mergeShards(fname, nbShards):
+    '''
+    function that merges the shard files of one file, in order, into the '_keywords.csv' output
+    and removes the shard files.
+    The keywords are gathered as KeywordSelector.pipeline does over the whole file :
+    a siren written by several rows or shards is only kept once, with the keywords of its last row.
+    -- IN
+        fname : name of the processed file (str)
+        nbShards : number of shards of the file (int)
+    -- OUT
+        the function returns nothing
+    '''
+    dic = {}
+    for nShard in range(nbShards):
+        with open(getShardFilename(fname, nShard),"rb") as shard:
+            for siren, keywords in cPickle.load(shard):
+                dic[siren] = keywords
+    writeKeywords(dic, getKeywordsFilename(fname))
+    for nShard in range(nbShards):
+        os.remove(getShardFilename(fname, nShard))
+
+def printWorkerStats(workerStats):
+    '''
+    function that prints the throughput of each worker
+    -- IN
+        workerStats : dictionary of the number of rows and the time spent by each worker (dic{pid(int):[nbRows(int), time(float)]})
+    '''
+    for pid in sorted(workerStats):
+        nbRows, totalTime = workerStats[pid]
+        print "   worker",pid,":",nbRows,"rows,",int(nbRows/max(totalTime,0.001)),"rows/s"
+
+def runPipeline(fnames = filenames, nbWorkers = multiprocessing.cpu_count(), shardSize = 10000, nbMot = 5, restart = False):
+    '''
+    function that runs the keyword pipeline over the given files using a pool of workers.
+    For each file, the rows are cut into shards of shardSize rows, the shards are processed
+    by the workers and then merged into the file fname+'_keywords.csv'.
+    -- IN
+        fnames : names of the files to process, without extension ([str]) default = filenames
+        nbWorkers : number of worker processes (int) default = number of cpus
+        shardSize : number of rows of a shard (int) default = 10000
+        nbMot : maximal number of keywords per description (int) default = 5
+        restart : boolean that settles if the previous run is resumed (boolean) default = False
+            the finished files are skipped, as well as the shards already saved for the others
+            (the shardSize must be the same as in the previous run)
+    -- OUT
+        the function returns nothing
+    '''
+    startTime = time.time()
+    print "== GLOBAL PIPELINE -",nbWorkers,"workers"
+    print ""
+    # loading the state before creating the pool, the workers inherit it
+    loadWorkerState()
+    pool = multiprocessing.Pool(nbWorkers, initializer=loadWorkerState)
+    try:
+        checkpoint = startCheckpoint(restart)
+        for fname in fnames:
+            if fname in checkpoint and checkpoint[fname][2]:
+                print "skipping ",fname,"(already computed)"
+                continue
+            print "computing ",fname
+            filename = os.path.join(UtilsConstants.pathAgreg,fname+".csv")
+            df = pd.read_csv(filename,usecols=["siren","codeNaf","description"],encoding="utf8").values
+            nbShards = (len(df)+shardSize-1)/shardSize
+            tasks = [(fname, nShard, df[nShard*shardSize:(nShard+1)*shardSize], nbMot)
+                     for nShard in range(nbShards)
+                     if not(restart and os.path.isfile(getShardFilename(fname, nShard)))]
+            compt = UtilsConstants.Compt(tasks, 10)
+            workerStats = {}
+            for _, _, nbRows, totalTime, pid in pool.imap_unordered(processShard, tasks):
+                if not(pid in workerStats):
+                    workerStats[pid] = [0,0.0]
+                workerStats[pid][0] += nbRows
+                workerStats[pid][1] += totalTime
+                compt.updateAndPrint()
+            mergeShards(fname, nbShards)
+            checkpoint[fname] = [len(df), os.path.getsize(getKeywordsFilename(fname)), True]
+            saveCheckpoint(checkpoint)
+            printWorkerStats(workerStats)
+            UtilsConstants.printTime(startTime)
+    finally:
+        pool.close()
+        pool.join()
+
+
+''' streaming runner '''
+
+def runPipelineStreaming(fnames = filenames, chunksize = 10000, nbMot = 5, restart = False):
+    '''
+    function that runs the keyword pipeline over the given files in the current process,
+    reading each file by chunks of chunksize rows. The keywords of each chunk are appended
+    to the file fname+'_keywords.csv' once computed, so that the memory used doesn't depend
+    on the size of the files and that a crash only loses the current chunk.
+    A checkpoint is saved after each chunk.
+    The rows are written as by the single process pipeline, chunk by chunk, with the nbMot columns of keywords
+    in the order given by getKeywordsColumns (the single process pipeline orders the columns depending on the whole file).
+    A siren is only kept once within a chunk : a siren repeated in several chunks is written once per chunk,
+    the last row of the siren being the one kept by the single process pipeline.
+    -- IN
+        fnames : names of the files to process, without extension ([str]) default = filenames
+        chunksize : number of rows read at once (int) default = 10000
+        nbMot : maximal number of keywords per description (int) default = 5
+        restart : boolean that settles if the previous run is resumed (boolean) default = False
+            the finished files are skipped and the others resume after the last saved row
+    -- OUT
+        the function returns nothing
+    '''
+    startTime = time.time()
+    print "== GLOBAL PIPELINE - streaming by chunks of",chunksize,"rows"
+    print ""
+    loadWorkerState()
+    # the chunks appended to the output have the same columns
+    columns = getKeywordsColumns(nbMot)
+    checkpoint = startCheckpoint(restart)
+    for fname in fnames:
+        nbRows, outputSize, done = checkpoint.get(fname, [0, 0, False])
+        if done:
+            print "skipping ",fname,"(already computed)"
+            continue
+        filename = os.path.join(UtilsConstants.pathAgreg,fname+".csv")
+        output = getKeywordsFilename(fname)
+        if nbRows>0:
+            print "resuming ",fname,"from row",nbRows
+            # removing the rows written after the last checkpoint
+            with open(output,"r+b") as fichier:
+                fichier.truncate(outputSize)
+            mode = "a"
+            # the skipped rows aren't listed, their number being as large as the file
+            skiprows = lambda i : 0 < i <= nbRows
+        else:
+            print "computing ",fname
+            mode = "w"
+            skiprows = None
+        for chunk in pd.read_csv(filename,usecols=["siren","codeNaf","description"],encoding="utf8",chunksize=chunksize,skiprows=skiprows):
+            rows = chunk[["siren","codeNaf","description"]].values
+            dic = KeywordSelector.pipeline(rows, nbMot = nbMot, **workerState)
+            writeKeywords(dic, output, mode, columns)
+            mode = "a"
+            nbRows += len(rows)
+            checkpoint[fname] = [nbRows, os.path.getsize(output), False]
+            saveCheckpoint(checkpoint)
+            print "   ",nbRows,"rows computed"
+        if mode=="w":
+            # empty file, writing the header
+            writeKeywords({}, output, mode, columns)
+        checkpoint[fname] = [nbRows, os.path.getsize(output), True]
+        saveCheckpoint(checkpoint)
+        UtilsConstants.printTime(startTime)
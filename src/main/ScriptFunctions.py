@@ -9,9 +9,13 @@ import codecs
 from operator import itemgetter
 import os
 import re
+import sys
 import time
 import urllib
 
+from nltk.corpus import stopwords
+import nltk.stem.snowball
+
 import IOFunctions, KeywordSelector, UtilsConstants, GeneticKeywords03, GraphLearning
 
 
@@ -313,6 +317,177 @@ def functionEstimationTempsLearning():
             GraphLearning.preprocessClassifiers(classifiers, ["Genetic "+str(nbChromo)+" "+str(nbTotalStep)], nbPrise=1, toSave=False)
             UtilsConstants.printTime(temps)
 
+def fonctionEstimationTempsStep01(n=100000, nCompare=1000, targetThroughput=200):
+    '''
+    function that measures the throughput of the step 01 using the batch extraction
+    over a sample of n entreprises, and checks over the nCompare first descriptions
+    that the results are equal to the ones of the single-call extraction.
+    -- IN
+        n : size of the sample (int) default = 100000
+        nCompare : number of descriptions compared with the single-call extraction (int) default = 1000
+        targetThroughput : throughput the batch extraction must reach (descriptions/s) (int) default = 200
+    -- OUT
+        the function returns True if the target throughput is reached without difference between both extractions, False else
+    '''
+    entreprises = IOFunctions.extractSubset(n=n)
+    keywords = IOFunctions.importKeywords()
+    dicWordWeight = UtilsConstants.importDicWordWeight(keywords)
+    equivalences = IOFunctions.importSlugEquivalence()
+    print "tokenizing",len(entreprises),"descriptions"
+    startTime = time.time()
+    descriptions = [UtilsConstants.tokenizeAndStemmerize(entreprise[1], keepComa=True) for entreprise in entreprises]
+    UtilsConstants.printTime(startTime)
+    # batch extraction
+    startTime = time.time()
+    results = KeywordSelector.extractFromDescriptionBatch(descriptions, keywords, dicWordWeight, equivalences)
+    totalTime = time.time()-startTime
+    throughput = len(descriptions)/max(totalTime,0.001)
+    print "batch extraction :",int(throughput),"descriptions/s (target :",targetThroughput,"descriptions/s)"
+    # single-call extraction
+    startTime = time.time()
+    nbDifferences = 0
+    for description, result in zip(descriptions[:nCompare], results[:nCompare]):
+        if result != KeywordSelector.extractFromDescription(None, keywords, dicWordWeight, equivalences, preprocessedString=description):
+            nbDifferences += 1
+    totalTime = time.time()-startTime
+    print "single extraction :",int(min(nCompare,len(descriptions))/max(totalTime,0.001)),"descriptions/s"
+    print "differences between both extractions :",nbDifferences
+    success = throughput>=targetThroughput and nbDifferences==0
+    print "target reached" if success else "target not reached"
+    return success
+
+def fonctionComparaisonTokenizers(n=100000, nPrint=10):
+    '''
+    function that compares the regex tokenizer to the nltk one over the keywords
+    and a sample of n entreprises, printing the differences and the time spent by each tokenizer.
+    '''
+    keywords = IOFunctions.importKeywords()
+    entreprises = IOFunctions.extractSubset(n=n)
+    for name, texts, keepComa in [("keywords", keywords.keys(), False),
+                                  ("descriptions", [entreprise[1] for entreprise in entreprises], True)]:
+        differences, times = UtilsConstants.compareTokenizers(texts, keepComa)
+        print name,":",len(texts),"texts,",len(differences),"differences"
+        print "   nltk :",int(len(texts)/max(times[0],0.001)),"texts/s - regex :",int(len(texts)/max(times[1],0.001)),"texts/s"
+        for text, stemsNltk, stemsRegex in differences[:nPrint]:
+            print "  ",[text]
+            print "      nltk :",stemsNltk
+            print "      regex :",stemsRegex
+
+def fonctionEstimationTempsContexte(nbCalls=1000):
+    '''
+    microbenchmark of the tokenizer context : compares, over nbCalls keywords, the time per call
+    of tokenizeAndStemmerize when the stopwords and the stemmer are built for each call
+    (as the call sites did before the context) and when the shared context is used.
+    the string cache is not used in order to only measure the overhead of the call.
+    '''
+    keywords = IOFunctions.importKeywords().keys()[:nbCalls]
+    context = UtilsConstants.tokenizerContext
+    startTime = time.time()
+    for keyword in keywords:
+        french_stopwords = [UtilsConstants.preprocessString(a) for a in set(stopwords.words('french'))]
+        stem = nltk.stem.snowball.FrenchStemmer()
+        UtilsConstants.tokenizeAndStemmerizeNoMemo(keyword, False, french_stopwords, stem, "nltk")
+    timeRebuilt = (time.time()-startTime)/len(keywords)
+    startTime = time.time()
+    for keyword in keywords:
+        UtilsConstants.tokenizeAndStemmerizeNoMemo(keyword, False, context.stopwords, context.stemmer, "nltk")
+    timeContext = (time.time()-startTime)/len(keywords)
+    print "stopwords and stemmer built at each call :",int(1000000*timeRebuilt),"microseconds per call"
+    print "shared tokenizer context :",int(1000000*timeContext),"microseconds per call"
+
+class DictObject():
+    '''
+    object storing its attributes in a __dict__, as the Node and Edge classes did before their slots
+    '''
+    pass
+
+def getObjectSize(obj):
+    '''
+    function returning the size in bytes of an object and of its __dict__ if it has one
+    '''
+    size = sys.getsizeof(obj)
+    if hasattr(obj, "__dict__"):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+def getNodeSize(node):
+    '''
+    function returning the size in bytes of a node, its dicNAF, features and visualization attributes
+    (the neighbours are counted with the edges, the strings of the names and codeNAF aren't counted)
+    '''
+    size = getObjectSize(node) + sys.getsizeof(node.dicNAF) + sum([sys.getsizeof(v) for v in node.dicNAF.values()])
+    if isinstance(node, DictObject):
+        size += sys.getsizeof(node.features) + sys.getsizeof(node.color)
+    else:
+        if not(node.nodeFeatures is None):
+            size += sys.getsizeof(node.nodeFeatures)
+        if not(node.visualization is None):
+            size += getObjectSize(node.visualization) + sys.getsizeof(node.visualization.color)
+    return size
+
+def getEdgesSize(graph, edgeObjects):
+    '''
+    function returning the size in bytes of the edges : the graphEdges dictionary, its keys,
+    the edge objects and the neighbours dictionaries of the nodes
+    '''
+    size = sys.getsizeof(graph.graphEdges)
+    size += sum([sys.getsizeof(key)+getObjectSize(edge)+sys.getsizeof(edge.value) for key, edge in zip(graph.graphEdges.keys(), edgeObjects)])
+    for node in graph.graphNodes.values():
+        size += sys.getsizeof(node.neighbours) + sum([sys.getsizeof(v) for v in node.neighbours.values()])
+    return size
+
+def fonctionMemoireGraphe():
+    '''
+    memory benchmark of the graph : loads the graphcomplet and prints the number of bytes per node and per edge
+    of the Node and Edge objects (with their slots), of the same objects stored in a __dict__
+    with their visualization attributes (as they were before the slots) and of the compact graph (CSRGraphKeyword).
+    the sizes are measured with sys.getsizeof, the strings of the names and codeNAF and the dicIdNodes aren't counted.
+    '''
+    os.chdir(os.path.join(UtilsConstants.pathCodeNAF,"graphcomplet"))
+    graph = IOFunctions.importGraph("graphcomplet", backend="dict")
+    nodes = graph.graphNodes.values()
+    nbNodes = len(nodes)
+    nbEdges = len(graph.graphEdges)
+    # objects stored in a __dict__, with the attributes of the former Node and Edge
+    dictNodes = []
+    for node in nodes:
+        dictNode = DictObject()
+        dictNode.id = node.id
+        dictNode.name = node.name
+        dictNode.genericity = node.genericity
+        dictNode.dicNAF = node.dicNAF
+        dictNode.features = {}
+        dictNode.state = node.state
+        dictNode.color = [100,100,100]
+        dictNode.shape = "disc"
+        dictNode.size = node.size
+        dictNode.neighbours = node.neighbours
+        dictNodes.append(dictNode)
+    dictEdges = []
+    for edge in graph.graphEdges.values():
+        dictEdge = DictObject()
+        dictEdge.id0 = edge.id0
+        dictEdge.id1 = edge.id1
+        dictEdge.value = edge.value
+        dictEdge.nbOccurence = edge.nbOccurence
+        dictEdges.append(dictEdge)
+    bytesNodes = [1.0*sum([getNodeSize(node) for node in dictNodes])/nbNodes,
+                  1.0*sum([getNodeSize(node) for node in nodes])/nbNodes]
+    bytesEdges = [1.0*getEdgesSize(graph, dictEdges)/nbEdges,
+                  1.0*getEdgesSize(graph, graph.graphEdges.values())/nbEdges]
+    # compact graph
+    compactGraph = IOFunctions.importGraph("graphcomplet", backend="csr")
+    bytesNodes.append(1.0*(compactGraph.ids.nbytes + compactGraph.genericities.nbytes + compactGraph.sizes.nbytes
+                           + compactGraph.states.nbytes + compactGraph.matrixNAF.data.nbytes
+                           + compactGraph.matrixNAF.indices.nbytes + compactGraph.matrixNAF.indptr.nbytes
+                           + sys.getsizeof(compactGraph.rowOfId))/nbNodes)
+    bytesEdges.append(1.0*(compactGraph.indptr.nbytes + compactGraph.indices.nbytes
+                           + compactGraph.weights.nbytes + compactGraph.occurrences.nbytes)/nbEdges)
+    print "graphcomplet :",nbNodes,"nodes,",nbEdges,"edges"
+    for name, bytesNode, bytesEdge in zip(["objects with __dict__", "objects with slots", "compact graph"], bytesNodes, bytesEdges):
+        print "  ",name,":",int(bytesNode),"bytes per node,",int(bytesEdge),"bytes per edge"
+    print "   reduction with slots :",int(bytesNodes[0]-bytesNodes[1]),"bytes per node,",int(bytesEdges[0]-bytesEdges[1]),"bytes per edge"
+
 def cleanNewKeywords():
     keywords = IOFunctions.importKeywords()
     os.chdir(UtilsConstants.path+"/motscles")
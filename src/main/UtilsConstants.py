@@ -6,13 +6,14 @@ Created on 12 mai 2016
 '''
 
 import codecs
+import collections
 import datetime
 import decimal
+import hashlib
 from operator import itemgetter
 import os, time
+import uuid
 
-from nltk.corpus import stopwords
-import nltk.stem.snowball
 import unidecode, re
 
 import numpy as np
@@ -27,7 +28,10 @@ pathClassifiers = os.path.join(path,"preprocessingData","classifiers")
 pathConstants = os.path.join(path,"preprocessingData","constants")
 pathKeywords = os.path.join(path,"motscles")
 
-os.chdir(os.path.join(path,"preprocessingData"))   
+# graph representation returned by IOFunctions.importGraph :
+# "dict" : GraphKeyword, made of Node and Edge objects, which can be modified
+# "csr" : CSRGraphKeyword, storing the nodes and the edges in numpy arrays, read-only but much smaller
+graphBackend = "dict"
 
 ''' Auxiliary functions and classes'''
 
@@ -78,7 +82,145 @@ def printTime(startTime):
     minutes = (int)((totalTime-3600*hours)/60)  
     seconds = (int)(totalTime%60)
     print "time : ",hours,':',minutes,':',seconds
-                  
+
+class LRUCache():
+    ''' class which implements a dictionary of bounded size,
+    the least recently used entries being removed first when it is full.
+    the hits and misses are counted in order to size the cache.
+    '''
+    def __init__(self, maxSize):
+        self.maxSize = maxSize
+        self.dic = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default = None):
+        try:
+            value = self.dic.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self.dic[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self.maxSize<=0:
+            return
+        if key in self.dic:
+            del self.dic[key]
+        elif len(self.dic)>=self.maxSize:
+            self.dic.popitem(last=False)
+        self.dic[key] = value
+
+    def resize(self, maxSize):
+        self.maxSize = maxSize
+        while len(self.dic)>max(maxSize,0):
+            self.dic.popitem(last=False)
+
+    def clear(self):
+        self.dic.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        '''
+        function returning the counters of the cache
+        -- OUT
+            stats : dictionary (dic{"hits":int, "misses":int, "hitRate":float, "size":int, "maxSize":int})
+        '''
+        return {"hits":self.hits,
+                "misses":self.misses,
+                "hitRate":1.0*self.hits/max(1,self.hits+self.misses),
+                "size":len(self.dic),
+                "maxSize":self.maxSize}
+
+    def __len__(self):
+        return len(self.dic)
+
+    def __contains__(self, key):
+        return key in self.dic
+
+class LazyDict(collections.MutableMapping):
+    ''' class which implements a dictionary whose content is only loaded on its first use,
+    by calling loader(*args). the object exists from the start, so that it can be shared
+    and used as a default argument before being loaded.
+    it isn't a dict but a mapping wrapping the loaded dictionary (cf. load), so that all its uses
+    (dict(lazyDict), **lazyDict, copy, comparisons) load it first.
+    the functions using it many times can use the loaded dictionary directly (cf. KeywordSelector.extractFromDescription).
+    '''
+    def __init__(self, loader, *args):
+        self.loader = loader
+        self.args = args
+        self.dic = None
+
+    def load(self):
+        '''
+        function returning the loaded dictionary, reading it on the first call
+        '''
+        if self.dic is None:
+            self.dic = dict(self.loader(*self.args))
+        return self.dic
+
+    def reload(self):
+        '''
+        function that reads the dictionary again, updating it in place
+        '''
+        if self.dic is None:
+            self.load()
+        else:
+            dic = self.loader(*self.args)
+            self.dic.clear()
+            self.dic.update(dic)
+
+    def __getitem__(self, key):
+        return self.load()[key]
+
+    def __setitem__(self, key, value):
+        self.load()[key] = value
+
+    def __delitem__(self, key):
+        del self.load()[key]
+
+    def __iter__(self):
+        return iter(self.load())
+
+    def __len__(self):
+        return len(self.load())
+
+    def __contains__(self, key):
+        return key in self.load()
+
+    def __eq__(self, other):
+        if isinstance(other, LazyDict):
+            other = other.load()
+        return self.load() == other
+
+    def __ne__(self, other):
+        return not(self == other)
+
+    def __repr__(self):
+        return repr(self.load())
+
+    def get(self, key, default = None):
+        return self.load().get(key, default)
+
+    def keys(self):
+        return self.load().keys()
+
+    def values(self):
+        return self.load().values()
+
+    def items(self):
+        return self.load().items()
+
+    def copy(self):
+        return self.load().copy()
+
+    def __reduce__(self):
+        # pickled and copied as a usual dictionary
+        return (dict, (self.load(),))
+
 def saveDict(dic,filename,sep="-"):
     '''
     function that saves a dictionary in a text file.
@@ -187,25 +329,168 @@ def preprocessString(srctxt):
         pass
     return unidecode.unidecode(srctxt).lower()
 
-def tokenizeAndStemmerize(srctxt, 
-                          keepComa = False, 
-                          french_stopwords = [preprocessString(a) for a in set(stopwords.words('french'))],
-                          stem = nltk.stem.snowball.FrenchStemmer()):
+# caches of tokenizeAndStemmerize :
+# stemCache links tokens to their stem, it is used with any FrenchStemmer
+# stringCache links short strings (such as keywords) to their whole output, it is only used
+# with the default stopwords and stemmer
+stemCacheSize = 200000
+stringCacheSize = 100000
+stringCacheMaxLength = 100
+stemCache = LRUCache(stemCacheSize)
+stringCache = LRUCache(stringCacheSize)
+
+def setCacheSize(stemSize = None, stringSize = None):
+    '''
+    function that changes the maximal size of the caches of tokenizeAndStemmerize
+    (a size of 0 disables the cache)
+    -- IN
+        stemSize : maximal number of tokens in the stem cache (int) default = None (-> unchanged)
+        stringSize : maximal number of strings in the string cache (int) default = None (-> unchanged)
+    '''
+    if not(stemSize is None):
+        stemCache.resize(stemSize)
+    if not(stringSize is None):
+        stringCache.resize(stringSize)
+
+def getCacheStats():
+    '''
+    function returning the counters of the caches of tokenizeAndStemmerize
+    -- OUT
+        stats : dictionary of the counters of each cache (dic{"stem":{...}, "string":{...}}, cf. LRUCache.stats)
+    '''
+    return {"stem":stemCache.stats(), "string":stringCache.stats()}
+
+def clearCaches():
+    stemCache.clear()
+    stringCache.clear()
+
+# tokenizers available in tokenizeAndStemmerize :
+# "nltk" : nltk.word_tokenize, splitting the text in sentences with Punkt before the Treebank tokenizer
+# "regex" : a single regex giving the same tokens as the Treebank tokenizer on our lowercase ascii texts,
+#     a point followed by a space (or ending the text) being considered as the end of a sentence
+#     except after numbers and single letters followed by a word (as Punkt does),
+#     the punctuation dropped by tokenizeAndStemmerize (except comas and points) is not returned
+tokenizerMode = "nltk"
+regexTokenizer = re.compile(r"""\.\.\.
+                                |(?:[.,]?\d[\d,.]*|[^\W\d_])\.(?=\s+[^\W\d_])
+                                |(?:[^\s.,:;@#$%&?!()\[\]{}<>"`']
+                                   |[.,:](?=\d)
+                                   |\.(?=[^\s.,:;@#$%&?!()\[\]{}<>"`'])
+                                   |\.\.(?!\.)
+                                   |'(?=\w\w)
+                                 )+
+                                |[.,]""", re.VERBOSE|re.UNICODE)
+
+class TokenizerContext():
+    ''' class which gathers the objects used to tokenize texts :
+    the normalized french stopwords, the stemmer and the compiled regexes.
+    a single context is created (tokenizerContext) and shared by all the call sites,
+    instead of building the stopwords and the stemmer again for each call.
+    the objects coming from nltk (stopwords, stemmer, wordTokenize) are loaded on their first use.
+    '''
+    def __init__(self):
+        self.regexParenthesis = re.compile(r" \(([a-z]| )*\)")
+        self.regexDash = re.compile(r"-")
+        self.regexTokenizer = regexTokenizer
+
+    def __getattr__(self, name):
+        if name in ["stopwords", "stemmer", "wordTokenize"]:
+            self.loadNltk()
+            return self.__dict__[name]
+        raise AttributeError(name)
+
+    def loadNltk(self):
+        from nltk.corpus import stopwords
+        import nltk.stem.snowball
+        self.stopwords = frozenset([preprocessString(a) for a in stopwords.words('french')])
+        self.stemmer = nltk.stem.snowball.FrenchStemmer()
+        self.wordTokenize = nltk.word_tokenize
+
+tokenizerContext = TokenizerContext()
+
+# stopwords removed from the descriptions when the graphs are built : none, the stopwords being kept
+# in the descriptions of the graphs (cf. KeywordSelector.buildFromEntreprises, IOFunctions.saveSubsetTokens)
+graphStopwords = frozenset()
+
+def tokenize(srctxt, tokenizer = None):
+    '''
+    function splitting a preprocessed string into tokens
+    -- IN:
+        srctxt : the string to tokenize (string)
+        tokenizer : tokenizer to use, "nltk" or "regex" (str) default = None (-> tokenizerMode)
+    -- OUT:
+        tokens : array of tokens (array[token])
+    '''
+    if tokenizer is None:
+        tokenizer = tokenizerMode
+    if tokenizer=="regex":
+        return tokenizerContext.regexTokenizer.findall(srctxt)
+    return tokenizerContext.wordTokenize(srctxt,'french')
+
+def compareTokenizers(texts, keepComa = True, tokenizers = ("nltk","regex")):
+    '''
+    function checking that two tokenizers give the same output of tokenizeAndStemmerize over a corpus
+    -- IN:
+        texts : corpus of texts to process ([str])
+        keepComa : boolean given to tokenizeAndStemmerize (boolean) default = True
+        tokenizers : couple of tokenizers to compare (tuple(str,str)) default = ("nltk","regex")
+    -- OUT:
+        differences : list of the texts with different outputs and both outputs ([(text, stems0, stems1)])
+        times : time spent by each tokenizer over the corpus ([float, float])
+    '''
+    outputs = []
+    times = []
+    for tokenizer in tokenizers:
+        startTime = time.time()
+        outputs.append([tokenizeAndStemmerizeNoMemo(text, keepComa, tokenizerContext.stopwords, tokenizerContext.stemmer, tokenizer) for text in texts])
+        times.append(time.time()-startTime)
+    differences = [(text, stems0, stems1) for text, stems0, stems1 in zip(texts, outputs[0], outputs[1]) if stems0!=stems1]
+    return differences, times
+
+def tokenizeAndStemmerize(srctxt,
+                          keepComa = False,
+                          french_stopwords = None,
+                          stem = None,
+                          tokenizer = None):
     '''
     NLP function that transform a string into an array of stemerized tokens
     The punctionaction, stopwords and numbers are also removed as long as words shorter than 3 characters
+    The stems and the results for short strings are cached (cf. stemCache and stringCache).
     -- IN:
         srctxt : the string text to process (string)
         keepComa : boolean that settles if the process should keep comas/points during the process (boolean) default=false
-        french_stopwords : set of french stop_words
-        stem : stemmerizer
+        french_stopwords : set of french stop_words (frozenset) default = None (-> tokenizerContext.stopwords)
+        stem : stemmerizer default = None (-> tokenizerContext.stemmer)
+        tokenizer : tokenizer to use, "nltk" or "regex" (str) default = None (-> tokenizerMode)
     -- OUT:
-        stems : array of stemerized tokens (array[token]) 
+        stems : array of stemerized tokens (array[token])
     '''
+    if tokenizer is None:
+        tokenizer = tokenizerMode
+    if french_stopwords is None:
+        french_stopwords = tokenizerContext.stopwords
+    if stem is None:
+        stem = tokenizerContext.stemmer
+    memo = isinstance(srctxt, basestring) and len(srctxt)<=stringCacheMaxLength \
+            and french_stopwords is tokenizerContext.stopwords and stem is tokenizerContext.stemmer
+    if memo:
+        stems = stringCache.get((srctxt, keepComa, tokenizer))
+        if not(stems is None):
+            return list(stems)
+    stems = tokenizeAndStemmerizeNoMemo(srctxt, keepComa, french_stopwords, stem, tokenizer)
+    if memo:
+        stringCache.put((srctxt, keepComa, tokenizer), tuple(stems))
+    return stems
+
+def tokenizeAndStemmerizeNoMemo(srctxt, keepComa, french_stopwords, stem, tokenizer):
+    '''
+    function doing the work of tokenizeAndStemmerize, without the string cache
+    '''
+    cacheStem = type(stem) is type(tokenizerContext.stemmer)
     srctxt = preprocessString(srctxt)
-    srctxt = re.sub(r" \(([a-z]| )*\)","",srctxt)
-    srctxt = re.sub(r"-"," ",srctxt)
-    tokens = nltk.word_tokenize(srctxt,'french')
+    srctxt = tokenizerContext.regexParenthesis.sub("",srctxt)
+    srctxt = tokenizerContext.regexDash.sub(" ",srctxt)
+    tokens = tokenize(srctxt, tokenizer)
     tokens = [token for token in tokens if (keepComa==True and (token=="." or token==",")) \
                                             or (len(token)>1 
                                                 and token not in french_stopwords)]
@@ -218,10 +503,160 @@ def tokenizeAndStemmerize(srctxt,
             if token[0:2]=="d'" or token[0:2]=="l'":
                 token = token[2:]
             if len(token)>2:
-                stems.append(stem.stem(token)) 
+                if cacheStem:
+                    s = stemCache.get(token)
+                    if s is None:
+                        s = stem.stem(token)
+                        stemCache.put(token, s)
+                    stems.append(s)
+                else:
+                    stems.append(stem.stem(token))
             if len(token)==1 and keepComa==True:
                 stems.append(token)        
     return stems
+
+# version of tokenizeAndStemmerize, to change when its code changes the stems
+tokenizerVersion = 1
+
+def getTokenizerHash():
+    '''
+    function returning a hash of the configuration of tokenizeAndStemmerize
+    (version, tokenizer, regexes, stemmer and stopwords), used to know if the stems saved in files are still valid
+    -- OUT
+        hash : md5 hash of the configuration (str)
+    '''
+    import nltk
+    configuration = [tokenizerVersion,
+                     tokenizerMode,
+                     regexTokenizer.pattern,
+                     tokenizerContext.regexParenthesis.pattern,
+                     tokenizerContext.regexDash.pattern,
+                     type(tokenizerContext.stemmer).__name__,
+                     nltk.__version__,
+                     sorted(tokenizerContext.stopwords)]
+    return hashlib.md5(repr(configuration)).hexdigest()
+
+class StemVocabulary():
+    ''' class which implements a vocabulary of stems, giving an integer id to each stem.
+    the ids never change : the new stems are added at the end of the vocabulary,
+    which is saved in a text file (an identifier and the hash of the tokenizer, then a stem per line).
+    the vocabulary is only read on its first use, and started again when the tokenizer changes
+    (a new identifier being drawn, so that the ids saved with the old vocabulary aren't used).
+    (the vocabulary file must not be written by several processes at the same time)
+    only the stems of the keywords and of the saved subsets are added to the vocabulary (cf. getIds),
+    the descriptions are encoded without changing it (cf. lookupIds).
+    '''
+    # id of the stems which are not in the vocabulary
+    unknownId = -1
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.stems = None
+        self.ids = None
+        self.identifier = None
+        self.tokenizerHash = None
+        self.nbSaved = 0
+
+    def load(self):
+        if not(self.stems is None):
+            return
+        tokenizerHash = getTokenizerHash()
+        self.stems = []
+        self.ids = {}
+        if os.path.isfile(self.filename):
+            with codecs.open(self.filename,"r","utf-8") as fichier:
+                header = fichier.readline().strip().split(";")
+                if len(header)==2 and header[1]==tokenizerHash:
+                    self.identifier = header[0]
+                    for line in fichier:
+                        self.ids[line[:-1]] = len(self.stems)
+                        self.stems.append(line[:-1])
+        if self.identifier is None:
+            self.identifier = uuid.uuid4().hex
+        self.nbSaved = len(self.stems)
+        self.tokenizerHash = tokenizerHash
+
+    def update(self):
+        '''
+        function that reads the vocabulary again if the tokenizer changed since it was read
+        '''
+        if not(self.stems is None) and self.tokenizerHash != getTokenizerHash():
+            self.clear()
+        self.load()
+
+    def clear(self):
+        '''
+        function that forgets the vocabulary, which is read again on its next use
+        '''
+        self.stems = None
+        self.ids = None
+        self.identifier = None
+
+    def getId(self, stem):
+        '''
+        function returning the id of a stem, adding it to the vocabulary if it is new
+        '''
+        self.load()
+        if not(stem in self.ids):
+            self.ids[stem] = len(self.stems)
+            self.stems.append(stem)
+        return self.ids[stem]
+
+    def getIds(self, stems):
+        '''
+        function returning the ids of the stems, adding the new stems to the vocabulary
+        -- IN
+            stems : list of stems ([str])
+        -- OUT
+            ids : the ids of the stems (np.array[int32])
+        '''
+        self.load()
+        ids = self.ids
+        for stem in stems:
+            if not(stem in ids):
+                ids[stem] = len(self.stems)
+                self.stems.append(stem)
+        return np.array([ids[stem] for stem in stems], dtype=np.int32)
+
+    def lookupIds(self, stems):
+        '''
+        function returning the ids of the stems without changing the vocabulary,
+        the stems which are not in the vocabulary getting the id unknownId
+        -- IN
+            stems : list of stems ([str])
+        -- OUT
+            ids : the ids of the stems (np.array[int32])
+        '''
+        self.load()
+        ids = self.ids
+        return np.array([ids.get(stem, StemVocabulary.unknownId) for stem in stems], dtype=np.int32)
+
+    def getStems(self, ids):
+        '''
+        function returning the stems of the ids, the unknown stems (cf. lookupIds) being returned as None
+        '''
+        self.load()
+        stems = self.stems
+        return [stems[i] if i>=0 else None for i in ids]
+
+    def save(self):
+        '''
+        function that saves the vocabulary if stems were added since it was read
+        '''
+        self.load()
+        if self.nbSaved == len(self.stems) and os.path.isfile(self.filename):
+            return
+        with codecs.open(self.filename+".tmp","w","utf-8") as fichier:
+            fichier.write(self.identifier+";"+self.tokenizerHash+"\n")
+            for stem in self.stems:
+                fichier.write(stem+"\n")
+        if os.path.isfile(self.filename):
+            os.remove(self.filename)
+        os.rename(self.filename+".tmp", self.filename)
+        self.nbSaved = len(self.stems)
+
+# vocabulary shared by the pre-tokenized subsets (cf. IOFunctions.saveSubsetTokens)
+stemVocabulary = StemVocabulary(os.path.join(pathCodeNAF,"stemVocabulary.txt"))
         
 def beginsWithConsonne(word):
     voyelles = ["a","e","i","o","u","y"]
@@ -231,15 +666,13 @@ def beginsWithConsonne(word):
         return True
     
 ''' Creating and saving constants parameters '''
-            
-def loadConstants():
-    os.chdir(pathConstants)
-    parametersStep01 = importDict("parametersStep01.txt", "_")
-    parametersMatchStep01 = importDict("parametersMatchStep01.txt", "_")
-    parametersStep03 = importDict("parametersStep03.txt", "_")
-    parametersStep04 = importDict("parametersStep04.txt", "_")
+
+# the constants are only read from their files on their first use (cf. LazyDict),
+# so that importing the module doesn't read any file.
+
+def importBlacklistStep04(filename):
     blacklistStep04 = {}
-    with codecs.open("blacklistStep04.txt","r","utf-8") as fichier:
+    with codecs.open(filename,"r","utf-8") as fichier:
         for line in fichier:
             i = -2
             if len(line)>1:
@@ -248,18 +681,64 @@ def loadConstants():
                     blacklistStep04[line[:i]] = tokens
                 else:
                     continue
-    return parametersStep01, parametersMatchStep01, parametersStep03, parametersStep04, blacklistStep04
+    return blacklistStep04
+
+parametersStep01 = LazyDict(importDict, os.path.join(pathConstants,"parametersStep01.txt"), "_")
+parametersMatchStep01 = LazyDict(importDict, os.path.join(pathConstants,"parametersMatchStep01.txt"), "_")
+parametersStep03 = LazyDict(importDict, os.path.join(pathConstants,"parametersStep03.txt"), "_")
+parametersStep04 = LazyDict(importDict, os.path.join(pathConstants,"parametersStep04.txt"), "_")
+blacklistStep04 = LazyDict(importBlacklistStep04, os.path.join(pathConstants,"blacklistStep04.txt"))
+
+def loadConstants():
+    '''
+    function that reads again the constants from their files,
+    the dictionaries are updated in place so that every module sees the new values.
+    -- OUT
+        parametersStep01, parametersMatchStep01, parametersStep03, parametersStep04, blacklistStep04 (dic)
+    '''
+    constants = (parametersStep01, parametersMatchStep01, parametersStep03, parametersStep04, blacklistStep04)
+    for dic in constants:
+        dic.reload()
+    return constants
 
 # Normalisation step 01 function
 
-def normalisationStep01(parametersStep01):
+class NormalisationStep01():
+    ''' class which implements the normalisation function for the step 01 algorithm,
+    the polynomial x -> min(1, a*x^3+b*x^2+c*x) being computed on the first call.
     '''
-    function that computes the normalisation function for the step 01 algorithm
+    def __init__(self, parametersStep01):
+        self.parametersStep01 = parametersStep01
+        self.coefficients = None
+
+    def getCoefficients(self):
+        '''
+        function returning the coefficients of the polynomial, computing them if needed
+        -- OUT
+            coefficients : array of the coefficients (a, b, c) of x^3, x^2 and x (np.array)
+        '''
+        if self.coefficients is None:
+            self.coefficients = computeNormalisationStep01(self.parametersStep01)
+        return self.coefficients
+
+    def __call__(self, x):
+        normalisationParam = self.getCoefficients()
+        return min(1.0,normalisationParam[-3]*x**3+normalisationParam[-2]*x*x+normalisationParam[-1]*x)
+
+    def normalise(self, x):
+        '''
+        function applying the normalisation to an array of scores (np.array), cf. __call__
+        '''
+        normalisationParam = self.getCoefficients()
+        return np.minimum(1.0,normalisationParam[-3]*x**3+normalisationParam[-2]*x*x+normalisationParam[-1]*x)
+
+def computeNormalisationStep01(parametersStep01):
+    '''
+    function that computes the coefficients of the normalisation polynomial for the step 01 algorithm
     allocating a note between 0 and 1 to the genetic algorithm output.
     '''
     keywords = {}
-    os.chdir(pathKeywords)
-    with codecs.open("keywords.txt","r","utf-8") as fichier:
+    with codecs.open(os.path.join(pathKeywords,"keywords.txt"),"r","utf-8") as fichier:
         for line in fichier:
             i = -2
             if len(line)>1:
@@ -272,12 +751,17 @@ def normalisationStep01(parametersStep01):
     valMax = (parametersStep01['freqSlugAlpha']*valMaxSlug+parametersStep01['freqSlugGamma']/valMaxSlug+parametersStep01['coefProxi'])*(parametersStep01['placePremierTier']*parametersStep01["placeMot0"])*(parametersStep01['nbCommaGamma'])
     a = np.array([[valMax**3,valMax**2,valMax],[3*valMax**2,2*valMax, 1],[6*valMax,2,0]])
     b = np.array([1,0,0])
-    normalisationParam = lg.solve(a,b)
-    return lambda x : min(1.0,normalisationParam[-3]*x**3+normalisationParam[-2]*x*x+normalisationParam[-1]*x)
+    return lg.solve(a,b)
+
+def normalisationStep01(parametersStep01):
+    '''
+    function that returns the normalisation function for the step 01 algorithm
+    allocating a note between 0 and 1 to the genetic algorithm output.
+    (the polynomial is only computed on the first call, cf. NormalisationStep01)
+    '''
+    return NormalisationStep01(parametersStep01)
 
-blacklistStep04 = {}
-parametersStep01, parametersMatchStep01, parametersStep03, parametersStep04, blacklistStep04 = loadConstants()
-normalisationFunction = normalisationStep01(parametersStep01=parametersStep01)     
+normalisationFunction = normalisationStep01(parametersStep01=parametersStep01)
 
 def saveConstants():
     os.chdir(pathConstants)
@@ -285,6 +769,3 @@ def saveConstants():
     saveDict(parametersMatchStep01, "parametersMatchStep01.txt", "_")
     saveDict(parametersStep03, "parametersStep03.txt", "_")
     saveDict(parametersStep04, "parametersStep04.txt", "_")
-
-
-
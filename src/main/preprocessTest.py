@@ -6,13 +6,19 @@ Created on 19 avr. 2016
 '''
 
 import codecs
+import copy
+import gzip
 import os
 import random
+import shutil
 import unittest
+from xml.etree import ElementTree
 
 from nltk.corpus import stopwords
+import numpy as np
+import pandas as pd
 
-import UtilsConstants, IOFunctions
+import UtilsConstants, IOFunctions, GraphProcessing, PipelineRunner
 from main import KeywordSelector
 import warnings
 
@@ -58,6 +64,27 @@ class TestKeywords(unittest.TestCase):
                 for _ in fichier:
                     pass   
       
+    def testLazyDict(self):
+        filename = os.path.join(UtilsConstants.pathConstants,"parametersStep01.txt")
+        parameters = UtilsConstants.importDict(filename, "_")
+        self.assertTrue(len(parameters)>0)
+        # every use of the dictionary loads it first
+        self.assertEqual(dict(UtilsConstants.LazyDict(UtilsConstants.importDict, filename, "_")), parameters)
+        self.assertEqual(dict(**UtilsConstants.LazyDict(UtilsConstants.importDict, filename, "_")), parameters)
+        self.assertEqual(copy.copy(UtilsConstants.LazyDict(UtilsConstants.importDict, filename, "_")), parameters)
+        self.assertEqual(copy.deepcopy(UtilsConstants.LazyDict(UtilsConstants.importDict, filename, "_")), parameters)
+        self.assertTrue(parameters == UtilsConstants.LazyDict(UtilsConstants.importDict, filename, "_"))
+        self.assertTrue(UtilsConstants.LazyDict(UtilsConstants.importDict, filename, "_") == parameters)
+        self.assertEqual(sorted(UtilsConstants.LazyDict(UtilsConstants.importDict, filename, "_")), sorted(parameters))
+        self.assertEqual(dict(UtilsConstants.parametersStep01), parameters)
+        # reloaded in place
+        lazyDict = UtilsConstants.LazyDict(UtilsConstants.importDict, filename, "_")
+        dic = lazyDict.load()
+        lazyDict["test"] = 1.0
+        lazyDict.reload()
+        self.assertTrue(lazyDict.load() is dic)
+        self.assertEqual(dic, parameters)
+
     def testIsPresentListCodeNAF(self):
         os.chdir(UtilsConstants.pathCodeNAF)
         filename = "listeCodeNAF.txt"
@@ -125,7 +152,40 @@ class TestKeywords(unittest.TestCase):
         for word in stopwords.words('french'):
             srctxt += word + " "
         self.assertEqual(UtilsConstants.tokenizeAndStemmerize(srctxt),[])
-      
+
+    def testRegexTokenizer(self):
+        srctxt = "la boulangerie demeure dans le 16ème arrondissement"
+        self.assertEqual(UtilsConstants.tokenizeAndStemmerize(srctxt, tokenizer="regex"),[u'boulanger', u'demeur', u'16em', u'arrond'])
+        texts = ["s.a.r.l. vente, achat; conseil (informatique) : 12,5 % d'huiles... qu'a jusqu' a \"cadeaux\"",
+                 "vente de pièces détachées 12. réparation a. b, pose.",
+                 "j'allais au devant d'énormes problèmes",
+                 "vente.achat , ,55 a,5 a.. 'abc abc' 3.88 fin."]
+        differences, _ = UtilsConstants.compareTokenizers(texts, True)
+        self.assertEqual(differences, [])
+        differences, _ = UtilsConstants.compareTokenizers(IOFunctions.importKeywords().keys(), False)
+        self.assertEqual(differences, [])
+
+    def testTokenStemmerCache(self):
+        UtilsConstants.clearCaches()
+        srctxt = "la boulangerie demeure dans le 16ème arrondissement"
+        stems = UtilsConstants.tokenizeAndStemmerize(srctxt)
+        stems.append("modified")
+        self.assertEqual(UtilsConstants.tokenizeAndStemmerize(srctxt),[u'boulanger', u'demeur', u'16em', u'arrond'])
+        stats = UtilsConstants.getCacheStats()
+        self.assertEqual(stats["string"]["hits"],1)
+        self.assertEqual(stats["string"]["misses"],1)
+        self.assertEqual(stats["stem"]["misses"],4)
+        self.assertEqual(UtilsConstants.tokenizeAndStemmerize("boulangerie du 16ème",True),[u'boulanger', u'16em'])
+        self.assertEqual(UtilsConstants.getCacheStats()["stem"]["hits"],2)
+        cache = UtilsConstants.LRUCache(2)
+        cache.put("a",1)
+        cache.put("b",2)
+        cache.get("a")
+        cache.put("c",3)
+        self.assertEqual(cache.get("b"),None)
+        self.assertEqual(cache.get("a"),1)
+        self.assertEqual(len(cache),2)
+
     def testImportDicWordWeight(self):
         dicWordWeight = UtilsConstants.importDicWordWeight(IOFunctions.importKeywords())
         for slug in dicWordWeight:
@@ -140,7 +200,32 @@ class TestKeywords(unittest.TestCase):
         self.assertTrue("descriptions.csv" in os.listdir("."))
         self.assertEqual(len(IOFunctions.extractSubset("ABD")),0)
         IOFunctions.extractSubset("0111Z", 10)
-      
+
+    def testCompanyCorpus(self):
+        filename = os.path.join(UtilsConstants.path,"descriptionsTest.csv")
+        with open(filename,"w") as fichier:
+            fichier.write("siren,codeNaf,description\n1,0111Z,vente de fruits\n2,0112Z,culture du riz\n"
+                          "3,0111Z,\n4,0111Z,culture de legumes\n")
+        corpus = IOFunctions.CompanyCorpus(filename)
+        try:
+            self.assertTrue(corpus.load())
+            self.assertEqual(corpus.getDescriptions("0111Z").description.tolist(), ["vente de fruits", "culture de legumes"])
+            self.assertEqual(len(corpus.getDescriptions("011")), 3)
+            self.assertEqual(len(corpus.getDescriptions("ABD")), 0)
+            # the cache is used by a new corpus, and read again when the csv file changes
+            corpus = IOFunctions.CompanyCorpus(filename)
+            self.assertFalse(corpus.importCache() is None)
+            with open(filename,"a") as fichier:
+                fichier.write("5,0112Z,culture du ble\n")
+            self.assertTrue(corpus.importCache() is None)
+            self.assertTrue(corpus.load())
+            self.assertEqual(len(corpus.getDescriptions("0112Z")), 2)
+        finally:
+            for suffix in ["txt", IOFunctions.corpusExtensions[IOFunctions.getCorpusFormat()]]:
+                if os.path.isfile(corpus.getCacheFilename(suffix)):
+                    os.remove(corpus.getCacheFilename(suffix))
+            os.remove(filename)
+
     def testImportExportSubset(self):
         entreprises = IOFunctions.extractAndSaveSubset("0111Z", 10, UtilsConstants.path, False)
         os.chdir("..")
@@ -152,6 +237,58 @@ class TestKeywords(unittest.TestCase):
         os.remove("subset_NAF_0111Z/subset_entreprises.txt")
         os.rmdir("subset_NAF_0111Z")
           
+    def testExtractAndSaveSubsets(self):
+        if not(IOFunctions.companyCorpus.load()):
+            return
+        path = os.path.join(UtilsConstants.path,"subsetsTest")
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            os.mkdir(path)
+            # the codeNAF only need to be contained in the codeNAF of the entreprises, as in extractSubset
+            codeNAFs = IOFunctions.importListCodeNAF().keys()[:20]+["011"]
+            subsets = IOFunctions.extractAndSaveSubsets(codeNAFs, 5, path, seed = 42)
+            self.assertEqual(subsets, IOFunctions.extractAndSaveSubsets(codeNAFs, 5, path, seed = 42))
+            allSubsets = IOFunctions.extractAndSaveSubsets(codeNAFs, 0, path)
+            for codeNAF in codeNAFs:
+                self.assertEqual(len(subsets[codeNAF]), min(5, len(allSubsets[codeNAF])))
+                self.assertEqual(allSubsets[codeNAF], IOFunctions.extractSubset(codeNAF))
+                for entreprise in subsets[codeNAF]:
+                    self.assertTrue(entreprise in allSubsets[codeNAF])
+                entreprises = IOFunctions.importSubset("subset_NAF_"+codeNAF, path)
+                self.assertEqual(sorted(entreprises), sorted(allSubsets[codeNAF]))
+        finally:
+            os.chdir(UtilsConstants.path)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+
+    def testSubsetTokens(self):
+        path = os.path.join(UtilsConstants.path,"subsetsTest")
+        os.mkdir(path)
+        stemVocabulary = UtilsConstants.stemVocabulary
+        tokenizerVersion = UtilsConstants.tokenizerVersion
+        UtilsConstants.stemVocabulary = UtilsConstants.StemVocabulary(os.path.join(path,"stemVocabulary.txt"))
+        try:
+            IOFunctions.extractAndSaveSubset("", 50, path, False, saveTokens = True)
+            self.assertTrue(os.path.isfile(os.path.join(path,"graphcomplet_size_50","subset_tokens.pkl")))
+            entreprises = IOFunctions.importSubset("graphcomplet_size_50", path)
+            entreprisesTokens = IOFunctions.importSubset("graphcomplet_size_50", path, withTokens = True)
+            self.assertEqual([e[:2] for e in entreprises], [e[:2] for e in entreprisesTokens])
+            # the ids are read again with a new vocabulary
+            UtilsConstants.stemVocabulary = UtilsConstants.StemVocabulary(os.path.join(path,"stemVocabulary.txt"))
+            for entreprise in IOFunctions.importSubset("graphcomplet_size_50", path, withTokens = True):
+                self.assertEqual(len(entreprise), 3)
+                self.assertEqual(UtilsConstants.stemVocabulary.getStems(entreprise[2]),
+                                 UtilsConstants.tokenizeAndStemmerize(entreprise[1], True, UtilsConstants.graphStopwords))
+            # the stems aren't used anymore when the tokenizer changes
+            UtilsConstants.tokenizerVersion += 1
+            self.assertEqual(IOFunctions.importSubset("graphcomplet_size_50", path, withTokens = True), entreprises)
+        finally:
+            UtilsConstants.stemVocabulary = stemVocabulary
+            UtilsConstants.tokenizerVersion = tokenizerVersion
+            os.chdir(UtilsConstants.path)
+            shutil.rmtree(path)
+
     def testImportSubsetSorted(self):
         IOFunctions.extractAndSaveSubset("", 20, UtilsConstants.path, False)
         os.chdir("..")
@@ -173,11 +310,64 @@ class TestKeywords(unittest.TestCase):
             for slug in keywords[keyword]:
                 self.assertTrue(slug in dicWordWeight)
           
+    def testImportLexicon(self):
+        filename = os.path.join(UtilsConstants.pathKeywords,"keywords.txt")
+        keywords = IOFunctions.readKeywordsFile(filename)
+        dicWordWeight = UtilsConstants.importDicWordWeight(keywords)
+        lexiconFilename = IOFunctions.getLexiconFilename(filename)
+        existingLexicon = os.path.isfile(lexiconFilename)
+        try:
+            for i in range(2):
+                # compiled, then read from the lexicon file
+                if i==0 and os.path.isfile(lexiconFilename):
+                    os.remove(lexiconFilename)
+                lexicon = IOFunctions.importLexicon(filename)
+                self.assertEqual(lexicon[0].items(), keywords.items())
+                self.assertEqual(lexicon[1].items(), dicWordWeight.items())
+                self.assertEqual(lexicon[2].items(), KeywordSelector.computeDicSlug(keywords, dicWordWeight).items())
+                self.assertEqual(lexicon[3].items(), IOFunctions.importSlugEquivalence().items())
+            # the lexicon is compiled again when the tokenizer changes
+            header = IOFunctions.getLexiconHeader(filename)
+            self.assertTrue(IOFunctions.isLexiconUpToDate(filename, header))
+            header["tokenizer"] = "old tokenizer"
+            self.assertFalse(IOFunctions.isLexiconUpToDate(filename, header))
+            # modified keywords file
+            IOFunctions.saveKeywords(keywords.keys()[:10], UtilsConstants.pathKeywords, "keywords2.txt")
+            self.assertEqual(len(IOFunctions.importLexicon(os.path.join(UtilsConstants.pathKeywords,"keywords2.txt"))[0]), 10)
+            IOFunctions.saveKeywords(keywords.keys()[:20], UtilsConstants.pathKeywords, "keywords2.txt")
+            self.assertEqual(len(IOFunctions.importLexicon(os.path.join(UtilsConstants.pathKeywords,"keywords2.txt"))[0]), 20)
+        finally:
+            for name in ["keywords2.txt", "keywords2_lexicon.pkl"]:
+                if os.path.isfile(os.path.join(UtilsConstants.pathKeywords,name)):
+                    os.remove(os.path.join(UtilsConstants.pathKeywords,name))
+            if not existingLexicon and os.path.isfile(lexiconFilename):
+                os.remove(lexiconFilename)
+
+    def testImportLocalKeywords(self):
+        keywords = IOFunctions.importKeywords()
+        path = os.path.join(UtilsConstants.pathCodeNAF,"subset_NAF_9999Z")
+        os.mkdir(path)
+        try:
+            IOFunctions.saveKeywords(keywords.keys()[:10], path, "keywords.txt")
+            localKeywords = IOFunctions.importLocalKeywords("9999Z")
+            self.assertEqual(localKeywords, IOFunctions.importKeywords("9999Z"))
+            self.assertTrue(IOFunctions.importLocalKeywords("9999Z") is localKeywords)
+            # the cache is updated when the file changes
+            IOFunctions.saveKeywords(keywords.keys()[:20], path, "keywords.txt")
+            self.assertEqual(len(IOFunctions.importLocalKeywords("9999Z")), 20)
+            # no local keywords
+            self.assertEqual(IOFunctions.importLocalKeywords("nan"), keywords)
+        finally:
+            for filename in os.listdir(path):
+                os.remove(os.path.join(path,filename))
+            os.rmdir(path)
+
     def testImportExportKeywords(self):
         keywords = IOFunctions.importKeywords()
         IOFunctions.saveKeywords(keywords, UtilsConstants.pathKeywords, "keywords2.txt")
         keywords2 = IOFunctions.importKeywords(filename="keywords2.txt")
         os.remove("keywords2.txt")
+        os.remove("keywords2_lexicon.pkl")
         self.assertEqual(keywords, keywords2)
       
     def testSlugEquivalence(self):
@@ -261,7 +451,227 @@ class TestKeywords(unittest.TestCase):
         for kw in keywords.keys()[:20]:
             description += kw+" "
         self.assertTrue(len(KeywordSelector.pipeline([["321213","0111Z",description]], 5)["321213"])<=5)
-      
+
+    def createPipelineFile(self, fname, sirens):
+        '''
+        function that writes in UtilsConstants.pathAgreg a file to process by the pipeline runner,
+        with the given sirens and descriptions of the graphcomplet, and returns its rows
+        '''
+        entreprises = IOFunctions.importSubset("graphcomplet")[:len(sirens)]
+        df = pd.DataFrame({"siren" : sirens,
+                           "codeNaf" : [entreprise[0] for entreprise in entreprises],
+                           "description" : [entreprise[1] for entreprise in entreprises]})
+        filename = os.path.join(UtilsConstants.pathAgreg,fname+".csv")
+        df.to_csv(filename, columns=["siren","codeNaf","description"], index=False, encoding="utf8")
+        return pd.read_csv(filename,usecols=["siren","codeNaf","description"],encoding="utf8").values
+
+    def testRunPipeline(self):
+        if len(IOFunctions.importSubset("graphcomplet"))<40:
+            return
+        pathAgreg = UtilsConstants.pathAgreg
+        UtilsConstants.pathAgreg = os.path.join(UtilsConstants.path,"pipelineTest")
+        try:
+            if os.path.isdir(UtilsConstants.pathAgreg):
+                shutil.rmtree(UtilsConstants.pathAgreg)
+            os.mkdir(UtilsConstants.pathAgreg)
+            # sirens repeated in a shard (3) and in several shards (1, 20)
+            sirens = range(40)
+            sirens[5] = 3
+            sirens[25] = 1
+            sirens[33] = 20
+            rows = self.createPipelineFile("BRep_Step2_test", sirens)
+            PipelineRunner.loadWorkerState()
+            dic = PipelineRunner.KeywordSelector.pipeline(rows, nbMot = 5, **PipelineRunner.workerState)
+            filename = os.path.join(UtilsConstants.pathAgreg,"reference.csv")
+            pd.DataFrame.from_dict(dic, orient="index").to_csv(filename, encoding="utf8")
+            PipelineRunner.runPipeline(["BRep_Step2_test"], nbWorkers = 2, shardSize = 15)
+            # the output is the one of the single process pipeline
+            with open(filename) as fichier0, open(PipelineRunner.getKeywordsFilename("BRep_Step2_test")) as fichier1:
+                self.assertEqual(fichier0.read(), fichier1.read())
+            self.assertFalse(os.path.isfile(PipelineRunner.getShardFilename("BRep_Step2_test", 0)))
+        finally:
+            shutil.rmtree(UtilsConstants.pathAgreg)
+            UtilsConstants.pathAgreg = pathAgreg
+
+    def testRunPipelineStreaming(self):
+        if len(IOFunctions.importSubset("graphcomplet"))<30:
+            return
+        pathAgreg = UtilsConstants.pathAgreg
+        UtilsConstants.pathAgreg = os.path.join(UtilsConstants.path,"pipelineTest")
+        try:
+            if os.path.isdir(UtilsConstants.pathAgreg):
+                shutil.rmtree(UtilsConstants.pathAgreg)
+            os.mkdir(UtilsConstants.pathAgreg)
+            # siren 3 repeated in a chunk, sirens 1 and 2 repeated in several chunks
+            sirens = range(30)
+            sirens[5] = 3
+            sirens[12] = 1
+            sirens[25] = 2
+            rows = self.createPipelineFile("BRep_Step2_test", sirens)
+            PipelineRunner.runPipelineStreaming(["BRep_Step2_test"], chunksize = 10)
+            output = pd.read_csv(PipelineRunner.getKeywordsFilename("BRep_Step2_test"), index_col=0, encoding="utf8")
+            dic = PipelineRunner.KeywordSelector.pipeline(rows, nbMot = 5, **PipelineRunner.workerState)
+            reference = pd.DataFrame.from_dict(dic, orient="index")
+            self.assertEqual(list(output.index).count(1), 2)
+            self.assertEqual(list(output.index).count(2), 2)
+            self.assertEqual(list(output.index).count(3), 1)
+            self.assertEqual(len(set(output.index)), len(reference))
+            # keeping the last row of each siren gives the single process pipeline
+            output = output[~output.index.duplicated(keep="last")].sort_index()
+            self.assertEqual(output[reference.columns].to_csv(encoding="utf8"), reference.to_csv(encoding="utf8"))
+        finally:
+            shutil.rmtree(UtilsConstants.pathAgreg)
+            UtilsConstants.pathAgreg = pathAgreg
+
+    def testRunPipelineRestart(self):
+        if len(IOFunctions.importSubset("graphcomplet"))<50:
+            return
+        pathAgreg = UtilsConstants.pathAgreg
+        UtilsConstants.pathAgreg = os.path.join(UtilsConstants.path,"pipelineTest")
+        pipeline = PipelineRunner.KeywordSelector.pipeline
+        try:
+            if os.path.isdir(UtilsConstants.pathAgreg):
+                shutil.rmtree(UtilsConstants.pathAgreg)
+            os.mkdir(UtilsConstants.pathAgreg)
+            fnames = ["BRep_Step2_test", "BRep_Step2_test2"]
+            rows = self.createPipelineFile(fnames[0], range(40))
+            self.createPipelineFile(fnames[1], range(100,110))
+            PipelineRunner.runPipelineStreaming(fnames, chunksize = 10)
+            references = []
+            for fname in fnames:
+                with open(PipelineRunner.getKeywordsFilename(fname)) as fichier:
+                    references.append(fichier.read())
+            # crash on the third chunk, after rows were written following the last checkpoint
+            nbCalls = [0]
+            def crashingPipeline(*args, **kwargs):
+                nbCalls[0] += 1
+                if nbCalls[0]==3:
+                    with open(PipelineRunner.getKeywordsFilename(fnames[0]),"a") as fichier:
+                        fichier.write("999,garbage\n")
+                    raise RuntimeError("crash")
+                return pipeline(*args, **kwargs)
+            PipelineRunner.KeywordSelector.pipeline = crashingPipeline
+            self.assertRaises(RuntimeError, PipelineRunner.runPipelineStreaming, fnames, chunksize = 10)
+            checkpoint = PipelineRunner.importCheckpoint()
+            self.assertEqual(checkpoint[fnames[0]][0], 20)
+            self.assertFalse(checkpoint[fnames[0]][2])
+            # the run is resumed after the last saved row
+            PipelineRunner.KeywordSelector.pipeline = pipeline
+            PipelineRunner.runPipelineStreaming(fnames, chunksize = 10, restart = True)
+            for fname, reference in zip(fnames, references):
+                with open(PipelineRunner.getKeywordsFilename(fname)) as fichier:
+                    self.assertEqual(fichier.read(), reference)
+            # the finished files are skipped
+            def failingPipeline(*args, **kwargs):
+                raise RuntimeError("finished file computed again")
+            PipelineRunner.KeywordSelector.pipeline = failingPipeline
+            PipelineRunner.runPipelineStreaming(fnames, chunksize = 10, restart = True)
+            # the saved shards are skipped
+            os.remove(PipelineRunner.getCheckpointFilename())
+            PipelineRunner.KeywordSelector.pipeline = pipeline
+            PipelineRunner.processShard((fnames[0], 1, rows[15:30], 5))
+            def shardPipeline(descriptions, *args, **kwargs):
+                if descriptions[0][0]==15:
+                    raise RuntimeError("saved shard computed again")
+                return pipeline(descriptions, *args, **kwargs)
+            PipelineRunner.KeywordSelector.pipeline = shardPipeline
+            PipelineRunner.runPipeline(fnames[:1], nbWorkers = 2, shardSize = 15, restart = True)
+            PipelineRunner.KeywordSelector.pipeline = pipeline
+            dic = pipeline(rows, nbMot = 5, **PipelineRunner.workerState)
+            with open(PipelineRunner.getKeywordsFilename(fnames[0])) as fichier:
+                self.assertEqual(fichier.read(), pd.DataFrame.from_dict(dic, orient="index").to_csv(encoding="utf8"))
+        finally:
+            PipelineRunner.KeywordSelector.pipeline = pipeline
+            shutil.rmtree(UtilsConstants.pathAgreg)
+            UtilsConstants.pathAgreg = pathAgreg
+
+    def testExtractGraphFromSubsets(self):
+        entreprises = IOFunctions.importSubset("graphcomplet")
+        if len(entreprises)==0:
+            return
+        codeNAFs = sorted(set([entreprise[0] for entreprise in entreprises]))[:4]
+        paths = [os.path.join(UtilsConstants.path,"graphTest"+str(nbWorkers)) for nbWorkers in [1,2]]
+        try:
+            for path in paths:
+                for codeNAF in codeNAFs:
+                    os.makedirs(os.path.join(path,"subset_NAF_"+codeNAF))
+                    with open(os.path.join(path,"subset_NAF_"+codeNAF,"subset_entreprises.txt"),"w") as fichier:
+                        for i, entreprise in enumerate(entreprises):
+                            if entreprise[0]==codeNAF:
+                                fichier.write(str(i)+"_"+"_".join(entreprise)+"\n")
+            for nbWorkers, path in zip([1,2], paths):
+                KeywordSelector.extractGraphFromSubsets(codeNAFs, path, nbWorkers = nbWorkers)
+            # the files are the same whatever the number of processes
+            for codeNAF in codeNAFs:
+                for filename in ["graph_subset_NAF_"+codeNAF+"_nodes.txt", "graph_subset_NAF_"+codeNAF+"_edges.txt", "keywords.txt"]:
+                    with open(os.path.join(paths[0],"subset_NAF_"+codeNAF,filename)) as fichier0, \
+                         open(os.path.join(paths[1],"subset_NAF_"+codeNAF,filename)) as fichier1:
+                        self.assertEqual(fichier0.read(), fichier1.read())
+        finally:
+            os.chdir(UtilsConstants.path)
+            for path in paths:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+
+    def testPartialGraph(self):
+        entreprises = IOFunctions.importSubset("graphcomplet")[:300]
+        if len(entreprises)==0:
+            return
+        keywords, dicWordWeight, dicSlug, equivalences = IOFunctions.importLexicon()
+        slugIndex = KeywordSelector.computeSlugIndex(dicSlug, equivalences)
+        graph = GraphProcessing.GraphKeyword("graph_test")
+        KeywordSelector.buildFromEntreprises(entreprises, graph, keywords, dicWordWeight, equivalences, dicSlug, slugIndex)
+        partialGraphs = []
+        for start in range(0, 300, 100):
+            partialGraphs.append(GraphProcessing.PartialGraphKeyword())
+            KeywordSelector.buildFromEntreprises(entreprises[start:start+100], partialGraphs[-1], keywords, dicWordWeight,
+                                                 equivalences, dicSlug, slugIndex)
+        # the merge is associative
+        partialGraph0 = copy.deepcopy(partialGraphs[0]).merge(copy.deepcopy(partialGraphs[1])).merge(partialGraphs[2])
+        partialGraph1 = partialGraphs[0].merge(partialGraphs[1].merge(partialGraphs[2]))
+        for partialGraph in [partialGraph0, partialGraph1]:
+            mergedGraph = partialGraph.toGraph("graph_test")
+            self.assertEqual(graph.dicIdNodes, mergedGraph.dicIdNodes)
+            self.assertEqual(graph.graphEdges.keys(), mergedGraph.graphEdges.keys())
+            self.assertGraphEqual(graph, mergedGraph)
+        # the graph built by parts is the graph built at once
+        for nbWorkers, shardSize in [(1, 1), (3, 70)]:
+            shardedGraph = KeywordSelector.buildGraphByShards("graph_test", entreprises, keywords, dicWordWeight, equivalences,
+                                                              dicSlug, slugIndex, nbWorkers = nbWorkers, shardSize = shardSize,
+                                                              printProgress = False)
+            self.assertGraphEqual(graph, shardedGraph)
+        # the graph of a subset is the same as the one computed by a single process
+        path = os.path.join(UtilsConstants.path,"graphTestShards")
+        try:
+            os.makedirs(os.path.join(path,"subset_test"))
+            with open(os.path.join(path,"subset_test","subset_entreprises.txt"),"w") as fichier:
+                for i, entreprise in enumerate(entreprises):
+                    fichier.write(str(i)+"_"+"_".join(entreprise)+"\n")
+            graph = KeywordSelector.extractGraphFromSubset("subset_test", path, keywords = keywords, dicWordWeight = dicWordWeight,
+                                                           equivalences = equivalences, printProgress = False, nbWorkers = 1)
+            for nbWorkers, shardSize in [(1, 1), (3, 70)]:
+                shardedGraph = KeywordSelector.extractGraphFromSubset("subset_test", path, keywords = keywords,
+                                                                      dicWordWeight = dicWordWeight, equivalences = equivalences,
+                                                                      printProgress = False, nbWorkers = nbWorkers,
+                                                                      shardSize = shardSize)
+                self.assertGraphEqual(graph, shardedGraph)
+        finally:
+            os.chdir(UtilsConstants.path)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+
+    def assertGraphEqual(self, graph1, graph2):
+        self.assertEqual(graph1.dicIdNodes, graph2.dicIdNodes)
+        self.assertEqual(graph1.graphEdges.keys(), graph2.graphEdges.keys())
+        for key in graph1.graphEdges:
+            self.assertEqual(graph1.graphEdges[key].value, graph2.graphEdges[key].value)
+            self.assertEqual(graph1.graphEdges[key].nbOccurence, graph2.graphEdges[key].nbOccurence)
+        for i in graph1.graphNodes:
+            self.assertEqual(graph1.graphNodes[i].genericity, graph2.graphNodes[i].genericity)
+            self.assertEqual(graph1.graphNodes[i].dicNAF.items(), graph2.graphNodes[i].dicNAF.items())
+            self.assertEqual({node.id : value for node, value in graph1.graphNodes[i].neighbours.items()},
+                             {node.id : value for node, value in graph2.graphNodes[i].neighbours.items()})
+
     # Step 1
   
     def testDeleteKeywords(self):
@@ -299,7 +709,96 @@ class TestKeywords(unittest.TestCase):
             self.assertEqual(keywords[kw], a[0][kw])
         a = KeywordSelector.preprocessExtraction(UtilsConstants.tokenizeAndStemmerize("carottes"), keywords, dicWordWeight, {})
         self.assertEqual(len(a[0]),0)
-                  
+
+    def testSlugIndex(self):
+        keywords = ["achat de produits","vente de produit","produits informatiques","informatique"]
+        keywords = {kw : UtilsConstants.tokenizeAndStemmerize(kw) for kw in keywords}
+        dicWordWeight = UtilsConstants.importDicWordWeight(keywords)
+        equivalences = {u"informat":[u"informat",u"informatis"],u"informatis":[u"informat",u"informatis"]}
+        dicSlug = KeywordSelector.computeDicSlug(keywords, dicWordWeight)
+        slugIndex = KeywordSelector.computeSlugIndex(dicSlug, equivalences)
+        for stem in slugIndex:
+            for slug, value in slugIndex[stem]:
+                self.assertEqual(value, KeywordSelector.isMatch(stem, slug, equivalences))
+        for description in ["achat et vente de produits", "achat d'informatique, informatisation", "carottes"]:
+            stems = UtilsConstants.tokenizeAndStemmerize(description, True)
+            a = KeywordSelector.preprocessExtraction(stems, keywords, dicWordWeight, equivalences)
+            b = KeywordSelector.preprocessExtraction(stems, keywords, dicWordWeight, equivalences, dicSlug, slugIndex)
+            self.assertEqual(a, b)
+
+    def testMatchList(self):
+        keywords = ["achat de produits","vente de produit","produits informatiques","informatique"]
+        keywords = {kw : UtilsConstants.tokenizeAndStemmerize(kw) for kw in keywords}
+        dicWordWeight = UtilsConstants.importDicWordWeight(keywords)
+        stems = UtilsConstants.tokenizeAndStemmerize("achat, vente de produits. non informatique et produits informatiques", True)
+        keywordSet, tableMatch = KeywordSelector.preprocessExtraction(stems, keywords, dicWordWeight, {})
+        matchList, posSpecial = KeywordSelector.computeMatchList(stems, tableMatch)
+        self.assertEqual(posSpecial[","], set([1]))
+        for slug in matchList:
+            for nbMot, _, value in matchList[slug]:
+                self.assertEqual(tableMatch[nbMot][slug], value)
+        for keyword in keywordSet:
+            a = KeywordSelector.getProbKeywordInDescription(keyword, stemmedDesc = stems, slugs = keywords[keyword],
+                                                            equivalences = {}, dicWordWeight = dicWordWeight, tableMatch = tableMatch)
+            b = KeywordSelector.getProbKeywordInDescription(keyword, stemmedDesc = stems, slugs = keywords[keyword],
+                                                            equivalences = {}, dicWordWeight = dicWordWeight, tableMatch = tableMatch,
+                                                            matchList = matchList, posSpecial = posSpecial)
+            self.assertEqual(a, b)
+
+    def testEncodedSlugIndex(self):
+        keywords = ["achat de produits","vente de produit","produits informatiques","informatique"]
+        keywords = {kw : UtilsConstants.tokenizeAndStemmerize(kw) for kw in keywords}
+        dicWordWeight = UtilsConstants.importDicWordWeight(keywords)
+        equivalences = {u"informat":[u"informat",u"informatis"],u"informatis":[u"informat",u"informatis"]}
+        dicSlug = KeywordSelector.computeDicSlug(keywords, dicWordWeight)
+        slugIndex = KeywordSelector.computeSlugIndex(dicSlug, equivalences)
+        encodedIndex = KeywordSelector.EncodedSlugIndex(slugIndex)
+        for description in ["achat, vente de produits. non informatique et produits informatiques", 
+                            "achat d'informatique, informatisation", "carottes", "achat de wxqzkt", ""]:
+            stems = UtilsConstants.tokenizeAndStemmerize(description, True)
+            nbStems = len(encodedIndex.vocabulary.stems)
+            descIds = KeywordSelector.encodeDescription(stems)
+            # the vocabulary isn't changed by the encoding, the unknown stems being never matched
+            self.assertEqual(len(encodedIndex.vocabulary.stems), nbStems)
+            self.assertEqual(encodedIndex.vocabulary.getStems(descIds), 
+                             [stem if stem in encodedIndex.vocabulary.ids else None for stem in stems])
+            keywordSet, tableMatch = KeywordSelector.preprocessExtraction(stems, keywords, dicWordWeight, equivalences, dicSlug, slugIndex)
+            matchList, posSpecial = KeywordSelector.computeMatchList(stems, tableMatch)
+            a = encodedIndex.preprocessExtraction(descIds, keywords, dicSlug)
+            self.assertEqual(a[0].items(), keywordSet.items())
+            self.assertEqual(a[1], [dicMatch for dicMatch in tableMatch if len(dicMatch)>0])
+            self.assertEqual((a[2], a[3]), (matchList, posSpecial))
+            for slug in dicWordWeight:
+                values = KeywordSelector.computeSlugMatches(descIds, slug, equivalences)
+                self.assertEqual(values.tolist(), [KeywordSelector.isMatch(slug, stem, equivalences) for stem in stems])
+            self.assertEqual(KeywordSelector.extractFromDescription(None, keywords, dicWordWeight, equivalences, dicSlug = dicSlug, 
+                                                                    slugIndex = slugIndex, preprocessedString = stems, returnStem = True),
+                             KeywordSelector.extractFromDescription(None, keywords, dicWordWeight, equivalences, dicSlug = dicSlug, 
+                                                                    slugIndex = slugIndex, preprocessedString = descIds, returnStem = True,
+                                                                    encodedIndex = encodedIndex))
+
+    def testPopulationStep01(self):
+        keywords = ["achat de produits","vente de produit","produits informatiques","informatique"]
+        keywords = {kw : UtilsConstants.tokenizeAndStemmerize(kw) for kw in keywords}
+        dicWordWeight = UtilsConstants.importDicWordWeight(keywords)
+        parameters = dict(UtilsConstants.parametersStep01)
+        pop = [parameters]+[{key : random.uniform(0.0,2.0) for key in parameters} for _ in range(5)]
+        population = KeywordSelector.PopulationStep01(pop)
+        self.assertTrue(population.vectorized)
+        for description in ["achat, vente de produits. non informatique et produits informatiques", "achat d'informatique"]:
+            stems = UtilsConstants.tokenizeAndStemmerize(description, True)
+            for keyword in keywords:
+                a = KeywordSelector.getProbKeywordInDescription(keyword, stemmedDesc = stems, slugs = keywords[keyword], parametersStep01 = population,
+                                                                equivalences = {}, dicWordWeight = dicWordWeight)
+                b = [KeywordSelector.getProbKeywordInDescription(keyword, stemmedDesc = stems, slugs = keywords[keyword], parametersStep01 = p,
+                                                                 equivalences = {}, dicWordWeight = dicWordWeight) for p in pop]
+                self.assertEqual(a[0], [value for value, _ in b])
+                self.assertEqual(a[1], b[0][1])
+            self.assertEqual(KeywordSelector.extractFromDescription(None, keywords, dicWordWeight, {}, parametersStep01 = pop, 
+                                                                    normalisationFunction = [None]*len(pop), preprocessedString = stems),
+                             [KeywordSelector.extractFromDescription(None, keywords, dicWordWeight, {}, parametersStep01 = p, 
+                                                                     preprocessedString = stems) for p in pop])
+
     def testIsMatch(self):
         slug1 = "test"
         slug2 = "test2"
@@ -335,6 +834,17 @@ class TestKeywords(unittest.TestCase):
         result = KeywordSelector.extractFromDescription(description, keywords, dicWordWeight, {}, booleanMatchParfait=False)
         self.assertTrue(isinstance(result,dict))
         self.assertEqual(len(result),0)
+
+    def testExtractFromDescriptionBatch(self):
+        keywords = ["achat de produits","vente de produit","produits informatiques","informatique"]
+        keywords = {kw : UtilsConstants.tokenizeAndStemmerize(kw) for kw in keywords}
+        dicWordWeight = UtilsConstants.importDicWordWeight(keywords)
+        descriptions = ["", "achat de produits", "produits d'achat", "vente de produits, produits informatiques. non informatique"]
+        descriptions = [UtilsConstants.tokenizeAndStemmerize(description, True) for description in descriptions]
+        results = KeywordSelector.extractFromDescriptionBatch(iter(descriptions), keywords, dicWordWeight, {})
+        self.assertEqual(len(results), len(descriptions))
+        for description, result in zip(descriptions, results):
+            self.assertEqual(result, KeywordSelector.extractFromDescription(None, keywords, dicWordWeight, {}, preprocessedString=description))
        
     # step 3
   
@@ -359,6 +869,127 @@ class TestKeywords(unittest.TestCase):
             self.assertTrue(kw in potentielNodes)
             self.assertTrue(dicKw[kw]<=1.0 and dicKw[kw]>0.0)
         
+    def testCSRGraph(self):
+        try:
+            os.chdir(os.path.join(UtilsConstants.pathCodeNAF,"graphcomplet"))
+            graph = IOFunctions.importGraph("graphcomplet", backend="dict")
+            compactGraph = IOFunctions.importGraph("graphcomplet", backend="csr")
+        except:
+            return
+        self.assertEqual(set(graph.graphEdges.keys()), set(compactGraph.graphEdges.keys()))
+        for name in random.sample(graph.dicIdNodes.keys(), 100):
+            node = graph.getNodeByName(name)
+            compactNode = compactGraph.getNodeByName(name)
+            self.assertEqual(node.id, compactNode.id)
+            self.assertEqual(node.dicNAF, compactNode.dicNAF)
+            self.assertEqual(node.getSize(), compactNode.getSize())
+            self.assertEqual({neighbour.name:value for neighbour, value in node.neighbours.items()},
+                             {neighbour.name:value for neighbour, value in compactNode.neighbours.items()})
+            for neighbour in compactNode.neighbours:
+                edge = (min(node.id, neighbour.id), max(node.id, neighbour.id))
+                self.assertEqual(graph.graphEdges[edge].nbOccurence, compactGraph.graphEdges[edge].nbOccurence)
+            # the order of the neighbours, and therefore of the ties, depends on the representation
+            dicKeywords = {name:1.0}
+            self.assertEqual(set(KeywordSelector.extractPotentielNodes(graph, dicKeywords)),
+                             set(KeywordSelector.extractPotentielNodes(compactGraph, dicKeywords)))
+
+    def testBinaryGraph(self):
+        try:
+            os.chdir(os.path.join(UtilsConstants.pathCodeNAF,"graphcomplet"))
+            graph = IOFunctions.importGraph("graphcomplet", backend="dict")
+        except:
+            return
+        path = os.path.join(UtilsConstants.pathCodeNAF,"graphbinarytest")
+        os.mkdir(path)
+        os.chdir(path)
+        try:
+            graph.name = "graph_graphbinarytest"
+            IOFunctions.saveGraph(graph, binary=False)
+            textGraph = IOFunctions.importGraph("graphbinarytest", backend="dict")
+            IOFunctions.saveGraph(graph)
+            self.assertTrue(IOFunctions.isGraphBinaryUpToDate("graph_graphbinarytest"))
+            binaryGraph = IOFunctions.importGraph("graphbinarytest", backend="dict")
+            self.assertEqual(textGraph.dicIdNodes, binaryGraph.dicIdNodes)
+            self.assertEqual(textGraph.graphEdges.keys(), binaryGraph.graphEdges.keys())
+            for i in textGraph.graphNodes:
+                self.assertEqual(textGraph.graphNodes[i].dicNAF.items(), binaryGraph.graphNodes[i].dicNAF.items())
+                self.assertEqual(textGraph.graphNodes[i].getSize(), binaryGraph.graphNodes[i].getSize())
+            for edge in textGraph.graphEdges:
+                self.assertEqual(textGraph.graphEdges[edge].value, binaryGraph.graphEdges[edge].value)
+            compactGraph = IOFunctions.importGraph("graphbinarytest", backend="csr")
+            self.assertEqual(set(textGraph.graphEdges.keys()), set(compactGraph.graphEdges.keys()))
+            # the binary format isn't used anymore when the text files change
+            with codecs.open("graph_graphbinarytest_edges.txt","a","utf-8") as fichier:
+                fichier.write("\n")
+            self.assertFalse(IOFunctions.isGraphBinaryUpToDate("graph_graphbinarytest"))
+        finally:
+            os.chdir(UtilsConstants.pathCodeNAF)
+            shutil.rmtree(path)
+
+    def testMmapGraph(self):
+        try:
+            os.chdir(os.path.join(UtilsConstants.pathCodeNAF,"graphcomplet"))
+            graph = IOFunctions.importGraph("graphcomplet", backend="dict")
+            mmapGraph = IOFunctions.importGraph("graphcomplet", mmap=True)
+        except:
+            return
+        self.assertTrue(isinstance(mmapGraph.weights, np.memmap))
+        self.assertEqual(set(graph.graphEdges.keys()), set(mmapGraph.graphEdges.keys()))
+        # step 3 and step 4 on the memory-mapped graph
+        keywords = IOFunctions.importKeywords()
+        dicWordWeight = UtilsConstants.importDicWordWeight(keywords)
+        for name in random.sample(graph.dicIdNodes.keys(), 10):
+            dicKeywords = {name:1.0}
+            dicKw = KeywordSelector.extractFromGraph(mmapGraph, dicKeywords, dicWordWeight)
+            for kw in dicKw:
+                self.assertTrue(dicKw[kw]<=1.0 and dicKw[kw]>0.0)
+            merg = KeywordSelector.mergingKeywords(dicKeywords, dicKw, mmapGraph, codeNAF="")
+            self.assertTrue(len(merg)<=int(UtilsConstants.parametersStep04["nbMaxMotsCles"]))
+
+    def testLazyGraph(self):
+        try:
+            os.chdir(os.path.join(UtilsConstants.pathCodeNAF,"graphcomplet"))
+            graph = IOFunctions.importGraph("graphcomplet", backend="dict")
+            lazyGraph = IOFunctions.importGraph("graphcomplet", edges="lazy")
+        except:
+            return
+        self.assertTrue(lazyGraph.indices is None)
+        self.assertEqual(len(graph.graphEdges), len(lazyGraph.graphEdges))
+        lazyGraph.edgesCache.resize(20)
+        for name in random.sample(graph.dicIdNodes.keys(), 100):
+            node = graph.getNodeByName(name)
+            lazyNode = lazyGraph.getNodeByName(name)
+            self.assertEqual({neighbour.name:value for neighbour, value in node.neighbours.items()},
+                             {neighbour.name:value for neighbour, value in lazyNode.neighbours.items()})
+            for neighbour in lazyNode.neighbours:
+                edge = (min(node.id, neighbour.id), max(node.id, neighbour.id))
+                self.assertEqual(graph.graphEdges[edge].nbOccurence, lazyGraph.graphEdges[edge].nbOccurence)
+            dicKeywords = {name:1.0}
+            self.assertEqual(set(KeywordSelector.extractPotentielNodes(graph, dicKeywords)),
+                             set(KeywordSelector.extractPotentielNodes(lazyGraph, dicKeywords)))
+            self.assertTrue(len(lazyGraph.edgesCache.dic)<=20)
+        lazyGraph.close()
+
+    def testSaveGexfFiles(self):
+        try:
+            os.chdir(os.path.join(UtilsConstants.pathCodeNAF,"graphcomplet"))
+            graph = IOFunctions.importGraph("graphcomplet")
+        except:
+            return
+        os.chdir(UtilsConstants.path)
+        node = graph.getNodeByName(random.choice(graph.dicIdNodes.keys()))
+        # the edges whose value is rounded to 0 are not saved
+        keywords = [node.name]+[neighbour.name for neighbour, value in node.neighbours.items() if value>0][:5]
+        origins = [[1]]+[[3]]*(len(keywords)-1)
+        subgraphs = [("gexfTest0.gexf", keywords, origins), ("gexfTest1.gexf", keywords[:1], origins[:1])]
+        self.assertTrue(IOFunctions.saveGexfFiles(graph, subgraphs, compress=True))
+        for filename, nbNodes, nbEdges in [("gexfTest0.gexf.gz", len(keywords), len(keywords)-1), ("gexfTest1.gexf.gz", 1, 0)]:
+            with gzip.open(filename) as fichier:
+                root = ElementTree.parse(fichier).getroot()
+            os.remove(filename)
+            self.assertEqual(len(root.findall(".//{http://www.gexf.net/1.2draft}node")), nbNodes)
+            self.assertTrue(len(root.findall(".//{http://www.gexf.net/1.2draft}edge"))>=nbEdges)
+
     # step 4
     def testMergingKeywords(self):
         try: